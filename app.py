@@ -1,9 +1,13 @@
 import os
+import io
 import json
 import logging
 import uuid
+import hashlib
+import gzip
+import mimetypes
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, Response, stream_template, send_from_directory
+from flask import Flask, render_template, request, jsonify, Response, stream_template, send_file, redirect
 from anthropic import Anthropic
 from dotenv import load_dotenv
 import re
@@ -12,7 +16,29 @@ from mcp_manager import mcp_manager
 from haml_processor import convert_haml_to_html
 import tempfile
 import time
-from context_manager import ContextManager
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import brotli  # Optional: enables .br variants alongside gzip
+except ImportError:
+    brotli = None
+from context_manager import ContextManager, MESSAGE_OVERHEAD_TOKENS
+from session_registry import SessionRegistry
+from session_store import create_session_store
+from session_hibernation import SessionHibernator, DEFAULT_HIBERNATE_DIR
+from session_locks import SessionLocks, SessionBusy
+from conversation_summarizer import ConversationSummarizer, SUMMARY_SYSTEM_PROMPT, build_summary_prompt
+from message_recall import format_recalled
+from token_counter import create_token_counter
+from log_writer import JsonLogWriter
+from artifact_processor import artifact_processor
+from artifact_catalogue import artifact_catalogue
+from artifact_storage import create_artifact_storage, ENCODING_SUFFIXES
+from artifact_layout import ArtifactLayout
+import markdown_renderer
+from artifact_gc import ArtifactSweeper
+from artifact_export import iter_artifact_zip
+from artifact_revisions import ArtifactRevisions
+from search_index import search_index
 
 # Application version
 VERSION = "1.1.0"
@@ -29,6 +55,13 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fast model for background rolling summaries of older turns (empty disables them)
+CONTEXT_SUMMARY_MODEL = os.environ.get('CONTEXT_SUMMARY_MODEL', 'claude-3-5-haiku-20241022')
+CONTEXT_SUMMARY_THRESHOLD = float(os.environ.get('CONTEXT_SUMMARY_THRESHOLD', 0.5))  # Share of the window
+CONTEXT_RECALL_TOKENS = int(os.environ.get('CONTEXT_RECALL_TOKENS', 1000))  # Evicted history re-injected per turn (0 disables)
+# Shared by all sessions, so its cache and calibration against API usage are too
+token_counter = create_token_counter(os.environ.get('TOKEN_COUNTER', 'bpe'))
+
 # Create logs directory if it doesn't exist
 LOGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 os.makedirs(LOGS_DIR, exist_ok=True)
@@ -37,84 +70,98 @@ os.makedirs(LOGS_DIR, exist_ok=True)
 ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
 os.makedirs(ARTIFACTS_DIR, exist_ok=True)
 
-# Enhanced logging setup for API interactions
-def setup_detailed_logging():
-    """Setup detailed logging for API interactions and debugging"""
-    # Create a separate logger for API interactions
-    api_logger = logging.getLogger('api_interactions')
-    api_logger.setLevel(logging.DEBUG)
-    
-    # Create file handler for API logs
-    today_str = datetime.now().strftime("%Y%m%d")
-    api_log_file = os.path.join(LOGS_DIR, f'api_interactions_{today_str}.log')
-    api_handler = logging.FileHandler(api_log_file)
-    api_handler.setLevel(logging.DEBUG)
-    
-    # Create file handler for session logs
-    session_log_file = os.path.join(LOGS_DIR, f'sessions_{today_str}.log')
-    session_handler = logging.FileHandler(session_log_file)
-    session_handler.setLevel(logging.INFO)
-    
-    # Create detailed formatter
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    api_handler.setFormatter(detailed_formatter)
-    session_handler.setFormatter(detailed_formatter)
-    
-    # Add handlers to loggers
-    api_logger.addHandler(api_handler)
-    api_logger.propagate = False  # Don't propagate to root logger
-    
-    session_logger = logging.getLogger('sessions')
-    session_logger.addHandler(session_handler)
-    session_logger.setLevel(logging.INFO)
-    session_logger.propagate = False
-    
-    return api_logger, session_logger
-
-# Initialize detailed loggers
-api_logger, session_logger = setup_detailed_logging()
+# Artifact files live in date/hash shards (artifacts/YYYY/MM/DD/ab/...) derived from the
+# permalink filename; files from the old flat layout are still found until migrated
+artifact_layout = ArtifactLayout(ARTIFACTS_DIR)
+
+# Finalized artifact bodies are stored once per unique content hash, on local disk
+# or in an S3-compatible object store shared by all nodes (ARTIFACT_STORAGE=s3)
+CONTENT_STORE_DIR = os.path.join(ARTIFACTS_DIR, 'objects')
+artifact_storage = create_artifact_storage(CONTENT_STORE_DIR)
+ARTIFACT_PRESIGN_EXPIRES = int(os.environ.get('ARTIFACT_PRESIGN_EXPIRES', 3600))
+ARTIFACT_EXPORT_MAX_FILES = int(os.environ.get('ARTIFACT_EXPORT_MAX_FILES', 500))
+
+# In-progress object-store uploads for streaming artifacts, keyed by local file path
+streaming_uploads = {}
+
+# Artifact compression and caching
+COMPRESSIBLE_EXTENSIONS = {'.html', '.md', '.txt', '.css', '.js', '.json', '.xml', '.yml', '.sql',
+                           '.py', '.ts', '.java', '.cpp', '.c', '.go', '.rs', '.php', '.rb', '.sh'}
+COMPRESSION_MIN_BYTES = 1024  # Smaller files aren't worth a variant
+ARTIFACT_CACHE_CONTROL = 'public, max-age=31536000, immutable'  # Finalized artifacts never change
+# Optional offload of large artifact bodies to the front-end web server
+ARTIFACTS_ACCEL_REDIRECT_PREFIX = os.environ.get('ARTIFACTS_ACCEL_REDIRECT_PREFIX')  # nginx internal location
+ARTIFACTS_USE_X_SENDFILE = os.environ.get('ARTIFACTS_USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')  # Apache mod_xsendfile
+ARTIFACTS_OFFLOAD_MIN_BYTES = int(os.environ.get('ARTIFACTS_OFFLOAD_MIN_BYTES', 256 * 1024))
+# Markdown artifacts up to this size are pre-rendered to HTML at finalize (0 disables)
+MARKDOWN_RENDER_MAX_BYTES = int(os.environ.get('MARKDOWN_RENDER_MAX_BYTES', 4 * 1024 * 1024))
+
+def env_number(name, cast=float, default=None):
+    """Read an optional numeric setting from the environment (unset or empty gives the default)"""
+    value = os.environ.get(name, '').strip()
+    return cast(value) if value else default
+
+# Revision chains for artifacts re-emitted under the same title in a session
+artifact_revisions = ArtifactRevisions(
+    artifact_catalogue,
+    artifact_storage,
+    snapshot_interval=env_number('ARTIFACT_SNAPSHOT_INTERVAL', int, 10)
+)
+
+# Artifact and log retention (each policy is disabled when unset)
+artifact_sweeper = ArtifactSweeper(
+    artifact_catalogue,
+    artifact_storage,
+    artifact_revisions,
+    artifact_layout,
+    LOGS_DIR,
+    max_age_days=env_number('ARTIFACT_MAX_AGE_DAYS'),
+    quota_bytes=env_number('ARTIFACT_QUOTA_BYTES', int),
+    max_per_session=env_number('ARTIFACT_MAX_PER_SESSION', int),
+    log_max_age_days=env_number('LOG_MAX_AGE_DAYS'),
+    orphan_grace_seconds=env_number('ARTIFACT_ORPHAN_GRACE_SECONDS', int, 3600),
+    interval_seconds=env_number('ARTIFACT_GC_INTERVAL_SECONDS', int, 3600)
+)
+artifact_sweeper.add_removal_listener(search_index.remove_artifact)
+
+# Session/API event logs and debug dumps, written as JSON by a background thread
+log_writer = JsonLogWriter(
+    LOGS_DIR,
+    batch_size=env_number('LOG_BATCH_SIZE', int, 500),
+    flush_interval=env_number('LOG_FLUSH_INTERVAL_SECONDS', float, 0.2)
+)
 
 def log_session_interaction(session_id, event_type, data, error=None):
-    """Log session interactions for debugging"""
+    """Log session interactions for debugging (one line in sessions_YYYYMMDD.log)"""
     log_entry = {
         'timestamp': datetime.now().isoformat(),
+        'level': 'ERROR' if error else 'INFO',
         'session_id': session_id,
         'event_type': event_type,
-        'data': data,
-        'error': str(error) if error else None
+        'data': data
     }
-    
     if error:
-        session_logger.error(f"SESSION_ERROR: {json.dumps(log_entry, indent=2)}")
-    else:
-        session_logger.info(f"SESSION_EVENT: {json.dumps(log_entry, indent=2)}")
+        log_entry['error'] = str(error)
+    log_writer.log('sessions', log_entry)
 
 def log_api_interaction(session_id, event_type, payload=None, response_data=None, error=None):
-    """Log API interactions for debugging"""
+    """Log API interactions for debugging (one line in api_interactions_YYYYMMDD.log)"""
     log_entry = {
         'timestamp': datetime.now().isoformat(),
+        'level': 'ERROR' if error else 'INFO',
         'session_id': session_id,
         'event_type': event_type,
         'payload': payload,
-        'response_data': response_data,
-        'error': str(error) if error else None
+        'response_data': response_data
     }
-    
     if error:
-        api_logger.error(f"API_ERROR: {json.dumps(log_entry, indent=2)}")
-    else:
-        api_logger.info(f"API_EVENT: {json.dumps(log_entry, indent=2)}")
+        log_entry['error'] = str(error)
+    log_writer.log('api_interactions', log_entry)
 
 def save_session_debug_log(session_id, messages, response_content, error=None, user_agent=None, ip_address=None):
-    """Save a complete session debug log to a separate file"""
+    """Save a complete session debug log to a separate file (written in the background)"""
     timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    debug_log_file = os.path.join(LOGS_DIR, f'session_debug_{session_id}_{timestamp_str}.json')
-    
-    debug_data = {
+    log_writer.dump(f'session_debug_{session_id}_{timestamp_str}.json', {
         'session_id': session_id,
         'timestamp': datetime.now().isoformat(),
         'messages': messages,
@@ -125,14 +172,7 @@ def save_session_debug_log(session_id, messages, response_content, error=None, u
             'ip_address': ip_address or 'Unknown',
             'content_length': len(response_content) if response_content else 0
         }
-    }
-    
-    try:
-        with open(debug_log_file, 'w', encoding='utf-8') as f:
-            json.dump(debug_data, f, indent=2, ensure_ascii=False)
-        logger.info(f"Debug log saved: {debug_log_file}")
-    except Exception as e:
-        logger.error(f"Failed to save debug log: {e}")
+    })
 
 def convert_haml_to_html_content(haml_content):
     """Convert HAML content to HTML using our custom processor"""
@@ -159,15 +199,8 @@ def save_artifact_to_file(artifact):
         if not content:
             raise ValueError("Artifact content is empty")
         
-        # Process HAML content to HTML if needed
+        # HAML to HTML conversion happens in the background post-processing job
         original_type = artifact.get('type', 'text')
-        if original_type == 'haml':
-            try:
-                content = convert_haml_to_html_content(content)
-                logger.info(f"Successfully converted HAML to HTML ({len(content)} chars)")
-            except Exception as e:
-                logger.error(f"HAML conversion failed: {e}")
-                raise ValueError(f"Failed to process HAML content: {str(e)}")
         
         # Generate unique filename using timestamp and random ID
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -217,20 +250,7 @@ def save_artifact_to_file(artifact):
             safe_title = 'Untitled'
         
         filename = f"{timestamp}_{safe_title}_{unique_id}{extension}"
-        filepath = os.path.join(ARTIFACTS_DIR, filename)
-        
-        # Create metadata
-        metadata = {
-            'id': artifact.get('id'),
-            'title': title,
-            'type': artifact.get('type', 'text'),
-            'original_type': original_type,  # Preserve original type for HAML artifacts
-            'language': artifact.get('language'),
-            'created_at': datetime.now().isoformat(),
-            'filename': filename,
-            'content_length': len(content),
-            'processed': original_type == 'haml'  # Flag to indicate content was processed
-        }
+        filepath = artifact_layout.create_path(filename)
         
         # Save the artifact content
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -245,50 +265,342 @@ def save_artifact_to_file(artifact):
         if actual_size == 0:
             raise IOError(f"File was created but is empty: {filepath}")
         
-        # Save metadata file
-        metadata_filename = f"{timestamp}_{safe_title}_{unique_id}.meta.json"
-        metadata_filepath = os.path.join(ARTIFACTS_DIR, metadata_filename)
-        
-        with open(metadata_filepath, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-        
         # Return permalink path
         permalink = f"/artifacts/{filename}"
         
+        # Queue conversion and cataloguing off the request path
+        job_id = artifact_processor.submit(filepath, {
+            **artifact,
+            'permalink': permalink,
+            'original_type': original_type,
+            'streaming_created': False
+        })
+        
         logger.info(f"Artifact saved successfully: {filepath} ({actual_size} bytes)")
-        return {'success': True, 'permalink': permalink, 'filename': filename, 'size': actual_size}
+        return {'success': True, 'permalink': permalink, 'filename': filename, 'size': actual_size, 'job_id': job_id}
         
     except Exception as e:
         error_msg = f"Failed to save artifact: {str(e)}"
         logger.error(error_msg)
         return {'success': False, 'error': error_msg, 'error_type': type(e).__name__}
 
+def process_haml_artifact(job):
+    """Post-processing step: convert a saved HAML artifact to HTML in place"""
+    artifact = job['artifact']
+    if artifact.get('original_type', artifact.get('type')) != 'haml':
+        return None
+
+    filepath = job['filepath']
+    with open(filepath, 'r', encoding='utf-8') as f:
+        haml_content = f.read()
+
+    html_content = convert_haml_to_html_content(haml_content)
+
+    # Write to a temporary file and swap it in so readers never see a partial file
+    temp_filepath = f"{filepath}.processing"
+    with open(temp_filepath, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    os.replace(temp_filepath, filepath)
+
+    logger.info(f"Successfully converted HAML to HTML ({len(html_content)} chars)")
+    return {'processed': True}
+
+def compute_file_hash(filepath):
+    """Compute the SHA-256 hex digest of a file without loading it all into memory"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def link_artifact_revision(job):
+    """Post-processing step: link the artifact into its revision chain (snapshot or delta)"""
+    artifact = job['artifact']
+    with open(job['filepath'], 'rb') as f:
+        body = f.read()
+    job['content_hash'] = hashlib.sha256(body).hexdigest()
+    
+    revision = artifact_revisions.plan(
+        os.path.basename(job['permalink']),
+        artifact.get('session_id'),
+        artifact.get('title'),
+        body,
+        job['content_hash']
+    )
+    if not revision:
+        return None
+    
+    job['revision'] = revision
+    if revision.get('base_filename'):
+        revision['base_permalink'] = f"/artifacts/{revision['base_filename']}"
+    return {'revision': revision}
+
+def store_artifact_content(job):
+    """Post-processing step: place the artifact body in content-addressed storage"""
+    filepath = job['filepath']
+    content_hash = job.get('content_hash') or compute_file_hash(filepath)
+    upload = streaming_uploads.pop(filepath, None)
+    
+    revision = job.get('revision')
+    if revision and revision['kind'] == 'delta' and not artifact_storage.shared:
+        # The body is rebuilt from the revision chain; nothing to store
+        if upload:
+            upload.abort()
+        job['content_hash'] = content_hash
+        job['storage_path'] = f"delta:{revision['base_filename']}"
+        return {'content_hash': content_hash, 'deduplicated': False}
+    
+    # Reuse the multipart upload streamed while the artifact was generated, if any
+    stored = artifact_storage.ingest(filepath, content_hash, upload)
+
+    # The local file keeps serving the permalink until the catalogue points at the object
+    job['content_hash'] = content_hash
+    job['storage_path'] = stored['location']
+
+    if stored['deduplicated']:
+        logger.info(f"Artifact {job['permalink']} deduplicated to existing object {content_hash[:12]}")
+    return {'content_hash': content_hash, 'deduplicated': stored['deduplicated']}
+
+def compress_artifact(job):
+    """Post-processing step: store precompressed gzip (and br) variants for text artifacts"""
+    filepath = job['filepath']
+    content_hash = job['content_hash']
+    extension = os.path.splitext(job['permalink'] or filepath)[1].lower()
+    if extension not in COMPRESSIBLE_EXTENSIONS or job['storage_path'].startswith('delta:'):
+        return None
+
+    if job['step_results'].get('deduplicated'):
+        # Variants were produced when the object was first stored
+        existing = [encoding for encoding in ENCODING_SUFFIXES if artifact_storage.has_variant(content_hash, encoding)]
+        if existing:
+            job['encodings'] = existing
+            return None
+
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return None
+
+    encodings = store_compressed_variants(content_hash, raw)
+    job['encodings'] = [encoding for encoding in ENCODING_SUFFIXES if encoding in encodings]
+    return {'encodings': encodings}
+
+def store_compressed_variants(content_hash, raw, rendition=None):
+    """Store gzip (and br) variants of a body or rendition; returns {encoding: size} for those kept"""
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return {}
+
+    variants = {'gzip': gzip.compress(raw, compresslevel=9)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(raw, quality=11)
+
+    encodings = {}
+    for encoding, body in variants.items():
+        # Keep only variants that actually save bytes
+        if len(body) >= len(raw):
+            continue
+        artifact_storage.put_variant(content_hash, encoding, body, rendition=rendition)
+        encodings[encoding] = len(body)
+    return encodings
+
+def render_markdown_artifact(job):
+    """Post-processing step: pre-render markdown artifacts to sanitized, highlighted HTML"""
+    artifact = job['artifact']
+    filepath = job['filepath']
+    content_hash = job['content_hash']
+    if artifact.get('type') != 'markdown' or not markdown_renderer.is_available():
+        return None
+    if os.path.getsize(filepath) > MARKDOWN_RENDER_MAX_BYTES:
+        return None
+
+    if job['step_results'].get('deduplicated') and artifact_storage.has_variant(content_hash, None, rendition='html'):
+        # Rendered when the object was first stored
+        job['rendered_encodings'] = [encoding for encoding in ENCODING_SUFFIXES
+                                     if artifact_storage.has_variant(content_hash, encoding, rendition='html')]
+        return {'rendered': True}
+
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        rendered = markdown_renderer.render_markdown(f.read()).encode('utf-8')
+
+    artifact_storage.put_variant(content_hash, None, rendered, rendition='html')
+    encodings = store_compressed_variants(content_hash, rendered, rendition='html')
+    job['rendered_encodings'] = [encoding for encoding in ENCODING_SUFFIXES if encoding in encodings]
+    logger.info(f"Rendered markdown artifact {job['permalink']} to {len(rendered)} bytes of HTML")
+    return {'rendered': True, 'rendered_bytes': len(rendered)}
+
+def index_artifact(job):
+    """Post-processing step: queue the artifact's text for full-text search"""
+    artifact = job['artifact']
+    with open(job['filepath'], 'r', encoding='utf-8', errors='replace') as f:
+        content = f.read()
+    search_index.add_artifact(
+        os.path.basename(job['permalink']),
+        artifact.get('title', 'Untitled'),
+        content,
+        artifact.get('type', 'text'),
+        artifact.get('session_id')
+    )
+    return None
+
+def catalogue_artifact(job):
+    """Post-processing step: record a finalized artifact in the SQLite catalogue"""
+    artifact = job['artifact']
+    filepath = job['filepath']
+    filename = os.path.basename(job['permalink'])
+    original_type = artifact.get('original_type', artifact.get('type', 'text'))
+    size_bytes = os.path.getsize(filepath)
+    content_hash = job.get('content_hash') or compute_file_hash(filepath)
+    encodings = ','.join(job.get('encodings', []))
+    rendered_encodings = ','.join(job['rendered_encodings']) if 'rendered_encodings' in job else None
+    created_at = datetime.now().isoformat()
+
+    artifact_catalogue.record({
+        'filename': filename,
+        'artifact_id': artifact.get('id'),
+        'session_id': artifact.get('session_id'),
+        'title': artifact.get('title', 'Untitled'),
+        'type': artifact.get('type', 'text'),
+        'original_type': original_type,  # Preserve original type for HAML artifacts
+        'language': artifact.get('language'),
+        'size_bytes': size_bytes,
+        'content_hash': content_hash,
+        'created_at': created_at,
+        'storage_path': job.get('storage_path', filepath),
+        'streaming_created': artifact.get('streaming_created', True),
+        'processed': original_type == 'haml',  # Flag to indicate content was processed
+        'encodings': encodings,
+        'rendered_encodings': rendered_encodings
+    })
+
+    # Let other nodes sharing the store resolve this permalink too
+    artifact_storage.link_permalink(filename, {
+        'content_hash': content_hash,
+        'size_bytes': size_bytes,
+        'encodings': encodings,
+        'rendered_encodings': rendered_encodings,
+        'created_at': created_at
+    })
+
+    # The permalink now resolves through the catalogue, so drop the local staging copy
+    if job.get('storage_path') and job['storage_path'] != filepath and os.path.exists(filepath):
+        os.remove(filepath)
+
+    return {'size': size_bytes, 'content_hash': content_hash}
+
+# Register artifact post-processing steps (run in order by the worker pool)
+artifact_processor.register_step('haml', process_haml_artifact)
+artifact_processor.register_step('revision', link_artifact_revision)
+artifact_processor.register_step('store', store_artifact_content)
+artifact_processor.register_step('compress', compress_artifact)
+artifact_processor.register_step('render', render_markdown_artifact)
+artifact_processor.register_step('index', index_artifact)
+artifact_processor.register_step('catalogue', catalogue_artifact)
+artifact_processor.job_store = artifact_catalogue  # Status polls may reach any worker
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
 
+@app.before_request
+def start_background_maintenance():
+    """Start per-process background threads on the first request (after any fork)"""
+    artifact_sweeper.ensure_started()
+    session_store.ensure_started()
+
 # Initialize Anthropic client
 CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY')
 if not CLAUDE_API_KEY:
     raise ValueError("CLAUDE_API_KEY environment variable is required. Please check your configuration.")
 claude_client = None  # Initialize lazily to avoid startup issues
 
-# Global variables for session management
-chat_sessions = {}
-context_managers = {}  # Store context manager per session
-
-def get_session_context_manager(session_id: str) -> ContextManager:
-    """Get or create a context manager for a specific session"""
-    if session_id not in context_managers:
-        context_managers[session_id] = ContextManager(
-            context_window=CONTEXT_WINDOW,
-            warning_threshold=0.7,
-            soft_limit_threshold=0.8,
-            hard_limit_threshold=0.9
-        )
-    return context_managers[session_id]
+# Thread pool for finalizing independent artifacts concurrently at the end of a stream
+finalize_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='artifact-finalize')
+
+# Sessions idle this long leave memory for compressed blobs on disk (0 disables hibernation)
+SESSION_HIBERNATE_AFTER_SECONDS = env_number('SESSION_HIBERNATE_AFTER_SECONDS', float, 600)
+SESSION_IDLE_TTL_SECONDS = env_number('SESSION_IDLE_TTL_SECONDS', float, 86400)
+
+# In-process session histories, bounded by count, estimated bytes and idle time (least recently used go first)
+chat_sessions = SessionRegistry(
+    max_sessions=env_number('SESSION_MAX_COUNT', int, 1000),
+    max_bytes=env_number('SESSION_MAX_BYTES', int),
+    idle_ttl_seconds=SESSION_HIBERNATE_AFTER_SECONDS or SESSION_IDLE_TTL_SECONDS
+)
+
+# Orders overlapping requests for one session (double submit, two tabs); others run in parallel.
+# SESSION_BUSY_POLICY: queue (wait for the running request), reject (409) or cancel (stop it, go next)
+session_locks = SessionLocks(
+    stripes=env_number('SESSION_LOCK_STRIPES', int, 64),
+    policy=os.environ.get('SESSION_BUSY_POLICY', 'queue'),
+    wait_timeout_seconds=env_number('SESSION_LOCK_TIMEOUT_SECONDS', float, 120)
+)
+
+# Shared by all sessions; per-session context state lives on each history
+context_manager = ContextManager(
+    context_window=CONTEXT_WINDOW,
+    warning_threshold=0.7,
+    soft_limit_threshold=0.8,
+    hard_limit_threshold=0.9,
+    summary_threshold=CONTEXT_SUMMARY_THRESHOLD,
+    recall_token_budget=CONTEXT_RECALL_TOKENS,
+    token_counter=token_counter
+)
+
+# Cold tier: sessions evicted from chat_sessions are kept on disk until idle for SESSION_IDLE_TTL_SECONDS
+session_hibernator = SessionHibernator(
+    context_manager,
+    os.environ.get('SESSION_HIBERNATE_DIR') or DEFAULT_HIBERNATE_DIR,
+    codec=os.environ.get('SESSION_HIBERNATE_CODEC', 'zlib'),
+    level=env_number('SESSION_HIBERNATE_LEVEL', int),
+    max_age_seconds=SESSION_IDLE_TTL_SECONDS
+) if SESSION_HIBERNATE_AFTER_SECONDS else None
+
+# Durable store shared by all workers (SQLite log), with chat_sessions as its read-through cache
+session_store = create_session_store(context_manager, chat_sessions, os.environ.get('SESSION_STORE', 'sqlite'),
+                                     os.environ.get('SESSION_DB_PATH'), session_hibernator,
+                                     env_number('SESSION_SWEEP_INTERVAL_SECONDS', float, 60))
+
+def estimate_request_tokens(payload):
+    """
+    Our input token estimate for an API request, compared with the billed usage to calibrate
+    the counter. Counted like context management counts (same per-message overhead), so the
+    calibrated scale applies to its counts as they are.
+    """
+    unscaled = token_counter.count_unscaled(payload.get('system', ''))
+    for message in payload.get('messages', []):
+        content = message['content']
+        unscaled += token_counter.count_unscaled(content if isinstance(content, str) else json.dumps(content))
+        unscaled += MESSAGE_OVERHEAD_TOKENS
+    if payload.get('tools'):
+        unscaled += token_counter.count_unscaled(json.dumps(payload['tools']))
+    return int(unscaled * token_counter.scale)
+
+def summarize_conversation(previous_summary, messages):
+    """Fold older turns into a session's rolling summary with the (fast) summary model"""
+    import requests
+    response = requests.post(
+        'https://api.anthropic.com/v1/messages',
+        json={
+            'model': CONTEXT_SUMMARY_MODEL,
+            'max_tokens': 1024,
+            'system': SUMMARY_SYSTEM_PROMPT,
+            'messages': [{'role': 'user', 'content': build_summary_prompt(previous_summary, messages)}]
+        },
+        headers={
+            'Content-Type': 'application/json',
+            'X-API-Key': CLAUDE_API_KEY,
+            'anthropic-version': '2023-06-01'
+        },
+        timeout=(10, 60)
+    )
+    if response.status_code != 200:
+        raise Exception(f"API error: {response.status_code} - {response.text}")
+    return ''.join(block.get('text', '') for block in response.json().get('content', [])
+                   if block.get('type') == 'text').strip()
+
+conversation_summarizer = ConversationSummarizer(summarize_conversation if CONTEXT_SUMMARY_MODEL else None)
 
-def stream_claude_response(messages, session_id=None, slide_api_key=None):
+def stream_claude_response(messages, session_id=None, slide_api_key=None, history_summary=None, recalled_history=None):
     """Direct HTTP streaming to Claude API with proper MCP tool integration"""
     headers = {
         'Content-Type': 'application/json',
@@ -368,6 +680,12 @@ The artifact tags help the interface properly display and manage your creations.
 NOTE: HAML artifacts are particularly useful for reducing token usage while creating HTML content. When you use HAML, the content is automatically converted to HTML when saved, but the source view shows the original HAML for reference.
 
 """
+    if history_summary:
+        # Older turns were pruned from the history; their summaries stand in for them
+        system_message += f"\nEARLIER CONVERSATION (summarized to save context):\n{history_summary}\n"
+    if recalled_history:
+        # Pruned messages retrieved for this turn's question
+        system_message += f"\nRELEVANT EARLIER MESSAGES (retrieved from pruned history):\n{recalled_history}\n"
 
     # Get MCP tools if API key is available
     tools = []
@@ -421,6 +739,8 @@ NOTE: HAML artifacts are particularly useful for reducing token usage while crea
                 safe_payload['messages'] = safe_messages
             log_api_interaction(session_id, 'api_request', safe_payload)
         
+        estimated_input_tokens = estimate_request_tokens(payload)
+        
         try:
             import requests
             response = requests.post(
@@ -455,7 +775,13 @@ NOTE: HAML artifacts are particularly useful for reducing token usage while crea
                     try:
                         data = json.loads(data_str)
                         
-                        if data.get('type') == 'content_block_start':
+                        if data.get('type') == 'message_start':
+                            # Billed input tokens keep the local token counter calibrated
+                            usage = data.get('message', {}).get('usage', {})
+                            if usage.get('input_tokens'):
+                                token_counter.calibrate(estimated_input_tokens, usage['input_tokens'])
+                        
+                        elif data.get('type') == 'content_block_start':
                             block = data.get('content_block', {})
                             if block.get('type') == 'tool_use':
                                 # Start of a tool use block
@@ -641,6 +967,7 @@ def index():
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages and return streaming response"""
+    turn = None
     try:
         data = request.get_json()
         message = data.get('message', '').strip()
@@ -657,39 +984,55 @@ def chat():
             'ip_address': request.remote_addr
         })
         
-        # Initialize or get existing session
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = []
+        # Hold the session's turn until the response stream ends, so overlapping
+        # requests cannot interleave appends or overwrite each other's rewrites
+        try:
+            turn = session_locks.acquire(session_id)
+        except SessionBusy as e:
+            log_session_interaction(session_id, 'session_busy', {'policy': session_locks.policy, 'error': str(e)})
+            return jsonify({'error': str(e), 'type': 'session_busy'}), 409
+        
+        # Initialize or get existing session (the history keeps a running token total)
+        session_history, created = session_store.get_or_create(session_id)
+        if created:
             log_session_interaction(session_id, 'session_created', {'session_id': session_id})
         
         # Add user message to session
-        chat_sessions[session_id].append({
+        user_timestamp = datetime.now().isoformat()
+        session_history = session_store.append(session_id, {
             'role': 'user',
             'content': message,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': user_timestamp
         })
+        search_index.add_message(session_id, 'user', message, user_timestamp)
         
         log_session_interaction(session_id, 'user_message_added', {
-            'message_count': len(chat_sessions[session_id]),
+            'message_count': len(session_history),
             'message_preview': message[:100] + '...' if len(message) > 100 else message
         })
         
-        # Apply context management to session messages
-        context_manager = get_session_context_manager(session_id)
-        session_messages = chat_sessions[session_id]
-        
         # Create a simple system message for context management
         system_message_preview = "You are Claude, an AI assistant integrated with Slide backup and disaster recovery systems."
         
-        managed_messages, management_info = context_manager.manage_context(session_messages, system_message_preview)
+        # Apply context management to session messages
+        managed_messages, management_info = context_manager.manage_context(session_history, system_message_preview)
         
         # Update session with managed messages if optimization was applied
         if management_info['action'] != 'none':
-            chat_sessions[session_id] = managed_messages
+            session_store.replace(session_id, session_history, managed_messages)
+            session_history = managed_messages
             log_session_interaction(session_id, 'context_management', management_info)
         
-        # Get context status information 
-        state = context_manager.get_context_state(session_messages, system_message_preview)
+        # Bring back pruned passages this message may refer to
+        recalled = context_manager.recall(session_history, message)
+        if recalled:
+            log_session_interaction(session_id, 'history_recalled', {
+                'passages': len(recalled),
+                'seqs': [passage['seq'] for passage in recalled]
+            })
+        
+        # Get context status information (manage_context already computed it)
+        state = management_info.get('state') or context_manager.get_context_state(session_history, system_message_preview)
         status_msg = context_manager.get_context_status_message(state)
         context_status_to_send = None
         context_percentage = None
@@ -713,16 +1056,16 @@ def chat():
             response_content = ""  # Initialize outside try block for error handling
             
             try:
-                # Get the session context manager for this session
-                context_manager = get_session_context_manager(session_id)
-                
                 # Prepare messages for Claude API using managed messages
-                for msg in chat_sessions[session_id]:
-                    if msg['role'] in ['user', 'assistant']:
+                history_summaries = []
+                for msg in session_history:
+                    if msg.role in ('user', 'assistant'):
                         messages.append({
-                            'role': msg['role'],
-                            'content': msg['content']
+                            'role': msg.role,
+                            'content': msg.content
                         })
+                    elif msg.is_summary:
+                        history_summaries.append(msg.content)
                 
                 # Send context status message if available 
                 if context_status_to_send:
@@ -737,11 +1080,14 @@ def chat():
                 chat_content = ""  # Content to show in chat (excluding artifacts)
                 inside_artifact = False  # Track if we're currently inside an artifact
                 
-                for text_chunk in stream_claude_response(messages, session_id, slide_api_key):
+                for text_chunk in stream_claude_response(messages, session_id, slide_api_key, '\n'.join(history_summaries),
+                                                     format_recalled(recalled)):
+                    if turn.is_cancelled:
+                        break  # A newer request for this session took over (SESSION_BUSY_POLICY=cancel)
                     response_content += text_chunk
                     
                     # Check for artifacts in the current content and stream them
-                    artifacts_update = parse_streaming_artifacts(response_content, current_artifacts)
+                    artifacts_update = parse_streaming_artifacts(response_content, current_artifacts, session_id)
                     if artifacts_update:
                         yield f"data: {json.dumps({'type': 'artifacts_update', 'content': artifacts_update})}\n\n"
                     
@@ -756,84 +1102,9 @@ def chat():
                 # Final cleanup: finalize incomplete artifacts and remove empty ones
                 # IMPORTANT: Wrap this in try-catch to ensure completion signal is always sent
                 try:
-                    final_artifacts_update = []
-                    artifacts_to_remove = []
-                    save_errors = []  # Track save errors to report to user
-                    
-                    for artifact_start, artifact_data in current_artifacts.items():
-                        if not artifact_data.get('complete', False):
-                            # Check if artifact has meaningful content
-                            content = artifact_data.get('content', '').strip()
-                            if len(content) > 10:  # Only keep artifacts with substantial content
-                                artifact_data['complete'] = True
-                                
-                                # Finalize streaming artifact file if it exists
-                                if 'filepath' in artifact_data and os.path.exists(artifact_data['filepath']):
-                                    try:
-                                        finalize_result = finalize_artifact_file(artifact_data['filepath'], artifact_data)
-                                        if finalize_result['success']:
-                                            artifact_data['saved_size'] = finalize_result['size']
-                                            logger.info(f"Successfully finalized streaming artifact {artifact_data.get('id', 'unknown')}: {artifact_data.get('permalink', 'unknown')}")
-                                        else:
-                                            artifact_data['save_error'] = finalize_result['error']
-                                            save_errors.append({
-                                                'artifact_id': artifact_data.get('id', 'unknown'),
-                                                'artifact_title': artifact_data.get('title', 'Untitled'),
-                                                'error': finalize_result['error'],
-                                                'error_type': 'FinalizationError'
-                                            })
-                                            logger.error(f"Failed to finalize streaming artifact {artifact_data.get('id', 'unknown')}: {finalize_result['error']}")
-                                    except Exception as finalize_error:
-                                        error_msg = f"Unexpected error finalizing artifact: {str(finalize_error)}"
-                                        artifact_data['save_error'] = error_msg
-                                        save_errors.append({
-                                            'artifact_id': artifact_data.get('id', 'unknown'),
-                                            'artifact_title': artifact_data.get('title', 'Untitled'),
-                                            'error': error_msg,
-                                            'error_type': type(finalize_error).__name__
-                                        })
-                                        logger.error(f"Unexpected error finalizing artifact {artifact_data.get('id', 'unknown')}: {finalize_error}")
-                                elif 'file_error' in artifact_data:
-                                    # Artifact had file creation error, try fallback save
-                                    try:
-                                        save_result = save_artifact_to_file(artifact_data)
-                                        if save_result['success']:
-                                            artifact_data['permalink'] = save_result['permalink']
-                                            artifact_data['filename'] = save_result['filename']
-                                            artifact_data['saved_size'] = save_result['size']
-                                            # Remove file_error since fallback worked
-                                            artifact_data.pop('file_error', None)
-                                            logger.info(f"Successfully saved artifact via fallback {artifact_data.get('id', 'unknown')}: {save_result['permalink']}")
-                                        else:
-                                            save_errors.append({
-                                                'artifact_id': artifact_data.get('id', 'unknown'),
-                                                'artifact_title': artifact_data.get('title', 'Untitled'),
-                                                'error': save_result['error'],
-                                                'error_type': save_result.get('error_type', 'Unknown')
-                                            })
-                                    except Exception as save_error:
-                                        error_msg = f"Fallback save failed: {str(save_error)}"
-                                        save_errors.append({
-                                            'artifact_id': artifact_data.get('id', 'unknown'),
-                                            'artifact_title': artifact_data.get('title', 'Untitled'),
-                                            'error': error_msg,
-                                            'error_type': type(save_error).__name__
-                                        })
-                                
-                                final_artifacts_update.append(artifact_data)
-                            else:
-                                # Remove empty artifacts and clean up any files
-                                if 'filepath' in artifact_data and os.path.exists(artifact_data['filepath']):
-                                    try:
-                                        os.remove(artifact_data['filepath'])
-                                        logger.info(f"Cleaned up empty artifact file: {artifact_data['filepath']}")
-                                    except Exception as cleanup_error:
-                                        logger.warning(f"Failed to clean up empty artifact file {artifact_data['filepath']}: {cleanup_error}")
-                                
-                                artifacts_to_remove.append({
-                                    'id': artifact_data['id'],
-                                    'action': 'remove'
-                                })
+                    final_artifacts_update, artifacts_to_remove, save_errors = finalize_streaming_artifacts(
+                        list(current_artifacts.values())
+                    )
                     
                     # Send final updates for completed artifacts
                     if final_artifacts_update:
@@ -853,19 +1124,35 @@ def chat():
                     # Send error notification about artifact processing failure
                     yield f"data: {json.dumps({'type': 'artifact_processing_error', 'content': {'error': str(artifact_error)}})}\n\n"
                 
+                # Report artifacts whose post-processing already finished; the client
+                # polls /artifacts/jobs/<job_id> for the rest instead of holding the stream open
+                job_ids = [artifact['job_id'] for artifact in current_artifacts.values() if artifact.get('job_id')]
+                for job in artifact_processor.get_ready_jobs(job_ids):
+                    yield f"data: {json.dumps({'type': 'artifact_ready', 'content': job})}\n\n"
+                
                 # Add assistant response to session (use chat content without artifacts)
-                assistant_content = chat_content if chat_content.strip() else "Created an artifact for you."
-                chat_sessions[session_id].append({
+                if chat_content.strip():
+                    assistant_content = chat_content
+                elif turn.is_cancelled:
+                    assistant_content = "(Response interrupted by a newer message.)"
+                else:
+                    assistant_content = "Created an artifact for you."
+                assistant_timestamp = datetime.now().isoformat()
+                updated_history = session_store.append(session_id, {
                     'role': 'assistant',
                     'content': assistant_content,
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': assistant_timestamp
                 })
+                search_index.add_message(session_id, 'assistant', assistant_content, assistant_timestamp)
                 
                 # Send updated context percentage after adding assistant message
-                updated_state = context_manager.get_context_state(chat_sessions[session_id], system_message_preview)
+                updated_state = context_manager.get_context_state(updated_history, system_message_preview)
                 if updated_state and 'usage_percentage' in updated_state:
                     yield f"data: {json.dumps({'type': 'context_percentage', 'percentage': updated_state['usage_percentage']})}\n\n"
                 
+                # Past the summary threshold, fold older turns into the rolling summary in the background
+                conversation_summarizer.maybe_schedule(session_id, context_manager, updated_history, updated_state)
+                
                 # Log successful completion
                 log_session_interaction(session_id, 'response_completed', {
                     'response_length': len(response_content),
@@ -879,6 +1166,10 @@ def chat():
                 except Exception as log_error:
                     logger.error(f"Failed to save debug log: {log_error}")
                 
+                if turn.is_cancelled:
+                    log_session_interaction(session_id, 'response_cancelled', {'response_length': len(response_content)})
+                    yield f"data: {json.dumps({'type': 'cancelled'})}\n\n"
+                
                 # ALWAYS send completion signal - this ensures UI stops showing "working" state
                 yield f"data: {json.dumps({'type': 'complete'})}\n\n"
                 
@@ -914,8 +1205,11 @@ def chat():
                     error_type = 'stream_error'
                 
                 yield f"data: {json.dumps({'type': error_type, 'content': error_message})}\n\n"
+            
+            finally:
+                session_locks.release(turn)  # Hand the session to the next queued request
         
-        return Response(
+        response = Response(
             generate_response(),
             mimetype='text/event-stream',
             headers={
@@ -923,8 +1217,13 @@ def chat():
                 'Connection': 'keep-alive'
             }
         )
+        # A stream the client never started reading does not run the generator's finally
+        response.call_on_close(lambda: session_locks.release(turn))
+        return response
         
     except Exception as e:
+        if turn is not None:
+            session_locks.release(turn)
         logger.error(f"Error in chat endpoint: {str(e)}")
         
         # Log the endpoint error
@@ -1024,12 +1323,20 @@ def create_streaming_artifact_file(artifact_type, title, language=None, artifact
         
         # Generate filename and path
         filename = generate_artifact_filename(artifact_type, title, artifact_id)
-        filepath = os.path.join(ARTIFACTS_DIR, filename)
+        filepath = artifact_layout.create_path(filename)
         
         # Create the file
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write('')  # Create empty file
         
+        # Mirror appends to the object store while the artifact streams
+        try:
+            upload = artifact_storage.start_upload(filename)
+            if upload:
+                streaming_uploads[filepath] = upload
+        except Exception as e:
+            logger.warning(f"Failed to start streaming upload for {filename}: {e}")
+        
         permalink = f"/artifacts/{filename}"
         
         return {
@@ -1051,6 +1358,9 @@ def append_to_artifact_file(filepath, content, max_retries=3):
         try:
             with open(filepath, 'a', encoding='utf-8') as f:
                 f.write(content)
+            upload = streaming_uploads.get(filepath)
+            if upload:
+                upload.write(content)
             return True
         except (OSError, IOError) as e:
             logger.warning(f"Attempt {attempt + 1} failed to append to artifact file {filepath}: {str(e)}")
@@ -1063,8 +1373,20 @@ def append_to_artifact_file(filepath, content, max_retries=3):
             logger.error(f"Unexpected error appending to artifact file {filepath}: {str(e)}")
             return False
 
+def rewrite_artifact_file(filepath, content):
+    """Replace an artifact file's content (drops any streaming upload, which no longer matches)"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    discard_streaming_upload(filepath)
+
+def discard_streaming_upload(filepath):
+    """Abort the object-store upload mirroring a streaming artifact file, if any"""
+    upload = streaming_uploads.pop(filepath, None)
+    if upload:
+        upload.abort()
+
 def finalize_artifact_file(filepath, artifact_data):
-    """Finalize an artifact file and create metadata"""
+    """Finalize an artifact file and queue its post-processing (conversion, cataloguing)"""
     try:
         # Verify file exists and get size
         if not os.path.exists(filepath):
@@ -1074,31 +1396,17 @@ def finalize_artifact_file(filepath, artifact_data):
         if file_size == 0:
             raise IOError(f"Artifact file is empty: {filepath}")
         
-        # Create metadata file
-        filename = os.path.basename(filepath)
-        base_name = os.path.splitext(filename)[0]
-        metadata_filename = f"{base_name}.meta.json"
-        metadata_filepath = os.path.join(ARTIFACTS_DIR, metadata_filename)
-        
-        metadata = {
-            'id': artifact_data.get('id'),
-            'title': artifact_data.get('title', 'Untitled'),
-            'type': artifact_data.get('type', 'text'),
-            'language': artifact_data.get('language'),
-            'created_at': datetime.now().isoformat(),
-            'filename': filename,
-            'content_length': file_size,
+        job_id = artifact_processor.submit(filepath, {
+            **artifact_data,
+            'original_type': artifact_data.get('type', 'text'),
             'streaming_created': True
-        }
-        
-        with open(metadata_filepath, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        })
         
-        logger.info(f"Finalized artifact file: {filepath} ({file_size} bytes)")
+        logger.info(f"Finalized artifact file: {filepath} ({file_size} bytes), processing job {job_id}")
         return {
             'success': True,
             'size': file_size,
-            'metadata_file': metadata_filepath
+            'job_id': job_id
         }
     except Exception as e:
         logger.error(f"Failed to finalize artifact file {filepath}: {str(e)}")
@@ -1107,7 +1415,132 @@ def finalize_artifact_file(filepath, artifact_data):
             'error': str(e)
         }
 
-def parse_streaming_artifacts(content, current_artifacts):
+def finalize_streaming_artifact(artifact_data):
+    """
+    Finalize a single artifact left incomplete at the end of a stream.
+    Returns {'action': 'update'|'remove', 'error': dict or None} and records
+    the duration of each file step in artifact_data['timings'] (ms).
+    """
+    timings = {}
+    error = None
+
+    # Check if artifact has meaningful content
+    content = artifact_data.get('content', '').strip()
+    if len(content) <= 10:
+        # Remove empty artifacts and clean up any files
+        step_start = time.perf_counter()
+        if 'filepath' in artifact_data and os.path.exists(artifact_data['filepath']):
+            try:
+                os.remove(artifact_data['filepath'])
+                discard_streaming_upload(artifact_data['filepath'])
+                logger.info(f"Cleaned up empty artifact file: {artifact_data['filepath']}")
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to clean up empty artifact file {artifact_data['filepath']}: {cleanup_error}")
+        timings['cleanup'] = round((time.perf_counter() - step_start) * 1000, 2)
+        return {'action': 'remove', 'error': None, 'timings': timings}
+
+    artifact_data['complete'] = True
+
+    # Finalize streaming artifact file if it exists
+    if 'filepath' in artifact_data and os.path.exists(artifact_data['filepath']):
+        step_start = time.perf_counter()
+        try:
+            finalize_result = finalize_artifact_file(artifact_data['filepath'], artifact_data)
+            if finalize_result['success']:
+                artifact_data['saved_size'] = finalize_result['size']
+                artifact_data['job_id'] = finalize_result['job_id']
+                artifact_data['processing'] = True
+                logger.info(f"Successfully finalized streaming artifact {artifact_data.get('id', 'unknown')}: {artifact_data.get('permalink', 'unknown')}")
+            else:
+                artifact_data['save_error'] = finalize_result['error']
+                error = {
+                    'artifact_id': artifact_data.get('id', 'unknown'),
+                    'artifact_title': artifact_data.get('title', 'Untitled'),
+                    'error': finalize_result['error'],
+                    'error_type': 'FinalizationError'
+                }
+                logger.error(f"Failed to finalize streaming artifact {artifact_data.get('id', 'unknown')}: {finalize_result['error']}")
+        except Exception as finalize_error:
+            error_msg = f"Unexpected error finalizing artifact: {str(finalize_error)}"
+            artifact_data['save_error'] = error_msg
+            error = {
+                'artifact_id': artifact_data.get('id', 'unknown'),
+                'artifact_title': artifact_data.get('title', 'Untitled'),
+                'error': error_msg,
+                'error_type': type(finalize_error).__name__
+            }
+            logger.error(f"Unexpected error finalizing artifact {artifact_data.get('id', 'unknown')}: {finalize_error}")
+        timings['finalize'] = round((time.perf_counter() - step_start) * 1000, 2)
+    elif 'file_error' in artifact_data:
+        # Artifact had file creation error, try fallback save
+        step_start = time.perf_counter()
+        try:
+            save_result = save_artifact_to_file(artifact_data)
+            if save_result['success']:
+                artifact_data['permalink'] = save_result['permalink']
+                artifact_data['filename'] = save_result['filename']
+                artifact_data['saved_size'] = save_result['size']
+                artifact_data['job_id'] = save_result['job_id']
+                artifact_data['processing'] = True
+                # Remove file_error since fallback worked
+                artifact_data.pop('file_error', None)
+                logger.info(f"Successfully saved artifact via fallback {artifact_data.get('id', 'unknown')}: {save_result['permalink']}")
+            else:
+                error = {
+                    'artifact_id': artifact_data.get('id', 'unknown'),
+                    'artifact_title': artifact_data.get('title', 'Untitled'),
+                    'error': save_result['error'],
+                    'error_type': save_result.get('error_type', 'Unknown')
+                }
+        except Exception as save_error:
+            error_msg = f"Fallback save failed: {str(save_error)}"
+            error = {
+                'artifact_id': artifact_data.get('id', 'unknown'),
+                'artifact_title': artifact_data.get('title', 'Untitled'),
+                'error': error_msg,
+                'error_type': type(save_error).__name__
+            }
+        timings['fallback_save'] = round((time.perf_counter() - step_start) * 1000, 2)
+
+    artifact_data['timings'] = timings
+    return {'action': 'update', 'error': error, 'timings': timings}
+
+def finalize_streaming_artifacts(artifacts):
+    """
+    Finalize all incomplete artifacts concurrently.
+    Returns (artifacts_update, artifacts_to_remove, save_errors) merged in stream order.
+    """
+    pending = [artifact for artifact in artifacts if not artifact.get('complete', False)]
+
+    batch_start = time.perf_counter()
+    if len(pending) > 1:
+        # Independent artifacts touch independent files, so fan them out
+        results = list(finalize_executor.map(finalize_streaming_artifact, pending))
+    else:
+        results = [finalize_streaming_artifact(artifact) for artifact in pending]
+
+    final_artifacts_update = []
+    artifacts_to_remove = []
+    save_errors = []  # Track save errors to report to user
+
+    for artifact_data, result in zip(pending, results):
+        if result['action'] == 'remove':
+            artifacts_to_remove.append({
+                'id': artifact_data['id'],
+                'action': 'remove'
+            })
+        else:
+            final_artifacts_update.append(artifact_data)
+        if result['error']:
+            save_errors.append(result['error'])
+
+    if pending:
+        step_timings = {artifact_data.get('id', 'unknown'): result['timings'] for artifact_data, result in zip(pending, results)}
+        logger.info(f"Finalized {len(pending)} artifacts in {(time.perf_counter() - batch_start) * 1000:.1f}ms: {step_timings}")
+
+    return final_artifacts_update, artifacts_to_remove, save_errors
+
+def parse_streaming_artifacts(content, current_artifacts, session_id=None):
     """Parse artifacts from streaming content and write to files immediately"""
     artifacts_update = []
     
@@ -1146,12 +1579,12 @@ def parse_streaming_artifacts(content, current_artifacts):
             
             if file_result['success']:
                 # Write content to file
-                with open(file_result['filepath'], 'w', encoding='utf-8') as f:
-                    f.write(artifact_content)
+                append_to_artifact_file(file_result['filepath'], artifact_content)
                 
                 # Create artifact object
                 artifact = {
                     'id': artifact_id,
+                    'session_id': session_id,
                     'type': artifact_type,
                     'title': artifact_title,
                     'content': artifact_content,
@@ -1168,6 +1601,8 @@ def parse_streaming_artifacts(content, current_artifacts):
                 finalize_result = finalize_artifact_file(file_result['filepath'], artifact)
                 if finalize_result['success']:
                     artifact['saved_size'] = finalize_result['size']
+                    artifact['job_id'] = finalize_result['job_id']
+                    artifact['processing'] = True
                 
                 current_artifacts[start_pos] = artifact
                 artifacts_update.append(artifact)
@@ -1175,6 +1610,7 @@ def parse_streaming_artifacts(content, current_artifacts):
                 # Fallback to memory-based artifact if file creation fails
                 artifact = {
                     'id': artifact_id,
+                    'session_id': session_id,
                     'type': artifact_type,
                     'title': artifact_title,
                     'content': artifact_content,
@@ -1190,18 +1626,28 @@ def parse_streaming_artifacts(content, current_artifacts):
         else:
             # Update existing artifact to complete
             existing_artifact = current_artifacts[start_pos]
+            if existing_artifact.get('complete'):
+                # Already finalized on an earlier chunk - nothing changed
+                continue
+            
+            old_content = existing_artifact.get('content', '')
             existing_artifact['content'] = artifact_content
             existing_artifact['complete'] = True
             
             # Update file if it exists
             if 'filepath' in existing_artifact and os.path.exists(existing_artifact['filepath']):
-                with open(existing_artifact['filepath'], 'w', encoding='utf-8') as f:
-                    f.write(artifact_content)
+                if artifact_content.startswith(old_content):
+                    # Only the tail arrived since the last chunk; keeps the streaming upload going
+                    append_to_artifact_file(existing_artifact['filepath'], artifact_content[len(old_content):])
+                else:
+                    rewrite_artifact_file(existing_artifact['filepath'], artifact_content)
                 
                 # Finalize the file
                 finalize_result = finalize_artifact_file(existing_artifact['filepath'], existing_artifact)
                 if finalize_result['success']:
                     existing_artifact['saved_size'] = finalize_result['size']
+                    existing_artifact['job_id'] = finalize_result['job_id']
+                    existing_artifact['processing'] = True
             
             artifacts_update.append(existing_artifact)
     
@@ -1243,6 +1689,7 @@ def parse_streaming_artifacts(content, current_artifacts):
             
             artifact = {
                 'id': artifact_id,
+                'session_id': session_id,
                 'type': artifact_type,
                 'title': artifact_title,
                 'content': remaining_content,
@@ -1259,8 +1706,7 @@ def parse_streaming_artifacts(content, current_artifacts):
                 
                 # Write initial content
                 if remaining_content:
-                    with open(file_result['filepath'], 'w', encoding='utf-8') as f:
-                        f.write(remaining_content)
+                    append_to_artifact_file(file_result['filepath'], remaining_content)
             else:
                 artifact['file_error'] = file_result['error']
             
@@ -1282,8 +1728,7 @@ def parse_streaming_artifacts(content, current_artifacts):
                 else:
                     # Content has changed significantly, rewrite file
                     if 'filepath' in existing_artifact and os.path.exists(existing_artifact['filepath']):
-                        with open(existing_artifact['filepath'], 'w', encoding='utf-8') as f:
-                            f.write(remaining_content)
+                        rewrite_artifact_file(existing_artifact['filepath'], remaining_content)
                 
                 existing_artifact['content'] = remaining_content
                 artifacts_update.append(existing_artifact)
@@ -1334,15 +1779,49 @@ def version():
     """Get application version"""
     return jsonify({'version': VERSION, 'timestamp': datetime.now().isoformat()})
 
+def resolve_artifact_entry(filename):
+    """Find a finalized artifact's catalogue row, or the permalink pointer another node published"""
+    try:
+        catalogue_entry = artifact_catalogue.get(filename)
+        if catalogue_entry:
+            # Track last access for retention and reporting
+            artifact_catalogue.touch(filename)
+            return catalogue_entry
+    except Exception as e:
+        logger.warning(f"Failed to look up artifact {filename} in catalogue: {e}")
+    
+    try:
+        return artifact_storage.resolve_permalink(filename)
+    except Exception as e:
+        logger.warning(f"Failed to resolve artifact permalink {filename}: {e}")
+        return None
+
+def choose_artifact_encoding(entry, rendition=None):
+    """Pick the best precompressed variant the client accepts, or None for identity"""
+    recorded = entry.get('rendered_encodings') if rendition else entry.get('encodings')
+    if recorded is not None:
+        available = [encoding for encoding in recorded.split(',') if encoding]
+    else:
+        # Catalogued before variants were recorded
+        available = [encoding for encoding in ENCODING_SUFFIXES
+                     if artifact_storage.has_variant(entry['content_hash'], encoding, rendition)]
+    for encoding in ENCODING_SUFFIXES:
+        if encoding in available and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
 @app.route('/artifacts/<filename>')
 def serve_artifact(filename):
-    """Serve saved artifacts from the artifacts directory"""
+    """
+    Serve saved artifacts, with precompressed variants and immutable caching once finalized.
+    ?render=html serves the pre-rendered HTML fragment of a markdown artifact.
+    """
     try:
-        # Check if file exists first
-        file_path = os.path.join(ARTIFACTS_DIR, filename)
-        if not os.path.exists(file_path):
-            return jsonify({'error': 'Artifact not found'}), 404
+        rendition = request.args.get('render')
+        if rendition and rendition != 'html':
+            return jsonify({'error': f'Unknown rendition: {rendition}'}), 400
         
+
         # Determine MIME type based on file extension
         if filename.endswith('.html'):
             mimetype = 'text/html'
@@ -1357,10 +1836,268 @@ def serve_artifact(filename):
         else:
             mimetype = None  # Let Flask auto-detect
         
-        return send_from_directory(ARTIFACTS_DIR, filename, mimetype=mimetype)
+        # Only catalogued artifacts are finalized; files still streaming must not be cached
+        entry = resolve_artifact_entry(filename)
+        # Plain file in the sharded or old flat layout (still streaming, or saved before content addressing)
+        file_path = artifact_layout.locate(filename)
+        
+        if rendition and (not entry or entry.get('rendered_encodings') is None):
+            return jsonify({'error': 'Rendered artifact not available'}), 404
+        
+        if not entry or not entry.get('content_hash'):
+            if not file_path:
+                return jsonify({'error': 'Artifact not found'}), 404
+            response = send_file(file_path, mimetype=mimetype)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        content_hash = entry['content_hash']
+        if rendition:
+            mimetype = 'text/html'
+        mimetype = mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = choose_artifact_encoding(entry, rendition)
+        
+        read_url = artifact_storage.read_url(content_hash, encoding, mimetype, ARTIFACT_PRESIGN_EXPIRES,
+                                             rendition=rendition)
+        if read_url:
+            # Presigned object-store URLs expire, so the redirect itself is never cached
+            response = redirect(read_url)
+            response.headers['Cache-Control'] = 'no-store'
+            response.vary.add('Accept-Encoding')
+            return response
+        
+        # Strong ETag per representation, derived from the content hash
+        etag = content_hash + (f"-{rendition}" if rendition else '') + (f"-{encoding}" if encoding else '')
+        
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            body_path = artifact_storage.local_path(content_hash, encoding, rendition)
+            if not rendition and (entry.get('storage_path') or '').startswith('delta:'):
+                # Revision kept as a delta; rebuild it from its chain
+                body = artifact_revisions.materialize(filename)
+                if body is None:
+                    return jsonify({'error': 'Artifact revision unavailable'}), 404
+                response = Response(body, mimetype=mimetype)
+            elif body_path is None:
+                # Proxy the body from the object store
+                body = artifact_storage.open(content_hash, encoding, rendition)
+                response = Response(iter(lambda: body.read(65536), b''), mimetype=mimetype)
+            elif os.path.exists(body_path):
+                response = send_artifact_body(body_path, mimetype)
+            elif not encoding and not rendition and file_path:
+                # Catalogued before content addressing (imported sidecars)
+                response = send_artifact_body(file_path, mimetype)
+            else:
+                return jsonify({'error': 'Artifact not found'}), 404
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = ARTIFACT_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
     except FileNotFoundError:
         return jsonify({'error': 'Artifact not found'}), 404
 
+def send_artifact_body(body_path, mimetype):
+    """Send an artifact body, offloading large files to the web server when configured"""
+    file_size = os.path.getsize(body_path)
+    
+    if ARTIFACTS_ACCEL_REDIRECT_PREFIX and file_size >= ARTIFACTS_OFFLOAD_MIN_BYTES:
+        # nginx serves the bytes from its internal location
+        relative_path = os.path.relpath(body_path, ARTIFACTS_DIR).replace(os.sep, '/')
+        response = app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = ARTIFACTS_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative_path
+        return response
+    
+    if ARTIFACTS_USE_X_SENDFILE and file_size >= ARTIFACTS_OFFLOAD_MIN_BYTES:
+        response = app.response_class(mimetype=mimetype)
+        response.headers['X-Sendfile'] = body_path
+        return response
+    
+    return send_file(body_path, mimetype=mimetype, conditional=False, etag=False)
+
+@app.route('/artifacts/jobs/<job_id>')
+def artifact_job_status(job_id):
+    """Get the post-processing status of an artifact"""
+    job = artifact_processor.get_job(job_id)
+    if job is None:
+        # Unknown here (another worker's job, or long since dropped): a catalogued artifact is done
+        filename = os.path.basename(request.args.get('filename', ''))
+        if filename and artifact_catalogue.get(filename):
+            return jsonify({'job_id': job_id, 'status': 'ready', 'permalink': f"/artifacts/{filename}",
+                            'timings': {}, 'result': {}, 'error': None})
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/artifacts/jobs')
+def artifact_jobs_stats():
+    """Get artifact post-processing queue statistics"""
+    return jsonify(artifact_processor.get_stats())
+
+@app.route('/artifacts/catalogue')
+def artifact_catalogue_list():
+    """List or search catalogued artifacts (newest first, paginated)"""
+    try:
+        result = artifact_catalogue.list_artifacts(
+            session_id=request.args.get('session_id'),
+            artifact_type=request.args.get('type'),
+            query=request.args.get('q'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int)
+        )
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error listing artifact catalogue: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/artifacts/catalogue/usage')
+def artifact_catalogue_usage():
+    """Get artifact totals and bytes per day"""
+    try:
+        days = request.args.get('days', 30, type=int)
+        return jsonify({
+            'totals': artifact_catalogue.get_stats(),
+            'days': artifact_catalogue.usage_by_day(days)
+        })
+    except Exception as e:
+        logger.error(f"Error getting artifact usage: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def open_artifact_body(entry):
+    """Open a catalogued artifact's stored body for reading, or None if it is gone"""
+    if (entry.get('storage_path') or '').startswith('delta:'):
+        body = artifact_revisions.materialize(entry['filename'])
+        return io.BytesIO(body) if body is not None else None
+    if entry.get('content_hash'):
+        local_path = artifact_storage.local_path(entry['content_hash'])
+        if local_path is None:
+            return artifact_storage.open(entry['content_hash'])
+        if os.path.exists(local_path):
+            return open(local_path, 'rb')
+    
+    # Catalogued before content addressing (imported sidecars)
+    file_path = artifact_layout.locate(entry['filename'])
+    if file_path:
+        return open(file_path, 'rb')
+    return None
+
+@app.route('/artifacts/<filename>/delta')
+def artifact_delta(filename):
+    """Get the line delta that turns a previous revision (base) into this artifact"""
+    base = request.args.get('base')
+    if not base:
+        return jsonify({'error': 'base is required'}), 400
+    try:
+        delta = artifact_revisions.get_delta(filename, base)
+        if delta is None:
+            return jsonify({'error': 'Revision not found'}), 404
+        response = jsonify(delta)
+        # Both revisions are immutable, so the delta between them is too
+        response.set_etag(f"{delta['content_hash']}-from-{base}")
+        response.headers['Cache-Control'] = ARTIFACT_CACHE_CONTROL
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error computing artifact delta for {filename}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/artifacts/<filename>/revisions')
+def artifact_revision_chain(filename):
+    """List the revision chain an artifact belongs to"""
+    try:
+        chain = artifact_revisions.get_chain(filename)
+        if chain is None:
+            return jsonify({'error': 'Artifact has no revision history'}), 404
+        return jsonify({'filename': filename, 'revisions': chain})
+    except Exception as e:
+        logger.error(f"Error listing artifact revisions for {filename}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/artifacts/export')
+def export_artifacts():
+    """Stream a zip of a session's artifacts, or of listed permalink filenames, with a manifest"""
+    try:
+        session_id = request.args.get('session_id')
+        files = [name.strip() for name in request.args.get('files', '').split(',') if name.strip()]
+        if not session_id and not files:
+            return jsonify({'error': 'session_id or files is required'}), 400
+        if len(files) > ARTIFACT_EXPORT_MAX_FILES:
+            return jsonify({'error': f'At most {ARTIFACT_EXPORT_MAX_FILES} files can be exported at once'}), 400
+        
+        if files:
+            entries = artifact_catalogue.get_many(files)
+            if session_id:
+                entries = [entry for entry in entries if entry.get('session_id') == session_id]
+        else:
+            entries = artifact_catalogue.find_by_session(session_id, limit=ARTIFACT_EXPORT_MAX_FILES)
+        if not entries:
+            return jsonify({'error': 'No artifacts found'}), 404
+        
+        archive_name = re.sub(r'[^a-zA-Z0-9_\-]', '', session_id or '')[:40] or datetime.now().strftime('%Y%m%d_%H%M%S')
+        manifest_info = {
+            'session_id': session_id,
+            'requested_files': files or None
+        }
+        response = Response(
+            iter_artifact_zip(entries, open_artifact_body, COMPRESSIBLE_EXTENSIONS, manifest_info),
+            mimetype='application/zip'
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="artifacts_{archive_name}.zip"'
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Accel-Buffering'] = 'no'  # Let nginx pass chunks straight through
+        return response
+    except Exception as e:
+        logger.error(f"Error exporting artifacts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/artifacts/gc', methods=['GET', 'POST'])
+def artifact_gc():
+    """Get retention policies and sweep metrics, or run a sweep (dry run by default)"""
+    try:
+        if request.method == 'GET':
+            return jsonify(artifact_sweeper.get_status())
+        
+        data = request.get_json(silent=True) or {}
+        report = artifact_sweeper.sweep(dry_run=data.get('dry_run', True))
+        return jsonify(report)
+    except Exception as e:
+        logger.error(f"Error running artifact sweep: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/search')
+def search():
+    """Ranked full-text search over artifacts and chat messages"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        result = search_index.search(
+            query,
+            kind=request.args.get('kind'),
+            doc_type=request.args.get('type'),
+            session_id=request.args.get('session_id'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 20, type=int)
+        )
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error searching for {query!r}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/search/status')
+def search_status():
+    """Get search index size and writer statistics"""
+    try:
+        return jsonify(search_index.get_stats())
+    except Exception as e:
+        logger.error(f"Error getting search index status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/mcp/validate', methods=['POST'])
 def validate_slide_api_key():
     """Validate a Slide API key by attempting to get tools"""
@@ -1435,6 +2172,15 @@ def mcp_server_status():
         logger.error(f"Error getting MCP server status: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/sessions/status')
+def sessions_status():
+    """Session store size, cache memory use, limits, eviction, hibernation and lock metrics"""
+    try:
+        return jsonify({**session_store.get_stats(), 'locks': session_locks.get_stats()})
+    except Exception as e:
+        logger.error(f"Error getting session status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/context/status')
 def context_status():
     """Get context window usage for a session"""
@@ -1456,7 +2202,8 @@ Key capabilities:
 
 You have access to real-time data from Slide devices through integrated MCP tools."""
         
-        if session_id not in chat_sessions:
+        session_messages = session_store.get(session_id)
+        if session_messages is None:
             return jsonify({
                 'session_id': session_id,
                 'tokens_used': 0,
@@ -1468,14 +2215,20 @@ You have access to real-time data from Slide devices through integrated MCP tool
                 'tokens_remaining': CONTEXT_WINDOW
             })
         
-        # Get context manager and calculate state
-        context_manager = get_session_context_manager(session_id)
-        session_messages = chat_sessions[session_id]
+        # Calculate state
         state = context_manager.get_context_state(session_messages, system_message)
+        rolling_summary = session_messages.session.rolling_summary
         
         return jsonify({
             'session_id': session_id,
-            **state
+            **state,
+            'rolling_summary': {
+                'through_seq': rolling_summary['through_seq'],
+                'tokens': rolling_summary['tokens'],
+                'updated_at': rolling_summary['updated_at']
+            } if rolling_summary else None,
+            'summarizer': conversation_summarizer.get_stats(),
+            'token_counter': token_counter.get_stats()
         })
         
     except Exception as e:
@@ -1485,15 +2238,17 @@ You have access to real-time data from Slide devices through integrated MCP tool
 @app.route('/chat/optimize', methods=['POST'])
 def optimize_context():
     """Manually trigger context optimization for a session"""
+    turn = None
     try:
         data = request.get_json()
         session_id = data.get('session_id', 'default')
         
-        if session_id not in chat_sessions:
-            return jsonify({'error': 'Session not found'}), 404
+        # Wait for a running chat turn; the context is never rewritten mid-stream
+        turn = session_locks.acquire(session_id, policy='queue')
         
-        # Get context manager
-        context_manager = get_session_context_manager(session_id)
+        current_messages = session_store.get(session_id)
+        if current_messages is None:
+            return jsonify({'error': 'Session not found'}), 404
         
         # System message for context calculation
         system_message = """You are Claude, an AI assistant integrated with Slide backup and disaster recovery systems. 
@@ -1511,26 +2266,31 @@ Key capabilities:
 You have access to real-time data from Slide devices through integrated MCP tools."""
         
         # Force optimization
-        current_messages = chat_sessions[session_id]
         optimized_messages, management_info = context_manager.manage_context(
             current_messages, 
             system_message
         )
         
         # Update session
-        chat_sessions[session_id] = optimized_messages
+        if management_info['action'] != 'none':
+            session_store.replace(session_id, current_messages, optimized_messages)
         
         # Log the action
         log_session_interaction(session_id, 'context_optimized', management_info)
         
         return jsonify({
-            'message': f"Removed {management_info['removed']} messages, created {management_info.get('summarized', 0)} summaries",
+            'message': f"Removed {management_info['removed']} messages ({management_info.get('tokens_freed', 0):,} tokens freed), created {management_info.get('summarized', 0)} summaries",
             'management_info': management_info
         })
         
+    except SessionBusy as e:
+        return jsonify({'error': str(e), 'type': 'session_busy'}), 409
     except Exception as e:
         logger.error(f"Error optimizing context: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    finally:
+        if turn is not None:
+            session_locks.release(turn)
 
 @app.route('/logs/status')
 def logs_status():
@@ -1554,7 +2314,8 @@ def logs_status():
             'logs_directory': LOGS_DIR,
             'log_files': sorted(log_files, key=lambda x: x['modified'], reverse=True),
             'total_files': len(log_files),
-            'total_size_mb': round(sum(f['size_bytes'] for f in log_files) / (1024 * 1024), 2)
+            'total_size_mb': round(sum(f['size_bytes'] for f in log_files) / (1024 * 1024), 2),
+            'writer': log_writer.get_stats()
         })
     except Exception as e:
         logger.error(f"Error getting logs status: {str(e)}")
@@ -0,0 +1,461 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from artifact_layout import ArtifactLayout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'artifact_catalogue.db')
+
+# Columns exposed through the catalogue API, in table order
+CATALOGUE_COLUMNS = [
+    'filename', 'artifact_id', 'session_id', 'title', 'type', 'original_type',
+    'language', 'size_bytes', 'content_hash', 'created_at', 'last_accessed_at',
+    'storage_path', 'streaming_created', 'processed', 'encodings', 'rendered_encodings'
+]
+
+class ArtifactCatalogue:
+    """
+    Embedded SQLite (WAL) catalogue of saved artifacts.
+    Replaces the per-artifact .meta.json sidecars with an indexed table so
+    session listings, type filters and usage reports don't scan ARTIFACTS_DIR.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (SQLite connections are not shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS artifacts (
+                filename TEXT PRIMARY KEY,
+                artifact_id TEXT,
+                session_id TEXT,
+                title TEXT,
+                type TEXT,
+                original_type TEXT,
+                language TEXT,
+                size_bytes INTEGER NOT NULL DEFAULT 0,
+                content_hash TEXT,
+                created_at TEXT NOT NULL,
+                last_accessed_at TEXT,
+                storage_path TEXT,
+                streaming_created INTEGER NOT NULL DEFAULT 0,
+                processed INTEGER NOT NULL DEFAULT 0,
+                encodings TEXT,
+                rendered_encodings TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_artifacts_session ON artifacts (session_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_type ON artifacts (type, created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_created ON artifacts (created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_hash ON artifacts (content_hash);
+            CREATE TABLE IF NOT EXISTS artifact_revisions (
+                filename TEXT PRIMARY KEY,
+                chain_key TEXT NOT NULL,
+                revision INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                base_filename TEXT,
+                delta BLOB,
+                size_bytes INTEGER NOT NULL DEFAULT 0,
+                delta_bytes INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_revisions_chain ON artifact_revisions (chain_key, revision);
+            CREATE INDEX IF NOT EXISTS idx_revisions_hash ON artifact_revisions (content_hash);
+            CREATE TABLE IF NOT EXISTS artifact_jobs (
+                job_id TEXT PRIMARY KEY,
+                filename TEXT,
+                status TEXT NOT NULL,
+                snapshot TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_updated ON artifact_jobs (updated_at);
+        ''')
+        # Catalogues created before precompressed variants were tracked
+        existing = {row['name'] for row in conn.execute('PRAGMA table_info(artifacts)')}
+        if 'encodings' not in existing:
+            conn.execute('ALTER TABLE artifacts ADD COLUMN encodings TEXT')
+        # ...and before markdown was pre-rendered (NULL means no rendered form)
+        if 'rendered_encodings' not in existing:
+            conn.execute('ALTER TABLE artifacts ADD COLUMN rendered_encodings TEXT')
+        conn.commit()
+
+    def record(self, entry: Dict):
+        """Insert or update the catalogue row for an artifact"""
+        row = {column: entry.get(column) for column in CATALOGUE_COLUMNS}
+        row['created_at'] = row['created_at'] or datetime.now().isoformat()
+        row['size_bytes'] = row['size_bytes'] or 0
+        row['streaming_created'] = 1 if row['streaming_created'] else 0
+        row['processed'] = 1 if row['processed'] else 0
+
+        conn = self._connect()
+        placeholders = ', '.join(f':{column}' for column in CATALOGUE_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in CATALOGUE_COLUMNS
+                            if column not in ('filename', 'created_at', 'last_accessed_at'))
+        conn.execute(
+            f'INSERT INTO artifacts ({", ".join(CATALOGUE_COLUMNS)}) VALUES ({placeholders}) '
+            f'ON CONFLICT(filename) DO UPDATE SET {updates}',
+            row
+        )
+        conn.commit()
+
+    def get(self, filename: str) -> Optional[Dict]:
+        """Get the catalogue row for a permalink filename"""
+        row = self._connect().execute(
+            'SELECT * FROM artifacts WHERE filename = ?', (filename,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def touch(self, filename: str, min_interval_seconds: int = 60):
+        """Record an access; skipped if the row was touched recently to keep reads cheap"""
+        now = datetime.now()
+        cutoff = (now - timedelta(seconds=min_interval_seconds)).isoformat()
+        conn = self._connect()
+        conn.execute(
+            'UPDATE artifacts SET last_accessed_at = ? '
+            'WHERE filename = ? AND (last_accessed_at IS NULL OR last_accessed_at < ?)',
+            (now.isoformat(), filename, cutoff)
+        )
+        conn.commit()
+
+    def list_artifacts(self, session_id: Optional[str] = None, artifact_type: Optional[str] = None,
+                       query: Optional[str] = None, since: Optional[str] = None,
+                       until: Optional[str] = None, page: int = 1, per_page: int = 50) -> Dict:
+        """List artifacts newest first, filtered and paginated"""
+        page = max(1, page)
+        per_page = max(1, min(per_page, 200))
+
+        conditions = []
+        params = []
+        if session_id:
+            conditions.append('session_id = ?')
+            params.append(session_id)
+        if artifact_type:
+            conditions.append('type = ?')
+            params.append(artifact_type)
+        if query:
+            conditions.append('title LIKE ?')
+            params.append(f'%{query}%')
+        if since:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until:
+            conditions.append('created_at < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        conn = self._connect()
+        total = conn.execute(f'SELECT COUNT(*) FROM artifacts {where}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT * FROM artifacts {where} ORDER BY created_at DESC LIMIT ? OFFSET ?',
+            params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+
+        return {
+            'artifacts': [dict(row) for row in rows],
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page
+        }
+
+    def find_by_session(self, session_id: str, limit: int = 1000) -> List[Dict]:
+        """All artifacts of a session, oldest first"""
+        rows = self._connect().execute(
+            'SELECT * FROM artifacts WHERE session_id = ? ORDER BY created_at LIMIT ?',
+            (session_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_many(self, filenames: List[str]) -> List[Dict]:
+        """Catalogue rows for the given permalink filenames, in the order given"""
+        if not filenames:
+            return []
+        placeholders = ', '.join('?' for _ in filenames)
+        rows = self._connect().execute(
+            f'SELECT * FROM artifacts WHERE filename IN ({placeholders})', list(filenames)
+        ).fetchall()
+        by_filename = {row['filename']: dict(row) for row in rows}
+        return [by_filename[filename] for filename in filenames if filename in by_filename]
+
+    def usage_by_day(self, days: int = 30) -> List[Dict]:
+        """Artifact count and total bytes per day for the last N days"""
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+        rows = self._connect().execute(
+            'SELECT substr(created_at, 1, 10) AS day, COUNT(*) AS artifacts, SUM(size_bytes) AS total_bytes '
+            'FROM artifacts WHERE created_at >= ? GROUP BY day ORDER BY day DESC',
+            (since,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict:
+        """Get overall catalogue totals"""
+        row = self._connect().execute(
+            'SELECT COUNT(*) AS artifacts, COALESCE(SUM(size_bytes), 0) AS total_bytes, '
+            'COUNT(DISTINCT session_id) AS sessions FROM artifacts'
+        ).fetchone()
+        stats = dict(row)
+
+        # Bytes actually stored once identical bodies are deduplicated;
+        # revisions kept as deltas count for their delta size only
+        conn = self._connect()
+        stats['stored_bytes'] = conn.execute(
+            'SELECT COALESCE(SUM(size_bytes), 0) FROM ('
+            'SELECT MAX(size_bytes) AS size_bytes FROM artifacts '
+            "WHERE storage_path IS NULL OR storage_path NOT LIKE 'delta:%' "
+            'GROUP BY COALESCE(content_hash, filename))'
+        ).fetchone()[0] + conn.execute(
+            "SELECT COALESCE(SUM(delta_bytes), 0) FROM artifact_revisions WHERE kind = 'delta'"
+        ).fetchone()[0]
+        return stats
+
+    def find_expired(self, before: str) -> List[Dict]:
+        """Artifacts created before the given ISO timestamp"""
+        rows = self._connect().execute(
+            'SELECT * FROM artifacts WHERE created_at < ? ORDER BY created_at', (before,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_session_overflow(self, max_per_session: int) -> List[Dict]:
+        """Artifacts beyond the newest N of each session"""
+        rows = self._connect().execute(
+            'SELECT * FROM ('
+            'SELECT *, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY created_at DESC) AS session_rank '
+            'FROM artifacts WHERE session_id IS NOT NULL'
+            ') WHERE session_rank > ? ORDER BY created_at',
+            (max_per_session,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_least_recently_used(self, batch_size: int = 500):
+        """Yield artifacts ordered by last access (falling back to creation time), oldest first"""
+        conn = self._connect()
+        last_key = ('', '')
+        while True:
+            # Keyset pagination so rows deleted mid-iteration don't shift the window
+            rows = conn.execute(
+                'SELECT *, COALESCE(last_accessed_at, created_at) AS access_key FROM artifacts '
+                'WHERE (COALESCE(last_accessed_at, created_at), filename) > (?, ?) '
+                'ORDER BY access_key, filename LIMIT ?',
+                (last_key[0], last_key[1], batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_key = (rows[-1]['access_key'], rows[-1]['filename'])
+
+    def delete(self, filename: str):
+        """Remove an artifact's catalogue row"""
+        conn = self._connect()
+        conn.execute('DELETE FROM artifacts WHERE filename = ?', (filename,))
+        conn.commit()
+
+    def update_storage_path(self, filename: str, old_path: str, new_path: str):
+        """Repoint a row at a moved file (rows already pointing elsewhere are left alone)"""
+        conn = self._connect()
+        conn.execute('UPDATE artifacts SET storage_path = ? WHERE filename = ? AND storage_path = ?',
+                     (new_path, filename, old_path))
+        conn.commit()
+
+    def hash_in_use(self, content_hash: str) -> bool:
+        """Whether any permalink, or a revision snapshot deltas build on, still references a content hash"""
+        row = self._connect().execute(
+            "SELECT 1 FROM artifacts WHERE content_hash = ? AND (storage_path IS NULL OR storage_path NOT LIKE 'delta:%') "
+            "UNION ALL SELECT 1 FROM artifact_revisions WHERE content_hash = ? AND kind = 'snapshot' LIMIT 1",
+            (content_hash, content_hash)
+        ).fetchone()
+        return row is not None
+
+    def record_revision(self, revision: Dict):
+        """Insert a revision chain entry (snapshot or delta)"""
+        row = {'base_filename': None, 'delta': None, 'delta_bytes': 0,
+               'created_at': datetime.now().isoformat()}
+        row.update(revision)
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO artifact_revisions (filename, chain_key, revision, kind, content_hash, '
+            'base_filename, delta, size_bytes, delta_bytes, created_at) VALUES '
+            '(:filename, :chain_key, :revision, :kind, :content_hash, :base_filename, :delta, '
+            ':size_bytes, :delta_bytes, :created_at)',
+            row
+        )
+        conn.commit()
+
+    def get_revision(self, filename: str) -> Optional[Dict]:
+        """Get the revision chain entry for a permalink filename"""
+        row = self._connect().execute(
+            'SELECT * FROM artifact_revisions WHERE filename = ?', (filename,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def latest_revision(self, chain_key: str) -> Optional[Dict]:
+        """Newest revision of a chain that finished processing (has a catalogue row)"""
+        row = self._connect().execute(
+            'SELECT r.* FROM artifact_revisions r JOIN artifacts a ON a.filename = r.filename '
+            'WHERE r.chain_key = ? ORDER BY r.revision DESC LIMIT 1',
+            (chain_key,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def next_revision_number(self, chain_key: str) -> int:
+        row = self._connect().execute(
+            'SELECT MAX(revision) FROM artifact_revisions WHERE chain_key = ?', (chain_key,)
+        ).fetchone()
+        return (row[0] or 0) + 1
+
+    def list_revisions(self, chain_key: str) -> List[Dict]:
+        """A chain's revisions, oldest first (without delta payloads)"""
+        rows = self._connect().execute(
+            'SELECT r.filename, r.revision, r.kind, r.content_hash, r.base_filename, r.size_bytes, '
+            'r.delta_bytes, r.created_at, a.filename IS NOT NULL AS available '
+            'FROM artifact_revisions r LEFT JOIN artifacts a ON a.filename = r.filename '
+            'WHERE r.chain_key = ? ORDER BY r.revision',
+            (chain_key,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune_revisions(self, chain_key: str) -> List[str]:
+        """
+        Drop revision entries no longer needed after permalinks were deleted:
+        everything before the snapshot the oldest remaining revision builds on.
+        Returns the content hashes of dropped snapshots (their objects may now be freed).
+        """
+        conn = self._connect()
+        oldest_live = conn.execute(
+            'SELECT MIN(r.revision) FROM artifact_revisions r JOIN artifacts a ON a.filename = r.filename '
+            'WHERE r.chain_key = ?', (chain_key,)
+        ).fetchone()[0]
+        if oldest_live is None:
+            keep_from = None  # Nothing left in the chain
+        else:
+            keep_from = conn.execute(
+                "SELECT MAX(revision) FROM artifact_revisions WHERE chain_key = ? AND kind = 'snapshot' AND revision <= ?",
+                (chain_key, oldest_live)
+            ).fetchone()[0] or oldest_live
+
+        condition = 'chain_key = ?' + (' AND revision < ?' if keep_from is not None else '')
+        params = (chain_key, keep_from) if keep_from is not None else (chain_key,)
+        dropped = conn.execute(
+            f"SELECT content_hash FROM artifact_revisions WHERE {condition} AND kind = 'snapshot'", params
+        ).fetchall()
+        conn.execute(f'DELETE FROM artifact_revisions WHERE {condition}', params)
+        conn.commit()
+        return [row[0] for row in dropped]
+
+    def save_job(self, job: Dict, retention_hours: int = 24):
+        """
+        Store a post-processing job snapshot, so any worker can answer status polls
+        (jobs run on the worker that finalized the artifact). Old jobs are dropped.
+        """
+        now = datetime.now()
+        permalink = job.get('permalink')
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO artifact_jobs (job_id, filename, status, snapshot, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (job['job_id'], os.path.basename(permalink) if permalink else None, job['status'],
+             json.dumps(job, default=str), now.isoformat())
+        )
+        if job['status'] == 'queued':
+            conn.execute('DELETE FROM artifact_jobs WHERE updated_at < ?',
+                         ((now - timedelta(hours=retention_hours)).isoformat(),))
+        conn.commit()
+
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job snapshot stored by save_job"""
+        row = self._connect().execute('SELECT snapshot FROM artifact_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row['snapshot']) if row else None
+
+    def _hash_file(self, filepath: str) -> str:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def import_sidecars(self, artifacts_dir: str, delete_sidecars: bool = False) -> Dict:
+        """One-shot import of existing .meta.json sidecar files (flat or sharded layout) into the catalogue"""
+        stats = {'imported': 0, 'skipped': 0, 'errors': 0}
+
+        for entry in ArtifactLayout(artifacts_dir).iter_files():
+            if not entry.name.endswith('.meta.json'):
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+
+                filename = metadata.get('filename')
+                # Sidecars sit next to their artifact in either layout
+                filepath = os.path.join(os.path.dirname(entry.path), filename) if filename else None
+                if not filepath or not os.path.exists(filepath):
+                    stats['skipped'] += 1
+                    continue
+
+                self.record({
+                    'filename': filename,
+                    'artifact_id': metadata.get('id'),
+                    'title': metadata.get('title'),
+                    'type': metadata.get('type'),
+                    'original_type': metadata.get('original_type', metadata.get('type')),
+                    'language': metadata.get('language'),
+                    'size_bytes': os.path.getsize(filepath),
+                    'content_hash': self._hash_file(filepath),
+                    'created_at': metadata.get('created_at') or datetime.fromtimestamp(entry.stat().st_mtime).isoformat(),
+                    'storage_path': filepath,
+                    'streaming_created': metadata.get('streaming_created', False),
+                    'processed': metadata.get('processed', False)
+                })
+                stats['imported'] += 1
+
+                if delete_sidecars:
+                    os.remove(entry.path)
+            except Exception as e:
+                logger.error(f"Failed to import sidecar {entry.path}: {e}")
+                stats['errors'] += 1
+
+        logger.info(f"Sidecar import from {artifacts_dir}: {stats}")
+        return stats
+
+# Global artifact catalogue instance
+artifact_catalogue = ArtifactCatalogue()
+
+if __name__ == '__main__':
+    # Usage: python artifact_catalogue.py import-sidecars [artifacts_dir] [--delete]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'import-sidecars':
+        print("Usage: python artifact_catalogue.py import-sidecars [artifacts_dir] [--delete]")
+        sys.exit(1)
+
+    args = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+    directory = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+    print(json.dumps(artifact_catalogue.import_sidecars(directory, delete_sidecars='--delete' in sys.argv), indent=2))
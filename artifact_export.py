@@ -0,0 +1,119 @@
+import json
+import os
+import time
+import zipfile
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+DEFLATE_LEVEL = 1  # Cheap deflate: most of the win on text for little CPU
+
+class _ZipChunkBuffer:
+    """
+    Write-only sink for zipfile that hands bytes back to the generator.
+    It has no tell()/seek(), so zipfile streams entries with data descriptors
+    instead of seeking back to patch headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_artifact_zip(entries: List[Dict], open_body: Callable[[Dict], Optional[object]],
+                      compressible_extensions=(), manifest_info: Optional[Dict] = None) -> Iterator[bytes]:
+    """
+    Stream a zip of catalogued artifacts without building the archive in memory.
+    Bodies are copied in EXPORT_CHUNK_SIZE pieces; text types are deflated
+    cheaply, everything else is stored. A manifest.json is written last,
+    listing what was included and what could not be read.
+    """
+    buffer = _ZipChunkBuffer()
+    included = []
+    missing = []
+    incomplete = []
+    start = time.perf_counter()
+
+    with zipfile.ZipFile(buffer, mode='w') as archive:
+        for entry in entries:
+            filename = entry['filename']
+            try:
+                body = open_body(entry)
+            except Exception as e:
+                logger.warning(f"Export could not open artifact {filename}: {e}")
+                body = None
+            if body is None:
+                missing.append(filename)
+                continue
+
+            extension = os.path.splitext(filename)[1].lower()
+            info = zipfile.ZipInfo(filename, date_time=_zip_timestamp(entry.get('created_at')))
+            if extension in compressible_extensions:
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info._compresslevel = DEFLATE_LEVEL  # No public per-entry level before Python 3.13
+            else:
+                info.compress_type = zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+
+            try:
+                with body, archive.open(info, mode='w', force_zip64=(entry.get('size_bytes') or 0) >= zipfile.ZIP64_LIMIT) as dest:
+                    for block in iter(lambda: body.read(EXPORT_CHUNK_SIZE), b''):
+                        dest.write(block)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            except Exception as e:
+                # Headers for this entry are already sent, so it stays (truncated) in the archive
+                logger.error(f"Export failed while streaming artifact {filename}: {e}")
+                incomplete.append(filename)
+                break
+
+            included.append({
+                'filename': filename,
+                'title': entry.get('title'),
+                'type': entry.get('type'),
+                'original_type': entry.get('original_type'),
+                'language': entry.get('language'),
+                'session_id': entry.get('session_id'),
+                'size_bytes': entry.get('size_bytes'),
+                'sha256': entry.get('content_hash'),
+                'created_at': entry.get('created_at')
+            })
+            data = buffer.drain()
+            if data:
+                yield data
+
+        manifest = dict(manifest_info or {})
+        manifest.update({
+            'exported_at': datetime.now().isoformat(),
+            'artifact_count': len(included),
+            'artifacts': included,
+            'missing': missing,
+            'incomplete': incomplete
+        })
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+
+    yield buffer.drain()
+    logger.info(f"Exported {len(included)} artifacts ({len(missing)} missing) in "
+                f"{(time.perf_counter() - start) * 1000:.1f}ms")
+
+def _zip_timestamp(created_at: Optional[str]):
+    """Zip entries need a (Y, M, D, h, m, s) tuple no earlier than 1980"""
+    try:
+        moment = datetime.fromisoformat(created_at) if created_at else datetime.now()
+    except ValueError:
+        moment = datetime.now()
+    return max(moment.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
@@ -0,0 +1,286 @@
+import os
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ArtifactSweeper:
+    """
+    Background garbage collector for ARTIFACTS_DIR (via its sharded layout) and LOGS_DIR.
+    Applies retention policies (max age, total byte quota with LRU eviction,
+    per-session caps, orphaned temp/partial files, old logs) and can report
+    what it would remove without deleting anything (dry run).
+    """
+
+    def __init__(self, catalogue, storage, revisions, layout, logs_dir: str,
+                 max_age_days: Optional[float] = None, quota_bytes: Optional[int] = None,
+                 max_per_session: Optional[int] = None, log_max_age_days: Optional[float] = None,
+                 orphan_grace_seconds: int = 3600, interval_seconds: int = 3600):
+        self.catalogue = catalogue
+        self.storage = storage
+        self.revisions = revisions
+        self.layout = layout
+        self.logs_dir = logs_dir
+
+        # Policies; None disables a policy
+        self.max_age_days = max_age_days
+        self.quota_bytes = quota_bytes
+        self.max_per_session = max_per_session
+        self.log_max_age_days = log_max_age_days
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.interval_seconds = interval_seconds
+
+        self._removal_listeners = []  # Called with the filename of each removed artifact
+        self._lock = threading.Lock()  # One sweep at a time per process
+        self._thread = None
+        self._pid = None
+
+        self.metrics = {
+            'runs': 0,
+            'dry_runs': 0,
+            'bytes_reclaimed': 0,
+            'files_removed': 0,
+            'artifacts_removed': 0,
+            'last_run_at': None,
+            'last_report': None
+        }
+
+    def add_removal_listener(self, func):
+        """Register a callback run after an artifact is deleted (e.g. to drop it from an index)"""
+        self._removal_listeners.append(func)
+
+    def get_policies(self) -> Dict:
+        return {
+            'max_age_days': self.max_age_days,
+            'quota_bytes': self.quota_bytes,
+            'max_per_session': self.max_per_session,
+            'log_max_age_days': self.log_max_age_days,
+            'orphan_grace_seconds': self.orphan_grace_seconds,
+            'interval_seconds': self.interval_seconds
+        }
+
+    def ensure_started(self):
+        """Start the background sweep thread lazily (and again after a fork)"""
+        if not self.interval_seconds or self.interval_seconds <= 0:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run_loop, name='artifact-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run_loop(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Artifact sweep failed: {e}")
+
+    def sweep(self, dry_run: bool = False) -> Dict:
+        """Apply all retention policies once and return a report"""
+        with self._lock:
+            start = time.perf_counter()
+            report = {
+                'dry_run': dry_run,
+                'started_at': datetime.now().isoformat(),
+                'expired': self._new_section(),
+                'session_cap': self._new_section(),
+                'quota': self._new_section(),
+                'orphans': self._new_section(),
+                'logs': self._new_section()
+            }
+            # Filenames and hashes we've (or would have) released this sweep, so dry-run
+            # reports don't double count and quota math stays dedup-aware
+            released = set()
+
+            if self.max_age_days is not None:
+                cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+                for entry in self.catalogue.find_expired(cutoff):
+                    self._remove_artifact(entry, report['expired'], released, dry_run)
+
+            if self.max_per_session is not None:
+                for entry in self.catalogue.find_session_overflow(self.max_per_session):
+                    self._remove_artifact(entry, report['session_cap'], released, dry_run)
+
+            if self.quota_bytes is not None:
+                self._enforce_quota(report, released, dry_run)
+
+            self._sweep_orphans(report['orphans'], dry_run)
+
+            if self.log_max_age_days is not None:
+                self._sweep_logs(report['logs'], dry_run)
+
+            sections = [report[name] for name in ('expired', 'session_cap', 'quota', 'orphans', 'logs')]
+            report['bytes_reclaimed'] = sum(section['bytes'] for section in sections)
+            report['files_removed'] = sum(section['files'] for section in sections)
+            report['artifacts_removed'] = sum(section['artifacts'] for section in sections)
+            report['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+            self.metrics['last_run_at'] = report['started_at']
+            self.metrics['last_report'] = report
+            if dry_run:
+                self.metrics['dry_runs'] += 1
+            else:
+                self.metrics['runs'] += 1
+                self.metrics['bytes_reclaimed'] += report['bytes_reclaimed']
+                self.metrics['files_removed'] += report['files_removed']
+                self.metrics['artifacts_removed'] += report['artifacts_removed']
+
+            logger.info(f"Artifact sweep{' (dry run)' if dry_run else ''}: "
+                        f"{report['artifacts_removed']} artifacts, {report['files_removed']} files, "
+                        f"{report['bytes_reclaimed']} bytes in {report['duration_ms']}ms")
+            return report
+
+    def _new_section(self) -> Dict:
+        return {'artifacts': 0, 'files': 0, 'bytes': 0, 'items': []}
+
+    def _record(self, section: Dict, item: str, size: int, artifact: bool = False, max_items: int = 100):
+        section['bytes'] += size
+        if artifact:
+            section['artifacts'] += 1
+        else:
+            section['files'] += 1
+        if len(section['items']) < max_items:
+            section['items'].append(item)
+
+    def _remove_artifact(self, entry: Dict, section: Dict, released: set, dry_run: bool) -> int:
+        """Remove a permalink; its object is freed only when no other permalink shares it"""
+        if entry['filename'] in released:
+            return 0  # Already counted by an earlier policy (dry run only)
+        content_hash = entry.get('content_hash')
+        freed = 0
+
+        if not dry_run:
+            self.catalogue.delete(entry['filename'])
+            self.storage.unlink_permalink(entry['filename'])
+            # Snapshots other revisions no longer build on may go with it
+            candidates = {content_hash} | set(self.revisions.release(entry['filename']))
+            for candidate in candidates:
+                if candidate and not self.catalogue.hash_in_use(candidate):
+                    freed += self.storage.delete(candidate)
+            for listener in self._removal_listeners:
+                try:
+                    listener(entry['filename'])
+                except Exception as e:
+                    logger.warning(f"Artifact removal listener failed for {entry['filename']}: {e}")
+        elif content_hash and content_hash not in released:
+            # Approximation for the report: assume the object goes with its last permalink
+            freed = entry.get('size_bytes') or 0
+
+        # Artifacts saved before content addressing live as plain files (flat or sharded)
+        for path in (self.layout.locate(entry['filename']), self.layout.locate_sidecar(entry['filename'])):
+            if not path:
+                continue
+            try:
+                size = os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue  # Removed meanwhile (another worker's sweep)
+            freed += size
+
+        released.add(entry['filename'])
+        if content_hash:
+            released.add(content_hash)
+        self._record(section, entry['filename'], freed, artifact=True)
+        return freed
+
+    def _enforce_quota(self, report: Dict, released: set, dry_run: bool):
+        """Evict least recently used artifacts until stored bytes fit the quota"""
+        stored_bytes = self.catalogue.get_stats()['stored_bytes']
+        if dry_run:
+            stored_bytes -= sum(report[name]['bytes'] for name in ('expired', 'session_cap'))
+
+        if stored_bytes <= self.quota_bytes:
+            return
+
+        for entry in self.catalogue.iter_least_recently_used():
+            if stored_bytes <= self.quota_bytes:
+                break
+            if dry_run:
+                if entry.get('content_hash') in released:
+                    continue
+                stored_bytes -= self._accounted_bytes(entry)
+                self._remove_artifact(entry, report['quota'], released, dry_run)
+            else:
+                self._remove_artifact(entry, report['quota'], released, dry_run)
+                # Bytes freed on disk include variants and legacy files the quota doesn't count
+                stored_bytes = self.catalogue.get_stats()['stored_bytes']
+
+    def _accounted_bytes(self, entry: Dict) -> int:
+        """What an artifact counts for in the catalogue's stored bytes (deltas count their delta)"""
+        if (entry.get('storage_path') or '').startswith('delta:'):
+            revision = self.catalogue.get_revision(entry['filename'])
+            return revision['delta_bytes'] if revision else 0
+        return entry.get('size_bytes') or 0
+
+    def _sweep_orphans(self, section: Dict, dry_run: bool):
+        """Remove abandoned streaming/partial files and leftover temp files"""
+        cutoff = time.time() - self.orphan_grace_seconds
+
+        for entry in self.layout.iter_files():
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue  # May still be streaming or processing
+
+            name = entry.name
+            is_partial = name.endswith('.processing') or name.endswith('.tmp')
+            is_sidecar = name.endswith('.meta.json')
+            # Empty streaming files, or uncatalogued ones left by interrupted streams.
+            # Files with a sidecar predate the catalogue and are kept until imported.
+            has_sidecar = os.path.exists(os.path.join(os.path.dirname(entry.path), f"{os.path.splitext(name)[0]}.meta.json"))
+            is_abandoned = not is_sidecar and not has_sidecar and (
+                stat.st_size == 0 or self.catalogue.get(name) is None
+            )
+            if not (is_partial or is_abandoned):
+                continue
+
+            self._record(section, name, stat.st_size)
+            if not dry_run:
+                os.remove(entry.path)
+
+        for path in self.storage.iter_temp_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            self._record(section, os.path.basename(path), stat.st_size)
+            if not dry_run:
+                os.remove(path)
+
+        if not dry_run:
+            # Staging files leave their shard once catalogued; drop the empty directories
+            self.layout.prune_empty_shards(self.orphan_grace_seconds)
+
+    def _sweep_logs(self, section: Dict, dry_run: bool):
+        """Remove log and session debug files older than the log retention"""
+        if not os.path.isdir(self.logs_dir):
+            return
+        cutoff = time.time() - self.log_max_age_days * 86400
+
+        for entry in os.scandir(self.logs_dir):
+            if not entry.is_file() or not (entry.name.endswith('.log') or entry.name.endswith('.json')):
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            self._record(section, entry.name, stat.st_size)
+            if not dry_run:
+                os.remove(entry.path)
+
+    def get_status(self) -> Dict:
+        return {
+            'policies': self.get_policies(),
+            'metrics': dict(self.metrics),
+            'running': bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+        }
@@ -0,0 +1,224 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+
+SIDECAR_SUFFIX = '.meta.json'
+PARTIAL_SUFFIXES = ('.processing', '.tmp')
+UNDATED_SHARD = 'undated'
+# Permalink filenames start with their creation timestamp (YYYYMMDD_HHMMSS_...)
+FILENAME_DATE_PATTERN = re.compile(r'^(\d{4})(\d{2})(\d{2})_')
+
+class ArtifactLayout:
+    """
+    Date/hash-sharded layout for artifact files under ARTIFACTS_DIR:
+    artifacts/YYYY/MM/DD/ab/<filename>, where the date comes from the permalink
+    filename and ab from a hash of it, so the location is derived from the
+    permalink alone. Files saved before sharding stay reachable at their flat
+    path until migrate() moves them.
+    """
+
+    def __init__(self, root: str = DEFAULT_ARTIFACTS_DIR):
+        self.root = root
+
+    @staticmethod
+    def is_valid_filename(filename: str) -> bool:
+        return bool(filename) and os.path.basename(filename) == filename and not filename.startswith('.')
+
+    @staticmethod
+    def shard_for(filename: str) -> str:
+        """Relative shard directory for a permalink filename"""
+        match = FILENAME_DATE_PATTERN.match(filename)
+        bucket = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:2]
+        if match:
+            return os.path.join(match.group(1), match.group(2), match.group(3), bucket)
+        return os.path.join(UNDATED_SHARD, bucket)
+
+    def path_for(self, filename: str) -> str:
+        """Sharded path of an artifact file (where new files are written)"""
+        return os.path.join(self.root, self.shard_for(filename), filename)
+
+    def flat_path(self, filename: str) -> str:
+        return os.path.join(self.root, filename)
+
+    def sidecar_path_for(self, filename: str) -> str:
+        """Sharded path of a legacy .meta.json sidecar, kept next to its artifact"""
+        stem = os.path.splitext(filename)[0]
+        return os.path.join(self.root, self.shard_for(filename), stem + SIDECAR_SUFFIX)
+
+    def create_path(self, filename: str) -> str:
+        """Sharded path for a new artifact file, with its shard directory created"""
+        path = self.path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def locate(self, filename: str) -> Optional[str]:
+        """Find an artifact file in the sharded layout, falling back to the old flat layout"""
+        if not self.is_valid_filename(filename):
+            return None
+        sharded = self.path_for(filename)
+        if os.path.isfile(sharded):
+            return sharded
+        flat = self.flat_path(filename)
+        if os.path.isfile(flat):
+            return flat
+        # Migration links the sharded copy before unlinking the flat one, so a file
+        # that vanished from the flat path between the two checks is now sharded
+        return sharded if os.path.isfile(sharded) else None
+
+    def locate_sidecar(self, filename: str) -> Optional[str]:
+        stem = os.path.splitext(filename)[0]
+        for path in (self.sidecar_path_for(filename), os.path.join(self.root, stem + SIDECAR_SUFFIX)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def iter_files(self) -> Iterator[os.DirEntry]:
+        """Artifact, sidecar and partial files in both layouts (not the content store)"""
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                yield entry
+            elif entry.is_dir() and (entry.name.isdigit() or entry.name == UNDATED_SHARD):
+                yield from self._iter_shard(entry.path)
+
+    def _iter_shard(self, directory: str) -> Iterator[os.DirEntry]:
+        for entry in os.scandir(directory):
+            if entry.is_dir():
+                yield from self._iter_shard(entry.path)
+            elif entry.is_file():
+                yield entry
+
+    def prune_empty_shards(self, min_age_seconds: int = 3600) -> int:
+        """Remove shard directories left empty (staging files are dropped once catalogued)"""
+        cutoff = time.time() - min_age_seconds
+        removed = 0
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and (entry.name.isdigit() or entry.name == UNDATED_SHARD):
+                removed += self._prune_directory(entry.path, cutoff)
+        return removed
+
+    def _prune_directory(self, directory: str, cutoff: float) -> int:
+        removed = 0
+        for entry in os.scandir(directory):
+            if entry.is_dir():
+                removed += self._prune_directory(entry.path, cutoff)
+        try:
+            # Recently touched directories may be about to receive a new file
+            if os.stat(directory).st_mtime < cutoff and not os.listdir(directory):
+                os.rmdir(directory)
+                removed += 1
+        except OSError:
+            pass
+        return removed
+
+    def migrate(self, catalogue=None, batch_size: int = 500, pause_seconds: float = 0.5,
+                min_age_seconds: int = 300, dry_run: bool = False) -> Dict:
+        """
+        Move flat-layout files into their shards, batch_size at a time with a pause
+        between batches, while the app keeps serving. Each file is hard-linked
+        into place before the flat name is removed, so lookups never miss it.
+        Recently modified files may still be streaming and are left for a later run.
+        """
+        stats = {'moved': 0, 'sidecars_moved': 0, 'skipped_recent': 0, 'skipped_partial': 0,
+                 'conflicts': 0, 'errors': 0, 'batches': 0, 'dry_run': dry_run}
+        cutoff = time.time() - min_age_seconds
+        in_batch = 0
+
+        # Snapshot the flat entries first; moving files while scandir iterates is unreliable
+        flat_files = [entry for entry in os.scandir(self.root) if entry.is_file()]
+        for entry in flat_files:
+            name = entry.name
+            if name.endswith(PARTIAL_SUFFIXES):
+                stats['skipped_partial'] += 1
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    stats['skipped_recent'] += 1
+                    continue
+
+                is_sidecar = name.endswith(SIDECAR_SUFFIX)
+                if is_sidecar:
+                    target = self._sidecar_target(entry.path)
+                else:
+                    target = self.path_for(name)
+                if target is None:
+                    stats['errors'] += 1
+                    continue
+                if os.path.exists(target):
+                    stats['conflicts'] += 1
+                    continue
+
+                if not dry_run:
+                    self._move(entry.path, target)
+                    if not is_sidecar and catalogue is not None:
+                        catalogue.update_storage_path(name, entry.path, target)
+                stats['sidecars_moved' if is_sidecar else 'moved'] += 1
+            except FileNotFoundError:
+                continue  # Removed (e.g. by the sweeper) since the listing
+            except Exception as e:
+                logger.error(f"Failed to migrate artifact file {name}: {e}")
+                stats['errors'] += 1
+                continue
+
+            in_batch += 1
+            if in_batch >= batch_size:
+                stats['batches'] += 1
+                in_batch = 0
+                logger.info(f"Artifact layout migration progress: {stats}")
+                if pause_seconds and not dry_run:
+                    time.sleep(pause_seconds)  # Leave I/O headroom for live traffic
+
+        if in_batch:
+            stats['batches'] += 1
+        logger.info(f"Artifact layout migration finished: {stats}")
+        return stats
+
+    def _sidecar_target(self, sidecar_path: str) -> Optional[str]:
+        """Sidecars are sharded with the artifact named inside them"""
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        filename = metadata.get('filename')
+        if not filename or not self.is_valid_filename(filename):
+            logger.warning(f"Sidecar {sidecar_path} does not name its artifact; leaving it in place")
+            return None
+        return self.sidecar_path_for(filename)
+
+    @staticmethod
+    def _move(source: str, target: str):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            # No hard links on this filesystem; a rename is still atomic
+            os.replace(source, target)
+            return
+        os.remove(source)
+
+if __name__ == '__main__':
+    # Usage: python artifact_layout.py migrate [artifacts_dir] [--batch-size=N] [--pause=S] [--min-age=S] [--dry-run]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Usage: python artifact_layout.py migrate [artifacts_dir] [--batch-size=N] [--pause=S] "
+              "[--min-age=S] [--dry-run]")
+        sys.exit(1)
+
+    from artifact_catalogue import artifact_catalogue
+
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[2:] if arg.startswith('--') and '=' in arg)
+    args = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+    layout = ArtifactLayout(args[0] if args else DEFAULT_ARTIFACTS_DIR)
+    print(json.dumps(layout.migrate(
+        artifact_catalogue,
+        batch_size=int(options.get('batch-size', 500)),
+        pause_seconds=float(options.get('pause', 0.5)),
+        min_age_seconds=int(options.get('min-age', 300)),
+        dry_run='--dry-run' in sys.argv
+    ), indent=2))
@@ -0,0 +1,228 @@
+import os
+import queue
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ArtifactProcessor:
+    """
+    Background post-processing pipeline for finalized artifacts.
+    Conversion and derivative steps (HAML conversion, metadata, ...) run on a
+    bounded worker pool so the chat stream can complete as soon as the model does.
+    Jobs run in the process that submitted them; with a job store (save_job /
+    load_job, e.g. the artifact catalogue) their status is visible to every worker.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 64,
+                 max_tracked_jobs: int = 1000, job_store=None):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_tracked_jobs = max_tracked_jobs
+        self.job_store = job_store
+
+        self._steps = []  # Ordered list of (name, callable)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._jobs = OrderedDict()  # job_id -> job dict, oldest first
+        self._lock = threading.Lock()
+        self._workers = []
+        self._pid = None
+
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'inline': 0  # Jobs run on the caller because the queue was full
+        }
+
+    def register_step(self, name: str, func: Callable[[Dict], Optional[Dict]]):
+        """
+        Register a post-processing step. Steps run in registration order and
+        receive the job dict; a returned dict is merged into the job's result
+        (readable by later steps as job['step_results']).
+        """
+        self._steps.append((name, func))
+
+    def submit(self, filepath: str, artifact_data: Dict) -> str:
+        """Queue a finalized artifact for post-processing and return its job id"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'filepath': filepath,
+            'artifact': dict(artifact_data),
+            'permalink': artifact_data.get('permalink'),
+            'artifact_id': artifact_data.get('id'),
+            'submitted_at': datetime.now().isoformat(),
+            'timings': {},
+            'result': {},
+            'error': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._stats['submitted'] += 1
+            self._trim_jobs()
+        self._save_job(job)
+
+        self._ensure_workers()
+
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            # Bounded queue: apply backpressure by processing on the caller
+            logger.warning(f"Artifact processing queue full, running job {job_id} inline")
+            with self._lock:
+                self._stats['inline'] += 1
+            self._run_job(job)
+
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a public snapshot of a job's status (from the job store if another process runs it)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._public_job(job)
+        if self.job_store is None:
+            return None
+        try:
+            return self.job_store.load_job(job_id)
+        except Exception as e:
+            logger.error(f"Failed to load artifact job {job_id}: {e}")
+            return None
+
+    def _save_job(self, job: Dict):
+        if self.job_store is None:
+            return
+        try:
+            with self._lock:
+                snapshot = self._public_job(job)
+            self.job_store.save_job(snapshot)
+        except Exception as e:
+            logger.error(f"Failed to store artifact job {job['job_id']}: {e}")
+
+    def get_ready_jobs(self, job_ids: List[str]) -> List[Dict]:
+        """Return snapshots of the given jobs that have already finished"""
+        ready = []
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job and job['status'] in ('ready', 'failed'):
+                    ready.append(self._public_job(job))
+        return ready
+
+    def wait(self, job_ids: List[str], timeout: float = 10.0) -> List[Dict]:
+        """Block until the given jobs finish or the timeout elapses"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            ready = self.get_ready_jobs(job_ids)
+            if len(ready) == len(job_ids):
+                return ready
+            time.sleep(0.05)
+        return self.get_ready_jobs(job_ids)
+
+    def get_stats(self) -> Dict:
+        """Get queue and worker statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracked_jobs'] = len(self._jobs)
+        stats['queue_size'] = self._queue.qsize()
+        stats['max_queue_size'] = self.max_queue_size
+        stats['workers'] = sum(1 for worker in self._workers if worker.is_alive())
+        stats['steps'] = [name for name, _ in self._steps]
+        return stats
+
+    def _public_job(self, job: Dict) -> Dict:
+        return {
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'artifact_id': job['artifact_id'],
+            'permalink': job['permalink'],
+            'timings': dict(job['timings']),
+            'result': dict(job['result']),
+            'error': job['error']
+        }
+
+    def _trim_jobs(self):
+        # Forget the oldest finished jobs once we track too many
+        while len(self._jobs) > self.max_tracked_jobs:
+            oldest_id = next(iter(self._jobs))
+            if self._jobs[oldest_id]['status'] in ('queued', 'processing'):
+                break
+            self._jobs.popitem(last=False)
+
+    def _ensure_workers(self):
+        """Start worker threads lazily (and again after a fork, e.g. under gunicorn)"""
+        if self._pid == os.getpid() and all(worker.is_alive() for worker in self._workers):
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._workers = []
+                self._pid = os.getpid()
+
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"artifact-processor-{len(self._workers)}",
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                if job:
+                    self._run_job(job)
+            except Exception as e:
+                logger.error(f"Artifact processor worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job: Dict):
+        with self._lock:
+            job['status'] = 'processing'
+        job_start = time.perf_counter()
+        # Built privately and published in one step, so snapshots never see a half-finished job
+        timings = {}
+        results = job['step_results'] = {}
+        status = 'ready'
+        error = None
+
+        try:
+            for name, func in self._steps:
+                step_start = time.perf_counter()
+                result = func(job)
+                timings[name] = round((time.perf_counter() - step_start) * 1000, 2)
+                if result:
+                    results.update(result)
+        except Exception as e:
+            status = 'failed'
+            error = str(e)
+        timings['total'] = round((time.perf_counter() - job_start) * 1000, 2)
+
+        with self._lock:
+            job['timings'] = timings
+            job['result'] = dict(results)
+            job['error'] = error
+            job['status'] = status
+            self._stats['completed' if status == 'ready' else 'failed'] += 1
+        if status == 'ready':
+            logger.info(f"Artifact job {job['job_id']} ready: {job['permalink']} ({timings})")
+        else:
+            logger.error(f"Artifact job {job['job_id']} failed for {job['filepath']}: {error}")
+        self._save_job(job)
+
+# Global artifact processor instance
+artifact_processor = ArtifactProcessor()
@@ -0,0 +1,250 @@
+import json
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ArtifactRevisions:
+    """
+    Revision chains for artifacts Claude re-emits while iterating on them.
+    Artifacts with the same title in a session form a chain; each new revision
+    is stored as a line delta against the previous one, with a full snapshot
+    every snapshot_interval revisions (or whenever a delta wouldn't pay off).
+    """
+
+    def __init__(self, catalogue, storage, snapshot_interval: int = 10,
+                 max_delta_ratio: float = 0.5, max_diff_bytes: int = 2 * 1024 * 1024,
+                 cache_bytes: int = 32 * 1024 * 1024):
+        self.catalogue = catalogue
+        self.storage = storage
+        self.snapshot_interval = snapshot_interval
+        self.max_delta_ratio = max_delta_ratio  # Store a snapshot when the delta is bigger than this share
+        self.max_diff_bytes = max_diff_bytes  # Larger bodies are always snapshots (diffing is quadratic-ish)
+
+        self._lock = threading.Lock()  # Serializes revision numbering within a process
+        self._cache_lock = threading.Lock()
+        self._cache = OrderedDict()  # filename -> materialized body (LRU, bounded by bytes)
+        self._cache_bytes = 0
+        self._max_cache_bytes = cache_bytes
+
+    @staticmethod
+    def chain_key(session_id: Optional[str], title: Optional[str]) -> Optional[str]:
+        """Lineage key: same session and same (normalized) title"""
+        if not session_id or not title:
+            return None
+        normalized = ' '.join(title.lower().split())
+        return hashlib.sha1(f"{session_id}\0{normalized}".encode('utf-8')).hexdigest()[:20]
+
+    @staticmethod
+    def split_lines(text: str) -> List[str]:
+        """Split on '\\n' keeping line endings (matches the frontend's delta application)"""
+        lines = text.split('\n')
+        result = [line + '\n' for line in lines[:-1]]
+        if lines[-1]:
+            result.append(lines[-1])
+        return result
+
+    @classmethod
+    def compute_delta(cls, base: str, target: str) -> List:
+        """
+        Line delta from base to target: a list of [start, end] (copy base lines
+        start:end) and strings (insert text)
+        """
+        base_lines = cls.split_lines(base)
+        target_lines = cls.split_lines(target)
+        ops = []
+        matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ops.append([i1, i2])
+            elif tag in ('replace', 'insert'):
+                ops.append(''.join(target_lines[j1:j2]))
+        return ops
+
+    @classmethod
+    def apply_delta(cls, base: str, ops: List) -> str:
+        base_lines = cls.split_lines(base)
+        parts = []
+        for op in ops:
+            if isinstance(op, str):
+                parts.append(op)
+            else:
+                parts.append(''.join(base_lines[op[0]:op[1]]))
+        return ''.join(parts)
+
+    def plan(self, filename: str, session_id: Optional[str], title: Optional[str],
+             body: bytes, content_hash: str) -> Optional[Dict]:
+        """
+        Link a finalized body into its chain and decide how to store it.
+        Records the revision and returns it ('kind' is 'snapshot' or 'delta'),
+        or None for artifacts without lineage.
+        """
+        chain_key = self.chain_key(session_id, title)
+        if not chain_key:
+            return None
+
+        with self._lock:
+            previous = self.catalogue.latest_revision(chain_key)
+            revision = {
+                'filename': filename,
+                'chain_key': chain_key,
+                'revision': self.catalogue.next_revision_number(chain_key),
+                'kind': 'snapshot',
+                'content_hash': content_hash,
+                'size_bytes': len(body)
+            }
+
+            if previous and self._should_diff(revision, previous, body, content_hash):
+                base_body = self.materialize(previous['filename'])
+                try:
+                    target = body.decode('utf-8')
+                    base = base_body.decode('utf-8') if base_body is not None else None
+                except UnicodeDecodeError:
+                    base = None
+                if base is not None:
+                    ops = self.compute_delta(base, target)
+                    payload = zlib.compress(json.dumps(ops, separators=(',', ':')).encode('utf-8'), 6)
+                    if len(payload) <= len(body) * self.max_delta_ratio:
+                        revision.update({
+                            'kind': 'delta',
+                            'base_filename': previous['filename'],
+                            'delta': payload,
+                            'delta_bytes': len(payload)
+                        })
+            elif previous:
+                revision['base_filename'] = previous['filename']
+
+            self.catalogue.record_revision(revision)
+
+        if revision['kind'] == 'delta':
+            self._cache_put(filename, body)
+            logger.info(f"Artifact {filename} stored as revision {revision['revision']} delta "
+                        f"({revision['delta_bytes']} of {len(body)} bytes)")
+        return {key: value for key, value in revision.items() if key != 'delta'}
+
+    def _should_diff(self, revision: Dict, previous: Dict, body: bytes, content_hash: str) -> bool:
+        if self.snapshot_interval and (revision['revision'] - 1) % self.snapshot_interval == 0:
+            return False  # Periodic snapshot bounds reconstruction cost
+        if len(body) > self.max_diff_bytes or previous['content_hash'] == content_hash:
+            return False
+        # An identical body is already stored, so a snapshot costs nothing
+        return not self.storage.exists(content_hash)
+
+    def materialize(self, filename: str) -> Optional[bytes]:
+        """Rebuild a revision's body from its nearest snapshot and the deltas after it"""
+        cached = self._cache_get(filename)
+        if cached is not None:
+            return cached
+
+        revision = self.catalogue.get_revision(filename)
+        if revision is None:
+            return None
+
+        # Walk back to a snapshot (or a cached body), collecting deltas
+        pending = []
+        body = None
+        while revision['kind'] == 'delta':
+            pending.append(revision)
+            body = self._cache_get(revision['base_filename'])
+            if body is not None:
+                break
+            revision = self.catalogue.get_revision(revision['base_filename'])
+            if revision is None:
+                logger.error(f"Revision chain for {filename} is broken")
+                return None
+
+        if body is None:
+            body = self._read_snapshot(revision)
+            if body is None:
+                return None
+
+        text = body.decode('utf-8') if pending else None
+        for delta_revision in reversed(pending):
+            ops = json.loads(zlib.decompress(delta_revision['delta']))
+            text = self.apply_delta(text, ops)
+            body = text.encode('utf-8')
+            if hashlib.sha256(body).hexdigest() != delta_revision['content_hash']:
+                logger.error(f"Revision {delta_revision['filename']} failed its hash check")
+                return None
+            self._cache_put(delta_revision['filename'], body)
+
+        return body
+
+    def _read_snapshot(self, revision: Dict) -> Optional[bytes]:
+        try:
+            with closing(self.storage.open(revision['content_hash'])) as f:
+                body = f.read()
+        except Exception as e:
+            logger.error(f"Revision snapshot {revision['filename']} is unavailable: {e}")
+            return None
+        self._cache_put(revision['filename'], body)
+        return body
+
+    def get_delta(self, filename: str, base_filename: str) -> Optional[Dict]:
+        """Delta that turns base_filename's body into filename's body"""
+        revision = self.catalogue.get_revision(filename)
+        if revision and revision['kind'] == 'delta' and revision['base_filename'] == base_filename:
+            ops = json.loads(zlib.decompress(revision['delta']))
+        else:
+            base = self.materialize(base_filename) if self.catalogue.get_revision(base_filename) else None
+            target = self.materialize(filename) if revision else None
+            if base is None or target is None:
+                return None
+            ops = self.compute_delta(base.decode('utf-8'), target.decode('utf-8'))
+
+        return {
+            'filename': filename,
+            'base': base_filename,
+            'revision': revision['revision'],
+            'content_hash': revision['content_hash'],
+            'size_bytes': revision['size_bytes'],
+            'ops': ops
+        }
+
+    def get_chain(self, filename: str) -> Optional[List[Dict]]:
+        revision = self.catalogue.get_revision(filename)
+        if revision is None:
+            return None
+        return self.catalogue.list_revisions(revision['chain_key'])
+
+    def release(self, filename: str) -> List[str]:
+        """Prune chain entries after a permalink is deleted; returns snapshot hashes that were dropped"""
+        self._cache_drop(filename)
+        revision = self.catalogue.get_revision(filename)
+        if revision is None:
+            return []
+        with self._lock:
+            return self.catalogue.prune_revisions(revision['chain_key'])
+
+    def _cache_get(self, filename: Optional[str]) -> Optional[bytes]:
+        with self._cache_lock:
+            body = self._cache.get(filename)
+            if body is not None:
+                self._cache.move_to_end(filename)
+            return body
+
+    def _cache_put(self, filename: str, body: bytes):
+        if len(body) > self._max_cache_bytes // 4:
+            return
+        with self._cache_lock:
+            self._cache_pop(filename)
+            self._cache[filename] = body
+            self._cache_bytes += len(body)
+            while self._cache_bytes > self._max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def _cache_drop(self, filename: str):
+        with self._cache_lock:
+            self._cache_pop(filename)
+
+    def _cache_pop(self, filename: str):
+        body = self._cache.pop(filename, None)
+        if body is not None:
+            self._cache_bytes -= len(body)
@@ -0,0 +1,422 @@
+import os
+import io
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Precompressed variant suffixes, in negotiation preference order
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# Derived renditions of a body (e.g. markdown pre-rendered to HTML); each may have encodings too
+RENDITION_SUFFIXES = {'html': '.html'}
+
+def variant_suffix(encoding: Optional[str] = None, rendition: Optional[str] = None) -> str:
+    """Object name suffix for a rendition and/or encoding of a stored body"""
+    return (RENDITION_SUFFIXES[rendition] if rendition else '') + (ENCODING_SUFFIXES[encoding] if encoding else '')
+
+class ArtifactStorage:
+    """
+    Storage interface for artifact bodies.
+    Finalized bodies are stored by content hash (with optional precompressed
+    variants); permalinks map to hashes through the catalogue or, for drivers
+    shared between nodes, through permalink pointers kept in the store itself.
+    """
+
+    name = 'base'
+    shared = False  # Whether every app node sees the same store
+
+    def start_upload(self, filename: str) -> Optional['StreamingUpload']:
+        """Begin streaming an in-progress artifact to the store (None if unsupported)"""
+        return None
+
+    def ingest(self, filepath: str, content_hash: str, upload: Optional['StreamingUpload'] = None) -> Dict:
+        """Store a finalized body under its hash; returns {'location', 'deduplicated'}"""
+        raise NotImplementedError
+
+    def exists(self, content_hash: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, content_hash: str) -> int:
+        """Delete an object and its variants and renditions; returns bytes freed"""
+        raise NotImplementedError
+
+    def put_variant(self, content_hash: str, encoding: Optional[str], body: bytes,
+                    rendition: Optional[str] = None):
+        """Store a derived body: an encoding of the object, a rendition, or an encoded rendition"""
+        raise NotImplementedError
+
+    def has_variant(self, content_hash: str, encoding: Optional[str], rendition: Optional[str] = None) -> bool:
+        raise NotImplementedError
+
+    def open(self, content_hash: str, encoding: Optional[str] = None, rendition: Optional[str] = None):
+        """Open a stored body (or variant) as a binary file-like object"""
+        raise NotImplementedError
+
+    def local_path(self, content_hash: str, encoding: Optional[str] = None,
+                   rendition: Optional[str] = None) -> Optional[str]:
+        """Filesystem path of a body, for drivers that keep one"""
+        return None
+
+    def read_url(self, content_hash: str, encoding: Optional[str] = None,
+                 mimetype: Optional[str] = None, expires: int = 3600,
+                 rendition: Optional[str] = None) -> Optional[str]:
+        """Direct (presigned) read URL, for drivers that support one"""
+        return None
+
+    def link_permalink(self, filename: str, info: Dict):
+        """Publish a permalink -> hash pointer other nodes can resolve"""
+        pass
+
+    def resolve_permalink(self, filename: str) -> Optional[Dict]:
+        return None
+
+    def unlink_permalink(self, filename: str):
+        pass
+
+    def iter_temp_files(self) -> Iterator[str]:
+        """Leftover local temp files from interrupted writes"""
+        return iter(())
+
+    def get_stats(self) -> Dict:
+        return {'driver': self.name}
+
+class StreamingUpload:
+    """Interface for uploading an in-progress artifact as it streams"""
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def hexdigest(self) -> str:
+        raise NotImplementedError
+
+    def abort(self):
+        pass
+
+class LocalArtifactStorage(ArtifactStorage):
+    """
+    Content-addressed artifact storage on local disk.
+    Bodies live at objects/ab/cd/<sha256>, so identical artifacts are stored once.
+    """
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def object_path(self, content_hash: str) -> str:
+        """Sharded path for a content hash: root/ab/cd/abcdef..."""
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def exists(self, content_hash: str) -> bool:
+        return os.path.exists(self.object_path(content_hash))
+
+    def ingest(self, filepath: str, content_hash: str, upload: Optional[StreamingUpload] = None) -> Dict:
+        """
+        Store the body of filepath under its hash. The source file is left in
+        place (it keeps serving its permalink until the catalogue points at the object).
+        If the hash already exists the write is skipped entirely.
+        """
+        object_path = self.object_path(content_hash)
+        if os.path.exists(object_path):
+            return {'location': object_path, 'deduplicated': True}
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        temp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Hard link when possible so ingesting costs no data I/O
+            os.link(filepath, temp_path)
+        except OSError:
+            shutil.copyfile(filepath, temp_path)
+        os.replace(temp_path, object_path)
+
+        return {'location': object_path, 'deduplicated': False}
+
+    def delete(self, content_hash: str) -> int:
+        object_path = self.object_path(content_hash)
+        directory = os.path.dirname(object_path)
+        if not os.path.isdir(directory):
+            return 0
+
+        freed = 0
+        for name in os.listdir(directory):
+            if name == content_hash or name.startswith(content_hash + '.'):
+                path = os.path.join(directory, name)
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return freed
+
+    def put_variant(self, content_hash: str, encoding: Optional[str], body: bytes,
+                    rendition: Optional[str] = None):
+        variant_path = self.object_path(content_hash) + variant_suffix(encoding, rendition)
+        # Delta revisions have renditions but no object of their own, so the shard may not exist yet
+        os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+        temp_path = f"{variant_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, variant_path)
+
+    def has_variant(self, content_hash: str, encoding: Optional[str], rendition: Optional[str] = None) -> bool:
+        return os.path.exists(self.object_path(content_hash) + variant_suffix(encoding, rendition))
+
+    def local_path(self, content_hash: str, encoding: Optional[str] = None,
+                   rendition: Optional[str] = None) -> Optional[str]:
+        return self.object_path(content_hash) + variant_suffix(encoding, rendition)
+
+    def open(self, content_hash: str, encoding: Optional[str] = None, rendition: Optional[str] = None):
+        return open(self.local_path(content_hash, encoding, rendition), 'rb')
+
+    def iter_temp_files(self) -> Iterator[str]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    yield os.path.join(dirpath, name)
+
+    def get_stats(self) -> Dict:
+        """Count stored objects and bytes (walks the object tree)"""
+        objects = 0
+        total_bytes = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if '.' in name:
+                    continue  # Derived variants (.gz/.br), renditions and temp files
+                objects += 1
+                total_bytes += os.path.getsize(os.path.join(dirpath, name))
+        return {'driver': self.name, 'objects': objects, 'total_bytes': total_bytes}
+
+class S3MultipartUpload(StreamingUpload):
+    """
+    Streams an in-progress artifact to a staging key with S3 multipart upload.
+    Parts are sent once the buffer reaches part_size (S3 requires >= 5MB for
+    all but the last part); small artifacts never start an upload at all.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.aborted = False
+        self._hasher = hashlib.sha256()
+
+    def write(self, data):
+        if self.aborted:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._hasher.update(data)
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            try:
+                self._flush_part()
+            except Exception as e:
+                logger.warning(f"Multipart upload to {self.key} failed, falling back to upload at finalize: {e}")
+                self.abort()
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+    def _flush_part(self):
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=bytes(self.buffer)
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        self.buffer.clear()
+
+    def complete(self) -> bool:
+        """Finish the upload; False if nothing was uploaded (caller uploads the file instead)"""
+        if self.aborted or self.upload_id is None:
+            return False
+        if self.buffer:
+            self._flush_part()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+        return True
+
+    def abort(self):
+        self.aborted = True
+        self.buffer.clear()
+        if self.upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except Exception as e:
+                logger.warning(f"Failed to abort multipart upload {self.key}: {e}")
+            self.upload_id = None
+
+class S3ArtifactStorage(ArtifactStorage):
+    """
+    S3-compatible object store driver (AWS S3, MinIO, Ceph, ...).
+    Lets several app nodes share artifacts: bodies live under objects/, and
+    permalinks/<filename>.json pointers let any node resolve a permalink.
+    Reads are presigned redirects or proxied through the app (read_mode).
+    """
+
+    name = 's3'
+    shared = True
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None,
+                 region_name: Optional[str] = None, part_size: int = 8 * 1024 * 1024,
+                 read_mode: str = 'presign'):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("ARTIFACT_STORAGE=s3 requires the boto3 package (pip install boto3)")
+
+        self.bucket = bucket
+        self.prefix = f"{prefix.strip('/')}/" if prefix.strip('/') else ''
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.read_mode = read_mode
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name)
+
+        # Permalink pointers never change once written, so cache them
+        self._permalink_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._max_cached_permalinks = 4096
+
+    def _object_key(self, content_hash: str, encoding: Optional[str] = None,
+                    rendition: Optional[str] = None) -> str:
+        key = f"{self.prefix}objects/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+        return key + variant_suffix(encoding, rendition)
+
+    def _key_exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def start_upload(self, filename: str) -> Optional[StreamingUpload]:
+        return S3MultipartUpload(self.client, self.bucket, f"{self.prefix}staging/{filename}", self.part_size)
+
+    def exists(self, content_hash: str) -> bool:
+        return self._key_exists(self._object_key(content_hash))
+
+    def ingest(self, filepath: str, content_hash: str, upload: Optional[StreamingUpload] = None) -> Dict:
+        object_key = self._object_key(content_hash)
+        location = f"s3://{self.bucket}/{object_key}"
+
+        if self.exists(content_hash):
+            if upload:
+                upload.abort()
+            return {'location': location, 'deduplicated': True}
+
+        # Reuse the streamed multipart upload when it matches the final body
+        if upload and not upload.aborted and upload.hexdigest() == content_hash and upload.complete():
+            self.client.copy_object(
+                Bucket=self.bucket, Key=object_key,
+                CopySource={'Bucket': self.bucket, 'Key': upload.key}
+            )
+            self.client.delete_object(Bucket=self.bucket, Key=upload.key)
+        else:
+            if upload:
+                upload.abort()
+            # upload_file switches to multipart automatically for large files
+            self.client.upload_file(filepath, self.bucket, object_key)
+
+        return {'location': location, 'deduplicated': False}
+
+    def delete(self, content_hash: str) -> int:
+        freed = 0
+        for rendition in [None] + list(RENDITION_SUFFIXES):
+            for encoding in [None] + list(ENCODING_SUFFIXES):
+                key = self._object_key(content_hash, encoding, rendition)
+                try:
+                    freed += self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+                    self.client.delete_object(Bucket=self.bucket, Key=key)
+                except Exception:
+                    continue
+        return freed
+
+    def put_variant(self, content_hash: str, encoding: Optional[str], body: bytes,
+                    rendition: Optional[str] = None):
+        params = {'Bucket': self.bucket, 'Key': self._object_key(content_hash, encoding, rendition), 'Body': body}
+        if encoding:
+            params['ContentEncoding'] = encoding
+        self.client.put_object(**params)
+
+    def has_variant(self, content_hash: str, encoding: Optional[str], rendition: Optional[str] = None) -> bool:
+        return self._key_exists(self._object_key(content_hash, encoding, rendition))
+
+    def open(self, content_hash: str, encoding: Optional[str] = None, rendition: Optional[str] = None):
+        response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(content_hash, encoding, rendition))
+        return response['Body']
+
+    def read_url(self, content_hash: str, encoding: Optional[str] = None,
+                 mimetype: Optional[str] = None, expires: int = 3600,
+                 rendition: Optional[str] = None) -> Optional[str]:
+        if self.read_mode != 'presign':
+            return None
+        params = {'Bucket': self.bucket, 'Key': self._object_key(content_hash, encoding, rendition)}
+        if mimetype:
+            params['ResponseContentType'] = mimetype
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+
+    def link_permalink(self, filename: str, info: Dict):
+        self.client.put_object(
+            Bucket=self.bucket, Key=f"{self.prefix}permalinks/{filename}.json",
+            Body=json.dumps(info).encode('utf-8'), ContentType='application/json'
+        )
+
+    def resolve_permalink(self, filename: str) -> Optional[Dict]:
+        with self._cache_lock:
+            if filename in self._permalink_cache:
+                self._permalink_cache.move_to_end(filename)
+                return self._permalink_cache[filename]
+
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=f"{self.prefix}permalinks/{filename}.json")
+            info = json.loads(response['Body'].read())
+        except ClientError:
+            return None
+
+        with self._cache_lock:
+            self._permalink_cache[filename] = info
+            while len(self._permalink_cache) > self._max_cached_permalinks:
+                self._permalink_cache.popitem(last=False)
+        return info
+
+    def unlink_permalink(self, filename: str):
+        with self._cache_lock:
+            self._permalink_cache.pop(filename, None)
+        self.client.delete_object(Bucket=self.bucket, Key=f"{self.prefix}permalinks/{filename}.json")
+
+    def get_stats(self) -> Dict:
+        return {'driver': self.name, 'bucket': self.bucket, 'prefix': self.prefix, 'read_mode': self.read_mode}
+
+def create_artifact_storage(local_root: str) -> ArtifactStorage:
+    """Build the storage driver selected by ARTIFACT_STORAGE (local or s3)"""
+    driver = os.environ.get('ARTIFACT_STORAGE', 'local').lower()
+    if driver == 'local':
+        return LocalArtifactStorage(local_root)
+    if driver == 's3':
+        bucket = os.environ.get('ARTIFACT_S3_BUCKET')
+        if not bucket:
+            raise ValueError("ARTIFACT_S3_BUCKET is required when ARTIFACT_STORAGE=s3")
+        return S3ArtifactStorage(
+            bucket,
+            prefix=os.environ.get('ARTIFACT_S3_PREFIX', ''),
+            endpoint_url=os.environ.get('ARTIFACT_S3_ENDPOINT_URL') or None,
+            region_name=os.environ.get('ARTIFACT_S3_REGION') or None,
+            read_mode=os.environ.get('ARTIFACT_S3_READ_MODE', 'presign').lower()
+        )
+    raise ValueError(f"Unknown ARTIFACT_STORAGE driver: {driver}")
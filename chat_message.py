@@ -0,0 +1,91 @@
+import sys
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional
+
+@lru_cache(maxsize=8192)
+def parse_epoch(value: str) -> Optional[float]:
+    """ISO timestamp to epoch seconds (naive timestamps are local time), None if unparseable"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+class ChatMessage:
+    """
+    Compact chat message record used by session histories.
+    Slots instead of a per-message dict, interned roles and an epoch float
+    instead of the ISO string keep the per-message overhead small in sessions
+    with thousands of turns. Context management caches (token count, content
+    score) live in slots too. It still reads like the message dicts it replaces
+    (message['role'], message.get('timestamp')), so code handling either works.
+    """
+
+    __slots__ = ('role', 'content', 'created_at', 'seq', 'is_summary', 'rolling_summary',
+                 'token_count', 'content_score')
+
+    # Keys readable and writable like a dict; 'timestamp' maps to created_at
+    KEYS = frozenset(('role', 'content', 'timestamp', 'seq', 'is_summary', 'rolling_summary',
+                      'token_count', 'content_score'))
+
+    def __init__(self, role: str, content: str, created_at: Optional[float] = None, seq: Optional[int] = None,
+                 is_summary: bool = False, rolling_summary: bool = False):
+        self.role = sys.intern(role) if isinstance(role, str) else role
+        self.content = content
+        self.created_at = created_at
+        self.seq = seq
+        self.is_summary = is_summary
+        self.rolling_summary = rolling_summary
+        self.token_count = None
+        self.content_score = None
+
+    @classmethod
+    def from_dict(cls, message: Dict) -> 'ChatMessage':
+        record = cls(message.get('role'), message.get('content', ''),
+                     parse_epoch(message['timestamp']) if message.get('timestamp') else None,
+                     message.get('seq'), bool(message.get('is_summary')), bool(message.get('rolling_summary')))
+        record.token_count = message.get('token_count')
+        record.content_score = message.get('content_score')
+        return record
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return datetime.fromtimestamp(self.created_at).isoformat() if self.created_at is not None else None
+
+    def to_dict(self) -> Dict:
+        message = {'role': self.role, 'content': self.content, 'timestamp': self.timestamp, 'seq': self.seq}
+        if self.is_summary:
+            message['is_summary'] = True
+        if self.rolling_summary:
+            message['rolling_summary'] = True
+        return message
+
+    # Mapping-style access, for code written against message dicts
+    def get(self, key: str, default=None):
+        if key not in self.KEYS:
+            return default
+        value = self.timestamp if key == 'timestamp' else getattr(self, key)
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return self.timestamp if key == 'timestamp' else getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.KEYS:
+            raise KeyError(f"ChatMessage has no field {key!r}")
+        if key == 'timestamp':
+            self.created_at = parse_epoch(value) if value else None
+        else:
+            setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) not in (None, False)
+
+    def __repr__(self) -> str:
+        return f"ChatMessage(seq={self.seq}, role={self.role!r}, content={self.content[:40]!r})"
+
+def as_chat_message(message) -> ChatMessage:
+    """Message records pass through (shared, not copied); dicts are converted"""
+    return message if isinstance(message, ChatMessage) else ChatMessage.from_dict(message)
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from context_manager import ContextManager
+from token_counter import create_token_counter
+
+DEFAULT_SIZES = [10, 100, 1000, 5000, 20000]
+REPORT_VERSION = 1
+
+HOSTS = ['FILESRV-07', 'DC01', 'SQL-PROD-02', 'WEB-03', 'EXCH-01', 'APP-11']
+QUESTIONS = [
+    "Why did the backup for {host} fail last night?",
+    "Can you list the snapshots for {host} from this week?",
+    "What is the retention policy on the device that protects {host}?",
+    "Please start a local virtualization of {host} from the latest snapshot.",
+    "Remember that {host} is business critical, it must be backed up hourly.",
+    "Thanks, that helps.",
+    "How much storage is left on the device for client Acme?",
+    "Generate a report of all agents with failed backups.",
+]
+ANSWERS = [
+    "The last backup of {host} failed because the VSS writer timed out. I restarted the writer and queued a retry.",
+    "Here are the snapshots for {host}. The most recent one completed at 02:00 and was verified successfully.",
+    "Retention on this device keeps hourly snapshots for 2 days, dailies for 30 days and monthlies for a year.",
+    "Okay, got it.",
+]
+
+def _tool_output(rng: random.Random, host: str) -> str:
+    rows = [{
+        'snapshot_id': f"s_{rng.getrandbits(48):012x}",
+        'agent_hostname': host,
+        'started_at': f"2026-10-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z",
+        'status': rng.choice(['succeeded', 'succeeded', 'succeeded', 'failed']),
+        'bytes': rng.randint(10 ** 6, 10 ** 11)
+    } for _ in range(rng.randint(3, 40))]
+    return "🔧 Used slide_snapshots:\n```json\n" + json.dumps({'data': rows}, indent=2) + "\n```"
+
+def _code_answer(rng: random.Random, host: str) -> str:
+    return ("You can check the agent service with this script:\n```powershell\n"
+            f"$svc = Get-Service -ComputerName {host} -Name SlideAgent\n"
+            "if ($svc.Status -ne 'Running') { Start-Service -InputObject $svc }\n"
+            "Get-EventLog -LogName Application -Source VSS -Newest 20 | Format-Table -AutoSize\n```")
+
+def _artifact_answer(rng: random.Random, host: str) -> str:
+    rows = '\n'.join(f"| {rng.choice(HOSTS)} | {rng.choice(['✅ OK', '❌ Failed'])} | {rng.randint(1, 72)}h ago |"
+                     for _ in range(rng.randint(5, 60)))
+    return ("I created an artifact with the report.\n<artifact type=\"markdown\" title=\"Backup report\">\n"
+            f"# Backup report\n\n| Agent | Status | Last backup |\n|---|---|---|\n{rows}\n</artifact>")
+
+def generate_conversation(size: int, seed: int = 42) -> List[Dict]:
+    """A synthetic conversation: user questions; answers mixing prose, code, tool output and artifacts"""
+    rng = random.Random(seed)
+    start = datetime(2026, 10, 1, 8, 0, 0)
+    messages = []
+    for i in range(size):
+        host = rng.choice(HOSTS)
+        if i % 2 == 0:
+            content = rng.choice(QUESTIONS).format(host=host)
+        else:
+            kind = rng.random()
+            if kind < 0.3:
+                content = _tool_output(rng, host)
+            elif kind < 0.45:
+                content = _code_answer(rng, host)
+            elif kind < 0.6:
+                content = _artifact_answer(rng, host)
+            else:
+                content = ' '.join(rng.choice(ANSWERS).format(host=host) for _ in range(rng.randint(1, 4)))
+        messages.append({
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'content': content,
+            'timestamp': (start + timedelta(seconds=45 * i)).isoformat()
+        })
+    return messages
+
+def _fresh(messages: List[Dict]) -> List[Dict]:
+    """Copies without the per-message caches (token_count, content_score, seq)"""
+    return [{key: message[key] for key in ('role', 'content', 'timestamp')} for message in messages]
+
+def measure(func: Callable[[], object], repeat: int, setup: Callable[[], object] = None) -> Dict:
+    """Latency over `repeat` runs, then one traced run for allocated and peak memory"""
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state) if setup else func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func(state) if setup else func()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'retained_bytes': current - baseline,
+        'peak_bytes': peak - baseline
+    }
+
+def benchmark_size(size: int, repeat: int, counter: str, context_window: int) -> Dict:
+    conversation = generate_conversation(size)
+
+    def new_manager():
+        return ContextManager(context_window=context_window, token_counter=create_token_counter(counter))
+
+    # Warm session: counts and scores already cached on the messages, as in a live session
+    manager = new_manager()
+    history = manager.new_history(_fresh(conversation))
+    now = datetime.now()
+    for message in history:
+        manager.calculate_message_importance(message, now)
+    query = "What did we find about the VSS failure on FILESRV-07?"
+
+    operations = {
+        'new_history_cold': measure(
+            lambda state: state[0].new_history(state[1]), repeat,
+            setup=lambda: (new_manager(), _fresh(conversation))),
+        'get_context_state': measure(lambda: manager.get_context_state(history, 'system prompt'), repeat),
+        'get_context_state_plain_list': measure(lambda: manager.get_context_state(list(history), 'system prompt'), repeat),
+        'calculate_message_importance_cold': measure(
+            lambda state: [state[0].calculate_message_importance(message, now) for message in state[1]], repeat,
+            setup=lambda: (new_manager(), _fresh(conversation))),
+        'calculate_message_importance_warm': measure(
+            lambda: [manager.calculate_message_importance(message, now) for message in history], repeat),
+        'manage_context': measure(
+            lambda state: state[0].manage_context(state[1], 'system prompt'), repeat,
+            setup=lambda: (lambda m: (m, m.new_history(_fresh(conversation))))(new_manager())),
+    }
+
+    # Recall works on what manage_context evicted
+    managed_manager = new_manager()
+    managed, info = managed_manager.manage_context(managed_manager.new_history(_fresh(conversation)), 'system prompt')
+    operations['recall'] = measure(lambda: managed_manager.recall(managed, query), repeat)
+
+    return {
+        'messages': size,
+        'tokens': history.token_total,
+        'manage_action': info.get('action'),
+        'evicted': info.get('removed', 0),
+        'operations': operations
+    }
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def run(sizes: List[int] = None, repeat: int = 5, counter: str = 'bpe', context_window: int = 200000) -> Dict:
+    sizes = sizes or DEFAULT_SIZES
+    return {
+        'version': REPORT_VERSION,
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'token_counter': counter,
+        'context_window': context_window,
+        'repeat': repeat,
+        'results': [benchmark_size(size, repeat, counter, context_window) for size in sizes]
+    }
+
+def compare(baseline: Dict, current: Dict) -> List[Dict]:
+    """Median latency and peak memory changes per (size, operation) between two reports"""
+    baseline_results = {result['messages']: result['operations'] for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old_operations = baseline_results.get(result['messages'], {})
+        for name, stats in result['operations'].items():
+            old = old_operations.get(name)
+            if not old:
+                continue
+            rows.append({
+                'messages': result['messages'],
+                'operation': name,
+                'baseline_ms': old['median_ms'],
+                'current_ms': stats['median_ms'],
+                'change_pct': round((stats['median_ms'] / old['median_ms'] - 1) * 100, 1) if old['median_ms'] else None,
+                'baseline_peak_bytes': old['peak_bytes'],
+                'current_peak_bytes': stats['peak_bytes']
+            })
+    return rows
+
+if __name__ == '__main__':
+    # Usage: python context_benchmark.py [--sizes=10,100,1000] [--repeat=N] [--counter=bpe|heuristic]
+    #                                    [--context-window=N] [--output=report.json]
+    #        python context_benchmark.py compare baseline.json current.json
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        if len(sys.argv) != 4:
+            print("Usage: python context_benchmark.py compare baseline.json current.json")
+            sys.exit(1)
+        with open(sys.argv[2]) as f:
+            baseline_report = json.load(f)
+        with open(sys.argv[3]) as f:
+            current_report = json.load(f)
+        for row in compare(baseline_report, current_report):
+            print(f"{row['messages']:>6} {row['operation']:<36} {row['baseline_ms']:>10.3f}ms -> "
+                  f"{row['current_ms']:>10.3f}ms  ({row['change_pct']:+}%)")
+        sys.exit(0)
+
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    report = run(
+        sizes=[int(size) for size in options['sizes'].split(',')] if 'sizes' in options else None,
+        repeat=int(options.get('repeat', 5)),
+        counter=options.get('counter', 'bpe'),
+        context_window=int(options.get('context-window', 200000))
+    )
+    output = json.dumps(report, indent=2)
+    if 'output' in options:
+        with open(options['output'], 'w') as f:
+            f.write(output)
+        for result in report['results']:
+            print(f"{result['messages']:>6} messages: " + ', '.join(
+                f"{name} {stats['median_ms']}ms" for name, stats in result['operations'].items()))
+    else:
+        print(output)
@@ -3,23 +3,131 @@ import re
 from datetime import datetime
 from typing import List, Dict, Tuple, Optional
 import json
+from chat_message import ChatMessage, as_chat_message, parse_epoch
+from message_recall import MessageRecallIndex
+from token_counter import TokenCounter, HeuristicTokenCounter
 
 logger = logging.getLogger(__name__)
 
+MESSAGE_OVERHEAD_TOKENS = 10  # Role and formatting overhead per message
+SUMMARY_TOKEN_RESERVE = 100  # Upper bound on a heuristic summary message (unscaled), reserved per summarized run
+ROLLING_SUMMARY_PREFIX = "[Summary of the conversation so far]\n"
+
+class SessionContext:
+    """
+    Context state of one session that outlives history rewrites: the background
+    rolling summary and the recall index of evicted messages. Histories produced
+    by manage_context share their predecessor's, so a single ContextManager can
+    serve every session.
+    """
+
+    def __init__(self):
+        self.rolling_summary = None  # {'content', 'through_seq', 'tokens', 'updated_at'}, set by the summarizer
+        self.recall_index = MessageRecallIndex()  # Evicted messages stay searchable
+        self.store_version = None  # Log version this state reflects (durable session stores)
+
+class ConversationHistory(list):
+    """
+    Session message list that keeps a running token total (unscaled, see
+    ContextManager.message_tokens). Each message's count is computed once when
+    it enters the history (and cached on the message), so the total is
+    maintained on append/remove instead of re-estimating every message
+    whenever context state is needed. Messages are
+    stored as ChatMessage records (dicts are converted on the way in, records are
+    shared, never copied) and numbered ('seq') so summaries can say which turns
+    they cover.
+    """
+
+    def __init__(self, messages=(), token_counter=None, session: Optional[SessionContext] = None):
+        super().__init__()
+        self.token_counter = token_counter
+        self.session = session or SessionContext()
+        self.token_total = 0
+        self.next_seq = 0
+        self.extend(messages)
+
+    def _track(self, message: ChatMessage) -> int:
+        """Number a new message (managed histories keep theirs) and return its token count"""
+        seq = message.seq
+        if seq is None:
+            message.seq = self.next_seq
+            self.next_seq += 1
+        elif seq >= self.next_seq:
+            self.next_seq = seq + 1
+        return self.token_counter(message)
+
+    def append(self, message):
+        message = as_chat_message(message)
+        self.token_total += self._track(message)
+        super().append(message)
+
+    def extend(self, messages):
+        messages = [as_chat_message(message) for message in messages]
+        self.token_total += sum(self._track(message) for message in messages)
+        super().extend(messages)
+
+    def __iadd__(self, messages):
+        self.extend(messages)
+        return self
+
+    def insert(self, index: int, message):
+        message = as_chat_message(message)
+        self.token_total += self._track(message)
+        super().insert(index, message)
+
+    def pop(self, index: int = -1) -> Dict:
+        message = super().pop(index)
+        self.token_total -= self.token_counter(message)
+        return message
+
+    def remove(self, message: Dict):
+        super().remove(message)
+        self.token_total -= self.token_counter(message)
+
+    def clear(self):
+        super().clear()
+        self.token_total = 0
+
+    def __setitem__(self, index, value):
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        added = [as_chat_message(message) for message in (value if isinstance(index, slice) else [value])]
+        super().__setitem__(index, added if isinstance(index, slice) else added[0])
+        self.token_total += sum(map(self._track, added)) - sum(map(self.token_counter, removed))
+
+    def __delitem__(self, index):
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self.token_total -= sum(map(self.token_counter, removed))
+
 class ContextManager:
     """
     Advanced context window management for chat conversations.
     Implements progressive management strategies to prevent abrupt cutoffs.
+    Holds configuration and caches only; per-session state lives on the history.
     """
     
     def __init__(self, context_window: int = 200000, 
                  warning_threshold: float = 0.7,
                  soft_limit_threshold: float = 0.8,
-                 hard_limit_threshold: float = 0.9):
+                 hard_limit_threshold: float = 0.9,
+                 target_threshold: float = 0.6,
+                 pinned_recent_messages: int = 4,
+                 summary_threshold: float = 0.5,
+                 recall_token_budget: int = 1000,
+                 recall_top_k: int = 5,
+                 token_counter: Optional[TokenCounter] = None):
         self.context_window = context_window
         self.warning_threshold = warning_threshold
         self.soft_limit_threshold = soft_limit_threshold  
         self.hard_limit_threshold = hard_limit_threshold
+        self.target_threshold = target_threshold  # Pruning brings usage down to this share of the window
+        self.pinned_recent_messages = pinned_recent_messages  # Never evicted
+        # Background rolling summaries start here, ahead of pruning, so one is ready when needed
+        self.summary_threshold = summary_threshold
+        # Relevant evicted passages re-injected per turn
+        self.recall_token_budget = recall_token_budget
+        self.recall_top_k = recall_top_k
+        self.token_counter = token_counter or HeuristicTokenCounter()
         
         # Importance keywords for scoring messages
         self.importance_keywords = {
@@ -30,26 +138,71 @@ class ContextManager:
             'low': ['thanks', 'okay', 'yes', 'no', 'sure', 'got it', 'understood']
         }
         
-    def estimate_tokens(self, text: str) -> int:
-        """Estimate token count using improved heuristics"""
-        if not text:
-            return 0
+        # One whole-word pass finds every keyword; each match maps back to its level
+        self._keyword_levels = {keyword: level for level, keywords in self.importance_keywords.items()
+                                for keyword in keywords}
+        self._keyword_pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(keyword) for keyword in
+                              sorted(self._keyword_levels, key=len, reverse=True)) + r')\b'
+        )
         
-        # More accurate estimation considering punctuation and special chars
-        char_count = len(str(text))
-        word_count = len(text.split())
+        # The system prompt rarely changes, so remember its (unscaled) count
+        self._system_units = ('', 0)
+        
+    def new_history(self, messages=(), session: Optional[SessionContext] = None) -> ConversationHistory:
+        """Create a session message list that tracks its token total with this manager's counts"""
+        return ConversationHistory(messages, self.message_tokens, session)
+        
+    def message_tokens(self, message: Dict) -> int:
+        """
+        Token count of a message including overhead, computed once and cached on the message.
+        Counts are unscaled, so they stay valid as calibration moves; to_tokens() applies it.
+        """
+        if isinstance(message, ChatMessage):
+            count = message.token_count
+            if count is None:
+                count = message.token_count = self.unscaled_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+            return count
+        count = message.get('token_count')
+        if count is None:
+            count = self.unscaled_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+            message['token_count'] = count
+        return count
         
-        # Average of character and word-based estimates
-        char_estimate = char_count / 3.5
-        word_estimate = word_count * 1.3
+    def system_tokens(self, system_message: str) -> int:
+        return self.to_tokens(self._system_unscaled(system_message))
         
-        return int((char_estimate + word_estimate) / 2)
+    def _system_unscaled(self, system_message: str) -> int:
+        cached_message, count = self._system_units
+        if system_message != cached_message:
+            count = self.unscaled_tokens(system_message)
+            self._system_units = (system_message, count)
+        return count
+        
+    def unscaled_tokens(self, text: str) -> int:
+        return int(self.token_counter.count_unscaled(text))
+        
+    def to_tokens(self, unscaled: float) -> int:
+        """Calibrated token count for unscaled counts (message_tokens, ConversationHistory.token_total)"""
+        return int(unscaled * self.token_counter.scale)
+        
+    def estimate_tokens(self, text: str) -> int:
+        """Estimate token count with the configured (pluggable, cached) token counter"""
+        return self.token_counter.count(text)
     
-    def calculate_message_importance(self, message: Dict) -> float:
+    def calculate_message_importance(self, message: Dict, now: Optional[datetime] = None) -> float:
         """
         Score message importance based on content and context.
         Returns score between 0.0 and 1.0
         """
+        return max(0.0, min(1.0, self.content_score(message) + self.recency_score(message, now)))
+    
+    def content_score(self, message: Dict) -> float:
+        """Content-dependent part of the importance score, computed once and cached on the message"""
+        score = message.get('content_score')
+        if score is not None:
+            return score
+        
         content = message.get('content', '').lower()
         role = message.get('role', '')
         
@@ -65,39 +218,43 @@ class ContextManager:
             score += 0.15
             
         # Check for artifacts (important content)
-        if 'artifact' in content or '<artifact' in content:
+        if 'artifact' in content:
             score += 0.2
             
-        # Keyword scoring
-        for level, keywords in self.importance_keywords.items():
-            matches = sum(1 for keyword in keywords if keyword in content)
-            if matches > 0:
-                if level == 'high':
-                    score += min(0.3, matches * 0.1)
-                elif level == 'medium':
-                    score += min(0.2, matches * 0.05)
-                else:
-                    score -= min(0.1, matches * 0.02)
+        # Keyword scoring (distinct whole-word keywords per level)
+        matches = {'high': 0, 'medium': 0, 'low': 0}
+        for keyword in set(self._keyword_pattern.findall(content)):
+            matches[self._keyword_levels[keyword]] += 1
+        if matches['high']:
+            score += min(0.3, matches['high'] * 0.1)
+        if matches['medium']:
+            score += min(0.2, matches['medium'] * 0.05)
+        if matches['low']:
+            score -= min(0.1, matches['low'] * 0.02)
         
         # Length factor (longer messages often contain more info)
         if len(content) > 500:
             score += 0.1
         elif len(content) < 50:
             score -= 0.1
-            
-        # Recency boost (newer messages get slight preference)
-        if 'timestamp' in message:
-            try:
-                msg_time = datetime.fromisoformat(message['timestamp'])
-                age_hours = (datetime.now() - msg_time).total_seconds() / 3600
-                if age_hours < 1:
-                    score += 0.1
-                elif age_hours > 24:
-                    score -= 0.1
-            except:
-                pass
-                
-        return max(0.0, min(1.0, score))
+        
+        message['content_score'] = score
+        return score
+    
+    def recency_score(self, message: Dict, now: Optional[datetime] = None) -> float:
+        """Time-dependent part of the importance score (newer messages get slight preference)"""
+        if isinstance(message, ChatMessage):
+            created_at = message.created_at
+        else:
+            created_at = parse_epoch(message['timestamp']) if message.get('timestamp') else None
+        if created_at is None:
+            return 0.0
+        age_hours = ((now or datetime.now()).timestamp() - created_at) / 3600
+        if age_hours < 1:
+            return 0.1
+        elif age_hours > 24:
+            return -0.1
+        return 0.0
     
     def summarize_messages(self, messages: List[Dict]) -> str:
         """
@@ -145,12 +302,14 @@ class ContextManager:
         return summary
     
     def get_context_state(self, messages: List[Dict], system_message: str = "") -> Dict:
-        """Get detailed context window state"""
-        total_tokens = self.estimate_tokens(system_message)
+        """Get detailed context window state (O(1) for a ConversationHistory from this manager)"""
+        unscaled = self._system_unscaled(system_message)
         
-        for message in messages:
-            content = message.get('content', '')
-            total_tokens += self.estimate_tokens(content) + 10  # overhead
+        if isinstance(messages, ConversationHistory) and messages.token_counter == self.message_tokens:
+            unscaled += messages.token_total
+        else:
+            unscaled += sum(self.message_tokens(message) for message in messages)
+        total_tokens = self.to_tokens(unscaled)
             
         usage_ratio = total_tokens / self.context_window
         
@@ -179,101 +338,157 @@ class ContextManager:
             'tokens_remaining': self.context_window - total_tokens
         }
     
-    def manage_context(self, messages: List[Dict], system_message: str = "") -> Tuple[List[Dict], Dict]:
+    def messages_to_summarize(self, messages: List[Dict], keep_recent: int) -> List[Dict]:
+        """Older messages (all but the most recent keep_recent) not yet covered by the rolling summary"""
+        session = getattr(messages, 'session', None)
+        summary = session.rolling_summary if session else None
+        through_seq = summary['through_seq'] if summary else -1
+        older = messages[:max(0, len(messages) - keep_recent)]
+        return [message for message in older if message.get('seq', -1) > through_seq]
+    
+    def set_rolling_summary(self, session: SessionContext, content: str, through_seq: int):
+        """Store a rolling summary covering every message up to through_seq (called from the summarizer)"""
+        current = session.rolling_summary
+        if current and current['through_seq'] >= through_seq:
+            return  # A newer summary already landed
+        session.rolling_summary = {
+            'content': content,
+            'through_seq': through_seq,
+            'tokens': self.estimate_tokens(content),
+            'updated_at': datetime.now().isoformat()
+        }
+    
+    def apply_rolling_summary(self, messages: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Replace the prefix of messages covered by the rolling summary with one summary
+        message (pinned recent messages are never replaced). Returns (messages, replaced count).
+        """
+        session = getattr(messages, 'session', None)
+        summary = session.rolling_summary if session else None
+        if not summary:
+            return messages, 0
+        
+        covered = -1
+        for i in range(max(0, len(messages) - self.pinned_recent_messages)):
+            if messages[i].get('seq', -1) <= summary['through_seq']:
+                covered = i
+            else:
+                break
+        if covered < 0 or (covered == 0 and messages[0].get('rolling_summary')):
+            return messages, 0  # Nothing new to swap in
+        
+        summary_message = {
+            'role': 'system',
+            'content': ROLLING_SUMMARY_PREFIX + summary['content'],
+            'timestamp': messages[covered].get('timestamp'),
+            'seq': summary['through_seq'],
+            'is_summary': True,
+            'rolling_summary': True
+        }
+        session.recall_index.add_messages(messages[:covered + 1])
+        return self.new_history([summary_message] + list(messages[covered + 1:]), session), covered + 1
+    
+    def recall(self, messages: List[Dict], query: str) -> List[Dict]:
+        """Passages evicted from this session relevant to query, within the recall token budget"""
+        session = getattr(messages, 'session', None)
+        if not self.recall_token_budget or not session or not len(session.recall_index):
+            return []
+        return session.recall_index.recall(query, self.recall_token_budget, self.recall_top_k,
+                                           count_tokens=self.estimate_tokens)
+    
+    def manage_context(self, messages: List[Dict], system_message: str = "",
+                       token_budget: Optional[int] = None) -> Tuple[List[Dict], Dict]:
         """
-        Main context management function with progressive strategies.
+        Main context management function: once usage crosses the warning threshold,
+        evict the lowest value-per-token messages until the history fits token_budget
+        (default target_threshold of the window). The most recent messages are pinned,
+        and contiguous evictions are merged into summaries. A background rolling
+        summary, when one is ready, replaces the turns it covers first.
         Returns (managed_messages, management_info)
         """
         if not messages:
             return messages, {'action': 'none', 'removed': 0}
             
         state = self.get_context_state(messages, system_message)
+        budget = token_budget if token_budget is not None else int(self.context_window * self.target_threshold)
         
-        if state['strategy'] == 'none':
+        if state['strategy'] == 'none' or state['tokens_used'] <= budget:
             return messages, {'action': 'none', 'removed': 0, 'state': state}
-            
-        # Calculate importance scores for all messages
-        scored_messages = []
-        for i, msg in enumerate(messages):
-            score = self.calculate_message_importance(msg)
-            # Boost score for recent messages
-            recency_boost = (i / len(messages)) * 0.3
-            final_score = score + recency_boost
-            scored_messages.append((final_score, i, msg))
-            
-        # Sort by score (lower scores = less important)
-        scored_messages.sort(key=lambda x: x[0])
         
-        managed_messages = messages.copy()
-        removed_count = 0
-        summarized_groups = []
+        messages, rolled_up = self.apply_rolling_summary(messages)
+        tokens = self.get_context_state(messages, system_message)['tokens_used'] if rolled_up else state['tokens_used']
+        scale = self.token_counter.scale
+        summary_reserve = SUMMARY_TOKEN_RESERVE * scale
         
-        # Progressive removal based on strategy
-        if state['strategy'] == 'light':
-            # Remove lowest importance messages (up to 20%)
-            remove_count = max(2, int(len(messages) * 0.2))
-            
-        elif state['strategy'] == 'moderate':
-            # Remove more messages and start summarizing (up to 40%)
-            remove_count = max(4, int(len(messages) * 0.4))
-            
-        elif state['strategy'] == 'aggressive':
-            # Keep only essential messages (remove up to 60%)
-            remove_count = max(6, int(len(messages) * 0.6))
-            
-        # Build list of messages to remove
-        messages_to_remove = []
-        groups_to_summarize = []
-        
-        for score, idx, msg in scored_messages[:remove_count]:
-            # Don't remove the most recent 4 messages
-            if idx >= len(messages) - 4:
-                continue
-                
-            # Group consecutive messages for summarization
-            if groups_to_summarize and idx == groups_to_summarize[-1][-1] + 1:
-                groups_to_summarize[-1].append(idx)
-            else:
-                groups_to_summarize.append([idx])
-                
-            messages_to_remove.append(idx)
-            
-        # Create summaries for removed message groups
-        summary_messages = []
-        for group in groups_to_summarize:
-            if len(group) >= 2:  # Only summarize groups of 2+ messages
-                group_messages = [messages[i] for i in group]
+        # Value per token: importance (plus the positional recency boost) over the message's cost
+        now = datetime.now()
+        count = len(messages)
+        pinned_from = max(0, count - self.pinned_recent_messages)
+        candidates = []
+        for i in range(pinned_from):
+            msg = messages[i]
+            if msg.get('rolling_summary'):
+                continue  # Stands in for the whole older conversation
+            value = self.calculate_message_importance(msg, now) + (i / count) * 0.3
+            candidates.append((value / max(1, self.message_tokens(msg)), i))
+        candidates.sort()
+        
+        # Evict in ascending value density until the kept messages plus the summaries
+        # replacing evicted runs fit. Runs are tracked by their endpoints so merging
+        # neighbours is O(1); only runs of 2+ messages get a summary.
+        run_end = {}    # run start -> run end
+        run_start = {}  # run end -> run start
+        summarized_runs = 0
+        evicted = set()
+        for _, i in candidates:
+            if tokens + summarized_runs * summary_reserve <= budget:
+                break
+            start, end = run_start.pop(i - 1, i), run_end.pop(i + 1, i)
+            summarized_runs -= (i - 1 in evicted and i - 1 > start) + (i + 1 in evicted and end > i + 1)
+            run_end.pop(start, None)
+            run_start.pop(end, None)
+            run_end[start] = end
+            run_start[end] = start
+            summarized_runs += end > start
+            evicted.add(i)
+            tokens -= self.message_tokens(messages[i]) * scale
+        
+        # Build the final list, with each summarized run replaced by its summary
+        session = getattr(messages, 'session', None)
+        final_messages = self.new_history(session=session)
+        summarized = 0
+        for i, msg in enumerate(messages):
+            if i not in evicted:
+                final_messages.append(msg)
+            elif i in run_end and run_end[i] > i:
+                group_messages = messages[i:run_end[i] + 1]
                 summary = self.summarize_messages(group_messages)
                 if summary:
-                    summary_msg = {
+                    final_messages.append({
                         'role': 'system',
                         'content': summary,
                         'timestamp': group_messages[0].get('timestamp'),
+                        'seq': group_messages[-1].get('seq'),  # Covers the turns it replaced
                         'is_summary': True
-                    }
-                    summary_messages.append((group[0], summary_msg))
-                    
-        # Build final message list
-        final_messages = []
-        removed_indices = set(messages_to_remove)
-        summary_dict = dict(summary_messages)
+                    })
+                    summarized += 1
         
-        for i, msg in enumerate(messages):
-            if i in summary_dict and i == min(removed_indices):
-                # Insert summary at the position of first removed message
-                final_messages.append(summary_dict[i])
-            if i not in removed_indices:
-                final_messages.append(msg)
-                
-        # Ensure we actually reduced token count
+        if session:
+            session.recall_index.add_messages([messages[i] for i in sorted(evicted)])
         new_state = self.get_context_state(final_messages, system_message)
         
         management_info = {
             'action': state['strategy'],
-            'removed': len(messages_to_remove),
-            'summarized': len(summary_messages),
+            'removed': len(evicted) + rolled_up,
+            'summarized': summarized,
+            'rolling_summary_applied': rolled_up,
+            'recallable_passages': len(final_messages.session.recall_index),
+            'pinned': count - pinned_from,
+            'token_budget': budget,
+            'within_budget': new_state['tokens_used'] <= budget,
             'original_tokens': state['tokens_used'],
             'final_tokens': new_state['tokens_used'],
+            'tokens_freed': state['tokens_used'] - new_state['tokens_used'],
             'reduction_percentage': round((1 - new_state['tokens_used']/state['tokens_used']) * 100, 1),
             'state': new_state
         }
@@ -0,0 +1,140 @@
+import os
+import queue
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a rolling summary of a support conversation between a user and an AI assistant that manages Slide backup and disaster recovery systems.
+Update the existing summary with the new turns. Keep every concrete fact the conversation may refer back to: client, device, agent and hostnames, IDs, dates, backup and snapshot states, errors, decisions, tool results and what the user asked for.
+Drop pleasantries and repetition. Write compact bullet points, at most about 400 words, and output only the updated summary."""
+
+def build_summary_prompt(previous_summary: Optional[str], messages: List[Dict]) -> str:
+    """User prompt folding new turns into the previous rolling summary"""
+    transcript = '\n\n'.join(f"{message.get('role', 'user').upper()}: {message.get('content', '')}"
+                             for message in messages)
+    return (f"EXISTING SUMMARY:\n{previous_summary or '(none yet)'}\n\n"
+            f"NEW TURNS:\n{transcript}\n\nUpdated summary:")
+
+class ConversationSummarizer:
+    """
+    Background rolling summaries of older conversation turns.
+    Once a session's context usage crosses its summary threshold, a job folds the
+    turns not yet covered into the session's rolling summary with a fast model,
+    off the request path. ContextManager.manage_context swaps the summary in when
+    it has to prune, so chat requests never wait on summarization.
+    """
+
+    def __init__(self, summarize_fn: Optional[Callable[[Optional[str], List[Dict]], str]],
+                 keep_recent_messages: int = 8, min_batch_tokens: int = 2000,
+                 max_batch_tokens: int = 60000, max_queue_size: int = 32):
+        self.summarize_fn = summarize_fn  # (previous_summary, messages) -> summary; None disables
+        self.keep_recent_messages = keep_recent_messages  # Recent turns stay verbatim
+        self.min_batch_tokens = min_batch_tokens  # Don't call the model for a handful of messages
+        self.max_batch_tokens = max_batch_tokens  # Larger backlogs are folded in over several jobs
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._inflight = set()  # Session ids with a queued or running job
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.stats = {
+            'scheduled': 0,
+            'completed': 0,
+            'failed': 0,
+            'dropped': 0,
+            'last_duration_ms': None
+        }
+
+    def maybe_schedule(self, session_id: str, context_manager, messages: List[Dict], state: Dict) -> bool:
+        """Queue a rolling summary update if the session needs one; never blocks"""
+        session = getattr(messages, 'session', None)
+        if self.summarize_fn is None or session is None or state.get('usage_ratio', 0) < context_manager.summary_threshold:
+            return False
+
+        pending = context_manager.messages_to_summarize(messages, self.keep_recent_messages)
+        batch = []
+        batch_tokens = 0
+        for message in pending:
+            tokens = context_manager.to_tokens(context_manager.message_tokens(message))
+            if batch and batch_tokens + tokens > self.max_batch_tokens:
+                break
+            batch.append({key: message.get(key) for key in ('role', 'content', 'timestamp')})
+            batch_tokens += tokens
+        if batch_tokens < self.min_batch_tokens:
+            return False
+
+        with self._lock:
+            if session_id in self._inflight:
+                return False
+            self._inflight.add(session_id)
+
+        current = session.rolling_summary
+        job = {
+            'session_id': session_id,
+            'context_manager': context_manager,
+            'session': session,  # Shared by later rewrites of the history
+            'previous_summary': current['content'] if current else None,
+            'messages': batch,
+            'through_seq': pending[len(batch) - 1]['seq']
+        }
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._inflight.discard(session_id)
+                self.stats['dropped'] += 1
+            logger.warning(f"Summary queue full, skipping rolling summary for session {session_id}")
+            return False
+
+        with self._lock:
+            self.stats['scheduled'] += 1
+        return True
+
+    def _ensure_worker(self):
+        """Start the worker lazily (and again after a fork)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='conversation-summarizer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            start = time.perf_counter()
+            try:
+                summary = self.summarize_fn(job['previous_summary'], job['messages'])
+                if not summary:
+                    raise ValueError('empty summary')
+                job['context_manager'].set_rolling_summary(job['session'], summary, job['through_seq'])
+                duration_ms = round((time.perf_counter() - start) * 1000, 1)
+                with self._lock:
+                    self.stats['completed'] += 1
+                    self.stats['last_duration_ms'] = duration_ms
+                logger.info(f"Rolling summary for session {job['session_id']} now covers through message "
+                            f"{job['through_seq']} ({len(job['messages'])} new, {duration_ms}ms)")
+            except Exception as e:
+                with self._lock:
+                    self.stats['failed'] += 1
+                logger.error(f"Rolling summary for session {job['session_id']} failed: {e}")
+            finally:
+                with self._lock:
+                    self._inflight.discard(job['session_id'])
+                self._queue.task_done()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'enabled': self.summarize_fn is not None,
+                'queued': self._queue.qsize(),
+                'inflight': len(self._inflight),
+                'checked_at': datetime.now().isoformat()
+            }
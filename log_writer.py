@@ -0,0 +1,147 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class JsonLogWriter:
+    """
+    Background writer for the structured session/API logs and session debug dumps.
+    Callers only enqueue a record; one writer thread serializes records as compact
+    JSON and appends each batch with a single write per file, so request handlers
+    and response streams never format or touch log files themselves. Records are
+    serialized later, so callers hand over freshly built dicts and leave them be.
+    When the queue is full, records are dropped (and counted) rather than waiting.
+    """
+
+    def __init__(self, logs_dir: str, batch_size: int = 500, flush_interval: float = 0.2,
+                 max_queue_size: int = 10000):
+        self.logs_dir = logs_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._pid = None
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0, 'bytes': 0, 'largest_batch': 0}
+        atexit.register(self.flush, 5.0)
+
+    def log(self, stream: str, record: Dict):
+        """Append a record to today's <stream>_YYYYMMDD.log as one JSON line"""
+        self._enqueue(('line', stream, record))
+
+    def dump(self, filename: str, data: Dict):
+        """Write data as a JSON file of its own (e.g. a session debug log)"""
+        self._enqueue(('file', filename, data))
+
+    def _enqueue(self, item):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._bump('dropped')  # Logging is best effort; never hold up a request
+
+    def _bump(self, stat: str, count: int = 1):
+        with self._stats_lock:
+            self._stats[stat] += count
+
+    def _ensure_writer(self):
+        """Start the writer thread lazily (and again after a fork)"""
+        if self._pid == os.getpid() and self._writer and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._pid == os.getpid() and self._writer and self._writer.is_alive():
+                return
+            self._pid = os.getpid()
+            self._writer = threading.Thread(target=self._writer_loop, name='log-writer', daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Log writer batch of {len(batch)} failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        today = datetime.now().strftime("%Y%m%d")
+        lines = defaultdict(list)  # filename -> serialized records
+        for kind, name, record in batch:
+            try:
+                text = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+            except Exception as e:
+                self._bump('failed')
+                logger.error(f"Unserializable {name} log record: {e}")
+                continue
+            if kind == 'line':
+                lines[f"{name}_{today}.log"].append(text)
+            else:
+                self._write(name, text.encode('utf-8'), 'wb')
+
+        for filename, records in lines.items():
+            self._write(filename, ('\n'.join(records) + '\n').encode('utf-8'), 'ab', len(records))
+
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+
+    def _write(self, filename: str, data: bytes, mode: str, records: int = 1):
+        path = os.path.join(self.logs_dir, filename)
+        try:
+            os.makedirs(self.logs_dir, exist_ok=True)
+            if mode == 'ab':
+                with open(path, mode) as f:
+                    f.write(data)  # One write per file per batch; O_APPEND keeps workers' batches whole
+            else:
+                # Whole-file dumps are swapped in, so readers never see a partial file
+                temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_path, mode) as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            with self._stats_lock:
+                self._stats['written'] += records
+                self._stats['bytes'] += len(data)
+        except OSError as e:
+            self._bump('failed', records)
+            logger.error(f"Failed to write log {filename}: {e}")
+
+    def flush(self, timeout: float = 10.0):
+        """Wait until queued records are written (at exit, and for tests)"""
+        if self._pid != os.getpid():
+            return  # No writer in this process
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'queue_size': self._queue.qsize(),
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval
+        }
@@ -0,0 +1,139 @@
+import html
+import logging
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import markdown  # Optional: enables server-side rendering of markdown artifacts
+except ImportError:
+    markdown = None
+
+logger = logging.getLogger(__name__)
+
+# Same flavour as the client-side marked.js setup: GFM-style tables and fences, hard line breaks.
+# codehilite highlights fenced code with Pygments when it is installed (plain <pre><code> otherwise)
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', 'nl2br', 'codehilite']
+MARKDOWN_EXTENSION_CONFIGS = {
+    'codehilite': {'css_class': 'codehilite', 'guess_lang': False},
+    'extra': {'tables': {'use_align_attribute': True}}
+}
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'dd', 'del', 'details', 'div', 'dl', 'dt',
+    'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li', 'mark', 'ol', 'p',
+    'pre', 's', 'samp', 'small', 'span', 'strong', 'sub', 'summary', 'sup', 'table', 'tbody', 'td',
+    'tfoot', 'th', 'thead', 'tr', 'u', 'ul'
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Elements dropped together with everything inside them (svg/math: foreign content parses differently)
+DROPPED_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select',
+                        'svg', 'math'}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'title'},  # No id: rendered HTML is inlined into the app page
+    'a': {'href'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'ol': {'start'},
+    'td': {'align', 'colspan', 'rowspan'},
+    'th': {'align', 'colspan', 'rowspan'}
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+class HTMLSanitizer(HTMLParser):
+    """
+    Allowlist HTML sanitizer for rendered markdown.
+    Unknown tags are unwrapped (their text is kept), script-like elements are
+    dropped with their content, attributes are filtered per tag and URLs are
+    limited to safe schemes. Unclosed elements are closed at the end.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts = []
+        self._open = []  # Stack of emitted open tags
+        self._dropping = 0  # Depth inside DROPPED_CONTENT_TAGS
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in DROPPED_CONTENT_TAGS:
+            self._dropping += 1
+            return
+        if self._dropping or tag not in ALLOWED_TAGS:
+            return
+        self._parts.append(f"<{tag}{self._format_attributes(tag, attrs)}>")
+        if tag not in VOID_TAGS:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in DROPPED_CONTENT_TAGS:
+            return
+        if not self._dropping and tag in ALLOWED_TAGS:
+            self._parts.append(f"<{tag}{self._format_attributes(tag, attrs)}>")
+            if tag not in VOID_TAGS:
+                self._parts.append(f"</{tag}>")
+
+    def handle_endtag(self, tag: str):
+        if tag in DROPPED_CONTENT_TAGS:
+            self._dropping = max(0, self._dropping - 1)
+            return
+        if self._dropping or tag not in self._open:
+            return
+        # Close anything left open inside this element
+        while self._open:
+            open_tag = self._open.pop()
+            self._parts.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data: str):
+        if not self._dropping:
+            self._parts.append(html.escape(data, quote=False))
+
+    def _format_attributes(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> str:
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        formatted = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not is_safe_url(value):
+                continue
+            formatted.append(f' {name}="{html.escape(value, quote=True)}"')
+        if tag == 'a':
+            formatted.append(' rel="noopener noreferrer nofollow"')
+        return ''.join(formatted)
+
+    def result(self) -> str:
+        self.close()
+        while self._open:
+            self._parts.append(f"</{self._open.pop()}>")
+        return ''.join(self._parts)
+
+def is_safe_url(url: str) -> bool:
+    """Relative, fragment, http(s) and mailto URLs only (no javascript:, data:, ...)"""
+    # Browsers ignore control characters and whitespace inside the scheme
+    cleaned = ''.join(ch for ch in url if ch > ' ' and ch != '\x7f')
+    try:
+        scheme = urlsplit(cleaned).scheme.lower()
+    except ValueError:
+        return False
+    return scheme in ALLOWED_URL_SCHEMES
+
+def sanitize_html(fragment: str) -> str:
+    sanitizer = HTMLSanitizer()
+    sanitizer.feed(fragment)
+    return sanitizer.result()
+
+def is_available() -> bool:
+    return markdown is not None
+
+def render_markdown(text: str) -> Optional[str]:
+    """Render markdown to a sanitized, syntax-highlighted HTML fragment (None if markdown is not installed)"""
+    if markdown is None:
+        return None
+    rendered = markdown.markdown(
+        text,
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+        output_format='html'
+    )
+    return sanitize_html(rendered)
@@ -0,0 +1,177 @@
+import math
+import re
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+PASSAGE_CHARS = 600  # Evicted messages are indexed in passages of about this size
+MAX_PASSAGES = 5000  # Per session; the oldest passages are forgotten first
+PASSAGE_OVERHEAD_BYTES = 400  # Rough per-passage cost of its record and postings entries
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TERMS = re.compile(r'\w+', re.UNICODE)
+STOPWORDS = frozenset('''
+a an and are as at be but by can could did do does for from had has have how i if in into is it its
+me my no not of on or our so than that the their them then there these they this to too us was we
+were what when where which who why will with would you your
+'''.split())
+
+def tokenize(text: str) -> List[str]:
+    return [term for term in _TERMS.findall(text.lower()) if len(term) > 1 and term not in STOPWORDS]
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Split a message into passages on line boundaries (long lines are cut)"""
+    passages = []
+    current = []
+    size = 0
+    for line in text.splitlines():
+        while len(line) > max_chars:
+            passages.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and size + len(line) > max_chars:
+            passages.append('\n'.join(current))
+            current, size = [], 0
+        if line.strip() or current:
+            current.append(line)
+            size += len(line) + 1
+    if current:
+        passages.append('\n'.join(current))
+    return [passage.strip() for passage in passages if passage.strip()]
+
+class MessageRecallIndex:
+    """
+    Per-session BM25 index over messages evicted from the context window.
+    Passages are stored as sparse term-frequency postings (term -> {passage: tf}),
+    so a query only touches the postings of its own terms. Everything stays in
+    process; the index is bounded at max_passages, dropping the oldest first.
+    """
+
+    def __init__(self, max_passages: int = MAX_PASSAGES):
+        self.max_passages = max_passages
+        self._postings = {}  # term -> {passage_id: term frequency}
+        self._passages = {}  # passage_id -> {'text', 'role', 'timestamp', 'seq', 'length', 'terms'}
+        self._total_length = 0
+        self._text_bytes = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    @property
+    def approx_bytes(self) -> int:
+        """Rough memory held by the index"""
+        return self._text_bytes + len(self._passages) * PASSAGE_OVERHEAD_BYTES
+
+    def add_messages(self, messages: List[Dict]) -> int:
+        """Index evicted messages; returns the number of passages added"""
+        added = 0
+        with self._lock:
+            for message in messages:
+                content = message.get('content')
+                if not isinstance(content, str) or message.get('is_summary'):
+                    continue  # Summaries are regenerated; the originals are what gets recalled
+                for text in split_passages(content):
+                    added += self._add(text, message.get('role'), message.get('timestamp'), message.get('seq'))
+            self._trim()
+        return added
+
+    def export_passages(self) -> List[List]:
+        """Indexed passages as [text, role, timestamp, seq] rows, oldest first (see add_passages)"""
+        with self._lock:
+            return [[passage['text'], passage['role'], passage['timestamp'], passage['seq']]
+                    for passage in self._passages.values()]
+
+    def add_passages(self, passages: List[List]) -> int:
+        """Re-index rows from export_passages (e.g. a rehydrated session) without re-splitting messages"""
+        with self._lock:
+            added = sum(self._add(*passage) for passage in passages)
+            self._trim()
+        return added
+
+    def _add(self, text: str, role: Optional[str], timestamp: Optional[str], seq: Optional[int]) -> int:
+        terms = Counter(tokenize(text))
+        if not terms:
+            return 0
+        passage_id = self._next_id
+        self._next_id += 1
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[passage_id] = count
+        length = sum(terms.values())
+        self._passages[passage_id] = {
+            'text': text,
+            'role': role,
+            'timestamp': timestamp,
+            'seq': seq,
+            'length': length,
+            'terms': tuple(terms)
+        }
+        self._total_length += length
+        self._text_bytes += len(text)
+        return 1
+
+    def _trim(self):
+        # Ids increase with insertion, so the oldest passages come first
+        while len(self._passages) > self.max_passages:
+            self._remove(next(iter(self._passages)))
+
+    def _remove(self, passage_id: int):
+        passage = self._passages.pop(passage_id)
+        self._total_length -= passage['length']
+        self._text_bytes -= len(passage['text'])
+        for term in passage['terms']:
+            postings = self._postings[term]
+            del postings[passage_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        """Best BM25 matches for query, highest score first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._passages)
+            if not terms or not count:
+                return []
+            average_length = self._total_length / count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for passage_id, tf in postings.items():
+                    length = self._passages[passage_id]['length']
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [{key: self._passages[passage_id][key] for key in ('text', 'role', 'timestamp', 'seq')}
+                    | {'score': round(score, 3)} for passage_id, score in best]
+
+    def recall(self, query: str, token_budget: int, top_k: int = 5,
+               count_tokens=None) -> List[Dict]:
+        """
+        Top matches that fit within token_budget (by count_tokens, ~4 chars per
+        token by default), returned in conversation order.
+        """
+        count_tokens = count_tokens or (lambda text: len(text) // 4 + 1)
+        selected = []
+        used = 0
+        for hit in self.search(query, top_k):
+            tokens = count_tokens(hit['text'])
+            if used + tokens > token_budget:
+                continue
+            selected.append(hit)
+            used += tokens
+        selected.sort(key=lambda hit: (hit['seq'] if hit['seq'] is not None else -1))
+        return selected
+
+def format_recalled(passages: List[Dict]) -> Optional[str]:
+    """Render recalled passages for the system prompt"""
+    if not passages:
+        return None
+    return '\n\n'.join(f"[{(passage.get('timestamp') or '')[:16]}] {(passage.get('role') or 'user').upper()}: "
+                       f"{passage['text']}" for passage in passages)
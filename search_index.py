@@ -0,0 +1,394 @@
+import os
+import re
+import sys
+import json
+import html
+import queue
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'search_index.db')
+
+MAX_INDEXED_CHARS = 200000  # Index at most this much text per document
+SNIPPET_TOKENS = 24
+RANK_WINDOW = 10000  # Broad queries are ranked within their newest N matches
+
+_STRIP_BLOCKS = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_STRIP_TAGS = re.compile(r'<[^>]+>')
+_WHITESPACE = re.compile(r'\s+')
+_QUERY_TERMS = re.compile(r'\w+', re.UNICODE)
+
+class SearchIndex:
+    """
+    Incremental SQLite FTS5 index over artifacts and chat messages.
+    Writes go through a single background writer that batches commits, so
+    indexing never blocks a request; searches use per-thread read connections.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = 200,
+                 flush_interval: float = 0.5, max_queue_size: int = 10000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._pid = None
+
+        self._stats = {'indexed': 0, 'removed': 0, 'dropped': 0, 'batches': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (SQLite connections are not shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                doc_key TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                type TEXT,
+                session_id TEXT,
+                title TEXT,
+                ref TEXT,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_filter ON documents (kind, type, created_at);
+            CREATE INDEX IF NOT EXISTS idx_documents_session ON documents (session_id, created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, body, tokenize = 'porter unicode61', prefix = '2 3'
+            );
+        ''')
+        conn.commit()
+
+    @staticmethod
+    def extract_text(content: str, content_type: Optional[str] = None) -> str:
+        """Plain text for indexing (markup stripped from HTML artifacts)"""
+        if content_type in ('html', 'haml') or content.lstrip().startswith('<'):
+            content = _STRIP_BLOCKS.sub(' ', content)
+            content = html.unescape(_STRIP_TAGS.sub(' ', content))
+        return _WHITESPACE.sub(' ', content).strip()[:MAX_INDEXED_CHARS]
+
+    @staticmethod
+    def message_key(session_id: str, role: str, content: str, timestamp: Optional[str] = None) -> str:
+        digest = hashlib.sha1(f"{session_id}\0{role}\0{timestamp or ''}\0{content}".encode('utf-8')).hexdigest()
+        return f"msg:{digest}"
+
+    def add_artifact(self, filename: str, title: str, content: str, artifact_type: Optional[str] = None,
+                     session_id: Optional[str] = None, created_at: Optional[str] = None, block: bool = False):
+        """Queue a finalized artifact for indexing"""
+        self._enqueue(('add', {
+            'doc_key': f"artifact:{filename}",
+            'kind': 'artifact',
+            'type': artifact_type,
+            'session_id': session_id,
+            'title': title,
+            'ref': f"/artifacts/{filename}",
+            'created_at': created_at or datetime.now().isoformat(),
+            'body': self.extract_text(content, artifact_type)
+        }), block)
+
+    def add_message(self, session_id: str, role: str, content: str, timestamp: Optional[str] = None,
+                    block: bool = False):
+        """Queue a chat message for indexing"""
+        if not content or not content.strip():
+            return
+        self._enqueue(('add', {
+            'doc_key': self.message_key(session_id, role, content, timestamp),
+            'kind': 'message',
+            'type': role,
+            'session_id': session_id,
+            'title': None,
+            'ref': session_id,
+            'created_at': timestamp or datetime.now().isoformat(),
+            'body': _WHITESPACE.sub(' ', content).strip()[:MAX_INDEXED_CHARS]
+        }), block)
+
+    def remove_artifact(self, filename: str):
+        self._enqueue(('remove', f"artifact:{filename}"))
+
+    def _enqueue(self, item, block: bool = False):
+        self._ensure_writer()
+        try:
+            self._queue.put(item, block=block)
+        except queue.Full:
+            # Search is best effort; never hold up chat or artifact processing
+            self._stats['dropped'] += 1
+            logger.warning("Search index queue full, dropping update")
+
+    def _ensure_writer(self):
+        """Start the writer thread lazily (and again after a fork)"""
+        if self._pid == os.getpid() and self._writer and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._pid == os.getpid() and self._writer and self._writer.is_alive():
+                return
+            self._pid = os.getpid()
+            self._writer = threading.Thread(target=self._writer_loop, name='search-index-writer', daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._apply_batch(batch)
+            except Exception as e:
+                logger.error(f"Search index batch of {len(batch)} failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply_batch(self, batch: List):
+        conn = self._connect()
+        with conn:
+            for action, payload in batch:
+                if action == 'add':
+                    self._write_document(conn, payload)
+                    self._stats['indexed'] += 1
+                elif action == 'remove':
+                    self._delete_document(conn, payload)
+                    self._stats['removed'] += 1
+        self._stats['batches'] += 1
+
+    def _write_document(self, conn: sqlite3.Connection, document: Dict):
+        self._delete_document(conn, document['doc_key'])
+        cursor = conn.execute(
+            'INSERT INTO documents (doc_key, kind, type, session_id, title, ref, created_at) '
+            'VALUES (:doc_key, :kind, :type, :session_id, :title, :ref, :created_at)',
+            document
+        )
+        conn.execute(
+            'INSERT INTO documents_fts (rowid, title, body) VALUES (?, ?, ?)',
+            (cursor.lastrowid, document['title'] or '', document['body'])
+        )
+
+    def _delete_document(self, conn: sqlite3.Connection, doc_key: str):
+        row = conn.execute('SELECT id FROM documents WHERE doc_key = ?', (doc_key,)).fetchone()
+        if row:
+            conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (row['id'],))
+            conn.execute('DELETE FROM documents WHERE id = ?', (row['id'],))
+
+    def flush(self, timeout: float = 10.0):
+        """Wait until queued updates are written (used by backfill and tests)"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    @staticmethod
+    def build_match_query(query: str) -> Optional[str]:
+        """Turn free text into a safe FTS5 query: all terms must match, the last one as a prefix"""
+        terms = _QUERY_TERMS.findall(query or '')[:16]
+        if not terms:
+            return None
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    @staticmethod
+    def make_snippet(body: str, terms: List[str], size: int = SNIPPET_TOKENS) -> str:
+        """Window of words around the first matching term, with matches in [brackets]"""
+        words = body.split(' ')
+        prefix = terms[-1] if terms else None
+
+        def matches(word):
+            token = ''.join(_QUERY_TERMS.findall(word)).lower()
+            return bool(token) and (token in terms or (prefix is not None and token.startswith(prefix)))
+
+        first = next((index for index, word in enumerate(words) if matches(word)), 0)
+        start = max(0, first - size // 4)
+        window = words[start:start + size]
+        snippet = ' '.join(f'[{word}]' if matches(word) else word for word in window)
+        return ('…' if start > 0 else '') + snippet + ('…' if start + size < len(words) else '')
+
+    def search(self, query: str, kind: Optional[str] = None, doc_type: Optional[str] = None,
+               session_id: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+               page: int = 1, per_page: int = 20) -> Dict:
+        """Ranked (BM25, title weighted) search with filters and pagination"""
+        page = max(1, page)
+        per_page = max(1, min(per_page, 100))
+        match = self.build_match_query(query)
+        if not match:
+            return {'results': [], 'total': 0, 'page': page, 'per_page': per_page, 'pages': 0}
+
+        conditions = ['documents_fts MATCH ?']
+        params = [match]
+        for column, value in (('d.kind', kind), ('d.type', doc_type), ('d.session_id', session_id)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if since:
+            conditions.append('d.created_at >= ?')
+            params.append(since)
+        if until:
+            conditions.append('d.created_at < ?')
+            params.append(until)
+        where = ' AND '.join(conditions)
+
+        start = time.perf_counter()
+        conn = self._connect()
+        # CROSS JOIN pins the join order: let FTS find matches first, then apply filters
+        source = f'FROM documents_fts CROSS JOIN documents d ON d.id = documents_fts.rowid WHERE {where}'
+        total = conn.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 {source} LIMIT ?)', params + [RANK_WINDOW + 1]
+        ).fetchone()[0]
+        capped = total > RANK_WINDOW
+        if capped:
+            # BM25 over every match of a very broad query costs hundreds of ms;
+            # rank only the newest RANK_WINDOW matches (rowids grow with time)
+            lowest_rowid = conn.execute(
+                f'SELECT MIN(rowid) FROM (SELECT documents_fts.rowid AS rowid {source} '
+                f'ORDER BY documents_fts.rowid DESC LIMIT ?)', params + [RANK_WINDOW]
+            ).fetchone()[0]
+            source += ' AND documents_fts.rowid >= ?'
+            params = params + [lowest_rowid]
+            total = RANK_WINDOW
+        ranked = conn.execute(
+            f'SELECT d.id, d.kind, d.type, d.session_id, d.title, d.ref, d.created_at, '
+            f'bm25(documents_fts, 4.0, 1.0) AS score {source} ORDER BY score LIMIT ? OFFSET ?',
+            params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+
+        # Snippets only for the page being returned. Built here rather than with
+        # FTS5 snippet(), which re-expands prefix terms for every row
+        bodies = {}
+        if ranked:
+            ids = [row['id'] for row in ranked]
+            bodies = dict(conn.execute(
+                f"SELECT rowid, body FROM documents_fts WHERE rowid IN ({', '.join('?' for _ in ids)})", ids
+            ).fetchall())
+        terms = [term.lower() for term in _QUERY_TERMS.findall(query)[:16]]
+
+        results = []
+        for row in ranked:
+            result = dict(row)
+            result['snippet'] = self.make_snippet(bodies.get(result.pop('id')) or '', terms)
+            result['score'] = round(-result['score'], 4)  # bm25() is lower-is-better
+            results.append(result)
+
+        return {
+            'results': results,
+            'total': total,
+            'total_capped': capped,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page,
+            'took_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def get_stats(self) -> Dict:
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS documents, SUM(kind = 'artifact') AS artifacts, SUM(kind = 'message') AS messages "
+            "FROM documents"
+        ).fetchone()
+        stats = {key: row[key] or 0 for key in row.keys()}
+        stats.update(self._stats)
+        stats['queue_size'] = self._queue.qsize()
+        return stats
+
+    def backfill(self, catalogue, read_body, logs_dir: Optional[str] = None) -> Dict:
+        """
+        One-shot indexing of existing artifacts (via the catalogue) and of chat
+        messages recorded in session_debug_*.json logs
+        """
+        stats = {'artifacts': 0, 'messages': 0, 'errors': 0}
+
+        page = 1
+        while True:
+            listing = catalogue.list_artifacts(page=page, per_page=200)
+            for entry in listing['artifacts']:
+                try:
+                    body = read_body(entry)
+                    if body is None:
+                        continue
+                    self.add_artifact(entry['filename'], entry.get('title'), body.decode('utf-8', errors='replace'),
+                                      entry.get('type'), entry.get('session_id'), entry.get('created_at'), block=True)
+                    stats['artifacts'] += 1
+                except Exception as e:
+                    logger.error(f"Failed to index artifact {entry['filename']}: {e}")
+                    stats['errors'] += 1
+            if page >= listing['pages']:
+                break
+            page += 1
+
+        if logs_dir and os.path.isdir(logs_dir):
+            for entry in os.scandir(logs_dir):
+                if not (entry.name.startswith('session_debug_') and entry.name.endswith('.json')):
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        debug_data = json.load(f)
+                    session_id = debug_data.get('session_id')
+                    for message in debug_data.get('messages') or []:
+                        if isinstance(message.get('content'), str):
+                            # No per-message timestamps in these logs; identical messages collapse
+                            self.add_message(session_id, message.get('role', 'user'), message['content'], block=True)
+                            stats['messages'] += 1
+                    if debug_data.get('response_content'):
+                        self.add_message(session_id, 'assistant', debug_data['response_content'], block=True)
+                        stats['messages'] += 1
+                except Exception as e:
+                    logger.error(f"Failed to index session log {entry.path}: {e}")
+                    stats['errors'] += 1
+
+        self.flush(timeout=600)
+        logger.info(f"Search index backfill: {stats}")
+        return stats
+
+# Global search index instance
+search_index = SearchIndex()
+
+if __name__ == '__main__':
+    # Usage: python search_index.py backfill
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'backfill':
+        print("Usage: python search_index.py backfill")
+        sys.exit(1)
+
+    # The app module knows how to read stored artifact bodies (objects, deltas, legacy files)
+    from app import artifact_catalogue, open_artifact_body, LOGS_DIR
+
+    def read_body(entry):
+        body = open_artifact_body(entry)
+        if body is None:
+            return None
+        with body:
+            return body.read()
+
+    print(json.dumps(search_index.backfill(artifact_catalogue, read_body, LOGS_DIR), indent=2))
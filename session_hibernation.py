@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from chat_message import ChatMessage
+
+try:
+    import zstandard  # Optional: enables SESSION_HIBERNATE_CODEC=zstd
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HIBERNATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'hibernated_sessions')
+FORMAT_VERSION = 1
+CODEC_EXTENSIONS = {'zlib': '.json.z', 'zstd': '.json.zst'}
+DEFAULT_LEVELS = {'zlib': 6, 'zstd': 3}
+EXPIRE_INTERVAL_SECONDS = 3600  # Expired blobs are found by walking the directory, so not on every sweep
+
+class SessionHibernator:
+    """
+    Cold tier for chat sessions: histories evicted from the in-memory registry
+    (idle, or pushed out by its count/byte limits) are written as compressed
+    JSON blobs, with their token counts, rolling summary and recall passages,
+    and rebuilt on their next access. Eviction only stages a history (the
+    registry calls stage() under its lock); flush() writes staged histories
+    out, and a staged history accessed before that is simply taken back.
+    Blobs idle longer than max_age_seconds are deleted.
+    """
+
+    def __init__(self, context_manager, directory: str = DEFAULT_HIBERNATE_DIR, codec: str = 'zlib',
+                 level: Optional[int] = None, max_age_seconds: Optional[float] = None):
+        codec = (codec or 'zlib').lower()
+        if codec == 'zstd' and zstandard is None:
+            logger.warning("zstandard is not installed, hibernating sessions with zlib")
+            codec = 'zlib'
+        elif codec not in CODEC_EXTENSIONS:
+            logger.warning(f"Unknown session hibernation codec '{codec}', using zlib")
+            codec = 'zlib'
+
+        self.context_manager = context_manager  # Rebuilds histories on rehydration
+        self.directory = directory
+        self.codec = codec
+        self.level = level if level is not None else DEFAULT_LEVELS[codec]
+        self.max_age_seconds = max_age_seconds
+
+        self._pending = {}  # session_id -> evicted history not yet written
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One writer at a time; others leave the work to it
+        self._last_expired = 0.0
+
+        self.stats = {
+            'hibernated': 0,
+            'rehydrated': 0,
+            'reclaimed': 0,  # Taken back before they were written
+            'expired': 0,
+            'failed': 0,
+            'raw_bytes': 0,
+            'compressed_bytes': 0
+        }
+        self._timings = {'hibernate': [0, 0.0, 0.0], 'rehydrate': [0, 0.0, 0.0]}  # count, total ms, max ms
+        self._disk = None  # Blob count and size as of the last expiry scan
+
+    def _path(self, session_id: str, codec: Optional[str] = None) -> str:
+        # Session ids come from clients, so file names are hashes of them
+        digest = hashlib.sha256(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + CODEC_EXTENSIONS[codec or self.codec])
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    @staticmethod
+    def _decompress(path: str, blob: bytes) -> bytes:
+        if path.endswith(CODEC_EXTENSIONS['zstd']):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd session blobs")
+            return zstandard.ZstdDecompressor().decompress(blob)
+        return zlib.decompress(blob)
+
+    def _record_timing(self, operation: str, elapsed_ms: float):
+        timing = self._timings[operation]
+        timing[0] += 1
+        timing[1] += elapsed_ms
+        timing[2] = max(timing[2], elapsed_ms)
+
+    def stage(self, session_id: str, history, reason: str = 'idle'):
+        """Take an evicted history (registry eviction listener); written out by the next flush()"""
+        if not len(history) and not len(history.session.recall_index) and history.session.rolling_summary is None:
+            return  # Nothing to keep; the next access starts an identical empty session
+        with self._lock:
+            self._pending[session_id] = history
+        logger.debug(f"Staged session {session_id} for hibernation ({reason})")
+
+    def flush(self) -> int:
+        """Write staged histories to disk; returns how many were written"""
+        if not self._flush_lock.acquire(blocking=False):
+            return 0  # Another thread is flushing
+        written = 0
+        try:
+            attempted = set()
+            while True:
+                with self._lock:
+                    session_id = next((key for key in self._pending if key not in attempted), None)
+                    if session_id is None:
+                        break
+                    history = self._pending[session_id]
+                attempted.add(session_id)
+
+                try:
+                    self._write(session_id, history)
+                    written += 1
+                except Exception as e:
+                    with self._lock:
+                        self.stats['failed'] += 1
+                        self._pending.pop(session_id, None)
+                    logger.error(f"Failed to hibernate session {session_id}: {e}")
+                    continue
+
+                with self._lock:
+                    if self._pending.get(session_id) is history:
+                        del self._pending[session_id]
+                        reclaimed = False
+                    else:
+                        reclaimed = session_id not in self._pending
+                if reclaimed:
+                    self._remove(self._path(session_id))  # Taken back while being written; the blob is stale
+        finally:
+            self._flush_lock.release()
+        return written
+
+    def _write(self, session_id: str, history):
+        start = time.perf_counter()
+        session = history.session
+        data = {
+            'format': FORMAT_VERSION,
+            'session_id': session_id,
+            'hibernated_at': datetime.now().isoformat(),
+            'next_seq': history.next_seq,
+            'store_version': session.store_version,
+            'rolling_summary': session.rolling_summary,
+            'messages': [[message.role, message.content, message.created_at, message.seq,
+                          int(message.is_summary), int(message.rolling_summary),
+                          message.token_count, message.content_score] for message in list(history)],
+            'recall': session.recall_index.export_passages()
+        }
+        raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        blob = self._compress(raw)
+
+        path = self._path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(temp_path, path)
+        for codec in CODEC_EXTENSIONS:
+            if codec != self.codec:
+                self._remove(self._path(session_id, codec))  # A blob left from before a codec change
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats['hibernated'] += 1
+            self.stats['raw_bytes'] += len(raw)
+            self.stats['compressed_bytes'] += len(blob)
+            self._record_timing('hibernate', elapsed_ms)
+        logger.info(f"Hibernated session {session_id}: {len(history)} messages, "
+                    f"{len(raw)} -> {len(blob)} bytes in {elapsed_ms:.1f}ms")
+
+    def rehydrate(self, session_id: str):
+        """The session's history if it is hibernated (the blob is then removed), else None"""
+        with self._lock:
+            history = self._pending.pop(session_id, None)
+            if history is not None:
+                self.stats['reclaimed'] += 1
+                return history
+
+        path = next((self._path(session_id, codec) for codec in (self.codec, *CODEC_EXTENSIONS)
+                     if os.path.exists(self._path(session_id, codec))), None)
+        if path is None:
+            return None
+
+        start = time.perf_counter()
+        try:
+            if self.max_age_seconds and time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                self._remove(path)
+                with self._lock:
+                    self.stats['expired'] += 1
+                return None
+            with open(path, 'rb') as f:
+                data = json.loads(self._decompress(path, f.read()))
+            if data.get('format') != FORMAT_VERSION or data.get('session_id') != session_id:
+                raise ValueError(f"unexpected blob format {data.get('format')} for {data.get('session_id')}")
+            history = self._restore(data)
+        except FileNotFoundError:
+            return None  # Rehydrated by another worker meanwhile
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += 1
+            logger.error(f"Failed to rehydrate session {session_id} from {path}: {e}")
+            return None
+
+        self._remove(path)  # Hot again; hibernated afresh when it next goes idle
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats['rehydrated'] += 1
+            self._record_timing('rehydrate', elapsed_ms)
+        logger.info(f"Rehydrated session {session_id}: {len(history)} messages in {elapsed_ms:.1f}ms")
+        return history
+
+    def _restore(self, data: Dict):
+        records = []
+        for role, content, created_at, seq, is_summary, rolling_summary, token_count, content_score in data['messages']:
+            record = ChatMessage(role, content, created_at, seq, bool(is_summary), bool(rolling_summary))
+            record.token_count = token_count  # Kept, so rebuilding the history counts nothing
+            record.content_score = content_score
+            records.append(record)
+
+        history = self.context_manager.new_history(records)
+        history.next_seq = max(history.next_seq, data['next_seq'])
+        session = history.session
+        session.rolling_summary = data['rolling_summary']
+        session.store_version = data['store_version']
+        session.recall_index.add_passages(data['recall'])
+        return history
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def discard(self, session_id: str):
+        """Forget a session's staged history and blobs"""
+        with self._lock:
+            self._pending.pop(session_id, None)
+        for codec in CODEC_EXTENSIONS:
+            self._remove(self._path(session_id, codec))
+
+    def expire(self, force: bool = False) -> int:
+        """Delete blobs (and stray temp files) idle longer than max_age_seconds; returns how many"""
+        now = time.time()
+        if not force and now - self._last_expired < EXPIRE_INTERVAL_SECONDS:
+            return 0
+        self._last_expired = now
+        if not os.path.isdir(self.directory):
+            return 0
+
+        removed = 0
+        blobs = 0
+        size = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if self.max_age_seconds and now - stat.st_mtime > self.max_age_seconds:
+                        os.remove(path)
+                        removed += 1
+                    elif not name.endswith('.tmp'):
+                        blobs += 1
+                        size += stat.st_size
+                except FileNotFoundError:
+                    continue
+
+        with self._lock:
+            self.stats['expired'] += removed
+            self._disk = {'blobs': blobs, 'bytes': size, 'scanned_at': datetime.now().isoformat()}
+        if removed:
+            logger.info(f"Expired {removed} hibernated sessions")
+        return removed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'pending': len(self._pending),
+                'compression_ratio': (round(self.stats['raw_bytes'] / self.stats['compressed_bytes'], 2)
+                                      if self.stats['compressed_bytes'] else None),
+                'latency_ms': {
+                    operation: {
+                        'count': count,
+                        'avg': round(total / count, 2) if count else None,
+                        'max': round(longest, 2)
+                    } for operation, (count, total, longest) in self._timings.items()
+                },
+                'disk': self._disk,
+                'codec': self.codec,
+                'level': self.level,
+                'directory': self.directory,
+                'max_age_seconds': self.max_age_seconds
+            }
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('queue', 'reject', 'cancel')
+
+class SessionBusy(Exception):
+    """A session already has a request in flight and the policy does not wait for it (or waiting timed out)"""
+
+class SessionTurn:
+    """A request's exclusive hold on its session; `cancelled` is set when a newer request supersedes it"""
+
+    __slots__ = ('session_id', 'ticket', 'acquired_at', 'cancelled', 'released')
+
+    def __init__(self, session_id: str, ticket: int):
+        self.session_id = session_id
+        self.ticket = ticket
+        self.acquired_at = time.monotonic()
+        self.cancelled = threading.Event()
+        self.released = False
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set()
+
+class _SessionSlot:
+    """Ticket queue of one session: tickets are served in order, one owner at a time"""
+
+    __slots__ = ('next_ticket', 'serving', 'owner', 'abandoned', 'superseded_below')
+
+    def __init__(self):
+        self.next_ticket = 0
+        self.serving = 0
+        self.owner = None
+        self.abandoned = set()  # Tickets whose requests gave up waiting
+        self.superseded_below = 0  # Waiting tickets below this were superseded by a 'cancel' request
+
+class SessionLocks:
+    """
+    Per-session request ordering. Session ids hash onto a fixed set of stripes,
+    each a condition guarding the ticket queues of its sessions; stripe locks
+    are only held for bookkeeping, so requests for different sessions run in
+    parallel even when they share a stripe. A request holds its session's turn
+    for as long as it runs (a whole response stream). When a session is busy,
+    the policy decides: 'queue' waits in arrival order (up to
+    wait_timeout_seconds), 'reject' fails at once, and 'cancel' flags the
+    running request to stop and takes the next turn. In-process only: workers
+    of the durable session store reconcile through its versions instead.
+    """
+
+    def __init__(self, stripes: int = 64, policy: str = 'queue', wait_timeout_seconds: Optional[float] = 120):
+        policy = (policy or 'queue').lower()
+        if policy not in POLICIES:
+            logger.warning(f"Unknown session busy policy '{policy}', using queue")
+            policy = 'queue'
+        self.policy = policy
+        self.wait_timeout_seconds = wait_timeout_seconds
+
+        self._stripes = [threading.Condition() for _ in range(max(1, stripes))]
+        self._slots = [{} for _ in self._stripes]  # Per stripe: session_id -> _SessionSlot
+
+        self._stats_lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waited': 0, 'rejected': 0, 'cancelled': 0, 'superseded': 0, 'timed_out': 0}
+        self._max_wait_ms = 0.0
+
+    def _bump(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _stripe(self, session_id: str):
+        index = hash(session_id) % len(self._stripes)
+        return self._stripes[index], self._slots[index]
+
+    @staticmethod
+    def _advance(slot: _SessionSlot):
+        """Move past tickets whose requests gave up"""
+        while slot.serving in slot.abandoned:
+            slot.abandoned.discard(slot.serving)
+            slot.serving += 1
+
+    def _abandon(self, condition, slots: Dict, session_id: str, slot: _SessionSlot, ticket: int):
+        if ticket == slot.serving and slot.owner is None:
+            slot.serving += 1
+            self._advance(slot)
+        else:
+            slot.abandoned.add(ticket)
+        if slot.owner is None and slot.serving == slot.next_ticket:
+            del slots[session_id]
+        condition.notify_all()
+
+    def acquire(self, session_id: str, policy: Optional[str] = None, timeout: Optional[float] = None) -> SessionTurn:
+        """Wait for the session's turn (per policy); release() the returned turn when done"""
+        policy = policy or self.policy
+        timeout = self.wait_timeout_seconds if timeout is None else timeout
+        condition, slots = self._stripe(session_id)
+        start = time.monotonic()
+
+        with condition:
+            slot = slots.get(session_id)
+            if slot is None:
+                slot = slots[session_id] = _SessionSlot()
+            busy = slot.owner is not None or slot.serving != slot.next_ticket
+            if busy and policy == 'reject':
+                self._bump('rejected')
+                raise SessionBusy(f"Session {session_id} already has a request in progress")
+
+            ticket = slot.next_ticket
+            slot.next_ticket += 1
+            if busy and policy == 'cancel':
+                # The newest request wins: stop the running one and drop any queued before us
+                slot.superseded_below = ticket
+                if slot.owner is not None and not slot.owner.is_cancelled:
+                    slot.owner.cancelled.set()
+                    self._bump('cancelled')
+                condition.notify_all()
+
+            while slot.owner is not None or slot.serving != ticket:
+                if ticket < slot.superseded_below:
+                    self._abandon(condition, slots, session_id, slot, ticket)
+                    self._bump('superseded')
+                    raise SessionBusy(f"Request for session {session_id} was superseded by a newer one")
+                remaining = start + timeout - time.monotonic() if timeout else None
+                if remaining is not None and remaining <= 0:
+                    self._abandon(condition, slots, session_id, slot, ticket)
+                    self._bump('timed_out')
+                    raise SessionBusy(f"Timed out after {timeout:g}s waiting for session {session_id}")
+                condition.wait(remaining)
+
+            turn = slot.owner = SessionTurn(session_id, ticket)
+
+        waited_ms = (time.monotonic() - start) * 1000
+        with self._stats_lock:
+            self.stats['acquired'] += 1
+            if busy:
+                self.stats['waited'] += 1
+                self._max_wait_ms = max(self._max_wait_ms, waited_ms)
+        if busy:
+            logger.info(f"Session {session_id} request waited {waited_ms:.0f}ms for its turn ({policy})")
+        return turn
+
+    def release(self, turn: SessionTurn):
+        """Hand the session to the next queued request (safe to call more than once)"""
+        condition, slots = self._stripe(turn.session_id)
+        with condition:
+            if turn.released:
+                return
+            turn.released = True
+            slot = slots.get(turn.session_id)
+            if slot is None or slot.owner is not turn:
+                return
+            slot.owner = None
+            slot.serving += 1
+            self._advance(slot)
+            if slot.serving == slot.next_ticket:
+                del slots[turn.session_id]
+            condition.notify_all()
+
+    def get_stats(self) -> Dict:
+        in_flight = 0
+        waiting = 0
+        for condition, slots in zip(self._stripes, self._slots):
+            with condition:
+                for slot in slots.values():
+                    owned = slot.owner is not None
+                    in_flight += owned
+                    waiting += slot.next_ticket - slot.serving - len(slot.abandoned) - owned
+        with self._stats_lock:
+            return {
+                **self.stats,
+                'in_flight': in_flight,
+                'waiting': waiting,
+                'max_wait_ms': round(self._max_wait_ms, 1),
+                'policy': self.policy,
+                'stripes': len(self._stripes),
+                'wait_timeout_seconds': self.wait_timeout_seconds
+            }
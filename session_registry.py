@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough in-memory cost of a message beyond its text: the ChatMessage record, its cached values and list slot
+MESSAGE_OVERHEAD_BYTES = 250
+BYTES_PER_TOKEN = 4
+
+def estimate_history_bytes(history) -> int:
+    """Approximate memory held by a session history, its text and its recall index (O(1))"""
+    size = len(history) * MESSAGE_OVERHEAD_BYTES + getattr(history, 'token_total', 0) * BYTES_PER_TOKEN
+    session = getattr(history, 'session', None)
+    if session is not None:
+        size += session.recall_index.approx_bytes
+    return size
+
+class SessionRegistry:
+    """
+    Bounded, dict-like store of chat session histories.
+    Sessions are kept in least recently used order; every access refreshes one,
+    and sessions idle longer than idle_ttl_seconds or beyond max_sessions /
+    max_bytes are evicted, oldest first. Sizes are estimates refreshed when a
+    session is accessed, so the byte budget is approximate.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = 1000, max_bytes: Optional[int] = None,
+                 idle_ttl_seconds: Optional[float] = 86400,
+                 size_fn: Callable[[object], int] = estimate_history_bytes):
+        # Limits; None disables a limit
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.size_fn = size_fn
+
+        self._sessions = OrderedDict()  # session_id -> [history, last_access (monotonic), size]
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._eviction_listeners = []  # Called with (session_id, history, reason) for each evicted session
+
+        self.stats = {
+            'created': 0,
+            'evicted_idle': 0,
+            'evicted_count': 0,
+            'evicted_bytes': 0,
+            'hits': 0,
+            'misses': 0
+        }
+
+    def add_eviction_listener(self, func):
+        """
+        Register a callback for sessions evicted by the idle, count or byte limits (not for
+        explicit removal). It runs under the registry lock, so it must only hand the history off.
+        """
+        self._eviction_listeners.append(func)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            self._evict_idle()
+            return session_id in self._sessions
+
+    def __getitem__(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                raise KeyError(session_id)
+            self.stats['hits'] += 1
+            self._touch(session_id, entry)
+            return entry[0]
+
+    def get(self, session_id: str, default=None):
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, session_id: str, history):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = [history, 0.0, 0]
+                self._sessions[session_id] = entry
+                self.stats['created'] += 1
+            entry[0] = history
+            self._touch(session_id, entry)
+            self._evict()
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id)
+            self._total_bytes -= entry[2]
+
+    def discard(self, session_id: str):
+        """Drop a session if present (e.g. a cached copy known to be stale)"""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._sessions))
+
+    def _touch(self, session_id: str, entry: list):
+        """Mark a session most recently used and refresh its size estimate"""
+        entry[1] = time.monotonic()
+        size = self.size_fn(entry[0])
+        self._total_bytes += size - entry[2]
+        entry[2] = size
+        self._sessions.move_to_end(session_id)
+
+    def _evict_idle(self):
+        if not self.idle_ttl_seconds:
+            return
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        # Least recently used first, so stop at the first session still in use
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry[1] > cutoff:
+                break
+            self._remove_oldest('idle')
+            self.stats['evicted_idle'] += 1
+            logger.info(f"Evicted idle session {session_id}")
+
+    def _evict(self):
+        """Apply the idle TTL, then the count and byte limits (the newest session is always kept)"""
+        self._evict_idle()
+        while self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+            self._remove_oldest('count')
+            self.stats['evicted_count'] += 1
+        while (self.max_bytes is not None and self._total_bytes > self.max_bytes
+               and len(self._sessions) > 1):
+            session_id, _ = self._remove_oldest('bytes')
+            self.stats['evicted_bytes'] += 1
+            logger.info(f"Evicted session {session_id} to stay within {self.max_bytes} bytes")
+
+    def _remove_oldest(self, reason: str):
+        session_id, entry = self._sessions.popitem(last=False)
+        self._total_bytes -= entry[2]
+        for listener in self._eviction_listeners:
+            try:
+                listener(session_id, entry[0], reason)
+            except Exception as e:
+                logger.error(f"Session eviction listener failed for {session_id}: {e}")
+        return session_id, entry
+
+    def sweep(self) -> int:
+        """Evict idle and over-limit sessions without waiting for the next write"""
+        with self._lock:
+            before = len(self._sessions)
+            self._evict()
+            return before - len(self._sessions)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            oldest = next(iter(self._sessions.values()), None)
+            return {
+                **self.stats,
+                'sessions': len(self._sessions),
+                'estimated_bytes': self._total_bytes,
+                'messages': sum(len(entry[0]) for entry in self._sessions.values()),
+                'oldest_idle_seconds': round(now - oldest[1], 1) if oldest else None,
+                'limits': {
+                    'max_sessions': self.max_sessions,
+                    'max_bytes': self.max_bytes,
+                    'idle_ttl_seconds': self.idle_ttl_seconds
+                },
+                'checked_at': datetime.now().isoformat()
+            }
@@ -0,0 +1,348 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from chat_message import ChatMessage, parse_epoch
+from context_manager import ROLLING_SUMMARY_PREFIX
+from session_registry import SessionRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sessions.db')
+
+FLAG_KEYS = ('is_summary', 'rolling_summary')  # Persisted markers; token_count etc. are recomputed
+
+class SessionStore:
+    """
+    In-process session store: histories live only in the bounded registry, so
+    they are lost on restart and across workers, and on eviction unless a
+    hibernator keeps evicted sessions on disk. Base class for durable stores,
+    which use the registry as their read-through cache.
+    """
+
+    def __init__(self, context_manager, cache: SessionRegistry, hibernator=None,
+                 sweep_interval_seconds: Optional[float] = 60):
+        self.context_manager = context_manager  # Builds histories (token counting, seq numbering)
+        self.cache = cache
+        self.hibernator = hibernator  # Cold tier for evicted sessions (SessionHibernator), if any
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._thread = None
+        self._pid = None
+        self._thread_lock = threading.Lock()
+        if hibernator is not None:
+            cache.add_eviction_listener(hibernator.stage)
+
+    def ensure_started(self):
+        """Start the background sweep (idle eviction, hibernation) lazily, and again after a fork"""
+        if not self.sweep_interval_seconds or self.sweep_interval_seconds <= 0:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+
+        with self._thread_lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run_loop, name='session-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run_loop(self):
+        while True:
+            time.sleep(self.sweep_interval_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    def sweep(self) -> int:
+        """Evict idle and over-limit sessions now, hibernating them if configured"""
+        evicted = self.cache.sweep()
+        if self.hibernator is not None:
+            self.hibernator.flush()
+            self.hibernator.expire()
+        return evicted
+
+    def _rehydrate(self, session_id: str):
+        """A hibernated session's history, if any (not cached yet)"""
+        return self.hibernator.rehydrate(session_id) if self.hibernator is not None else None
+
+    def _flush_hibernated(self):
+        """Write out sessions evicted while caching (they are only staged under the registry lock)"""
+        if self.hibernator is not None:
+            self.hibernator.flush()
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def get(self, session_id: str):
+        history = self.cache.get(session_id)
+        if history is None:
+            history = self._rehydrate(session_id)
+            if history is not None:
+                self.cache[session_id] = history
+                self._flush_hibernated()
+        return history
+
+    def get_or_create(self, session_id: str) -> Tuple[object, bool]:
+        """The session's history, and whether it was just created"""
+        history = self.get(session_id)
+        if history is not None:
+            return history, False
+        history = self.context_manager.new_history()
+        self.cache[session_id] = history
+        self._flush_hibernated()
+        return history, True
+
+    def append(self, session_id: str, message: Dict):
+        """Add a message to a session; returns the (possibly refreshed) history"""
+        history, _ = self.get_or_create(session_id)
+        history.append(message)
+        return history
+
+    def replace(self, session_id: str, old_history, new_history):
+        """Swap in a history rewritten by context management"""
+        self.cache[session_id] = new_history
+        self._flush_hibernated()
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': 'memory',
+            'cache': self.cache.get_stats(),
+            'hibernation': self.hibernator.get_stats() if self.hibernator is not None else None
+        }
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Durable session store shared by all workers: an append-only SQLite (WAL) log
+    of messages in front of which the registry acts as a read-through cache.
+    Appending writes one row; context management rewrites only mark evicted
+    rows inactive and add their summaries. Each session has a version bumped on
+    every write, so a worker whose cached copy is behind reloads it first, and
+    a rewrite of a copy that is no longer current is dropped.
+    """
+
+    def __init__(self, context_manager, cache: SessionRegistry, db_path: str = DEFAULT_DB_PATH,
+                 hibernator=None, sweep_interval_seconds: Optional[float] = 60):
+        super().__init__(context_manager, cache, hibernator, sweep_interval_seconds)
+        self.db_path = db_path
+
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._stats_lock = threading.Lock()
+        self._stats = {'loads': 0, 'reloads': 0, 'appends': 0, 'rewrites': 0, 'stale_rewrites': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (SQLite connections are not shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # Autocommit mode; writes open their own BEGIN IMMEDIATE transactions
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS session_messages (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT,
+                timestamp TEXT,
+                flags TEXT,
+                active INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS idx_session_messages_active ON session_messages (session_id, active, seq);
+        ''')
+
+    def _bump(self, stat: str):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    @staticmethod
+    def _flags(message: Dict) -> Optional[str]:
+        flags = {key: True for key in FLAG_KEYS if message.get(key)}
+        return json.dumps(flags) if flags else None
+
+    def _version(self, conn: sqlite3.Connection, session_id: str) -> Optional[int]:
+        row = conn.execute('SELECT version FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return row['version'] if row else None
+
+    def _load(self, conn: sqlite3.Connection, session_id: str, version: int):
+        """Rebuild a history from the log: active rows in order, evicted ones into its recall index"""
+        active = []
+        evicted = []
+        for row in conn.execute('SELECT seq, role, content, timestamp, flags, active FROM session_messages '
+                                'WHERE session_id = ? ORDER BY active DESC, seq, id', (session_id,)):
+            flags = json.loads(row['flags']) if row['flags'] else {}
+            message = ChatMessage(row['role'], row['content'], parse_epoch(row['timestamp']) if row['timestamp'] else None,
+                                  row['seq'], flags.get('is_summary', False), flags.get('rolling_summary', False))
+            (active if row['active'] else evicted).append(message)
+
+        history = self.context_manager.new_history(active)
+        session = history.session
+        session.store_version = version
+        session.recall_index.add_messages(evicted)
+        if active and active[0].rolling_summary:
+            content = active[0].content
+            self.context_manager.set_rolling_summary(
+                session, content[len(ROLLING_SUMMARY_PREFIX):] if content.startswith(ROLLING_SUMMARY_PREFIX) else content,
+                active[0].seq)
+        if evicted:
+            history.next_seq = max(history.next_seq, max(message.seq for message in evicted) + 1)
+        return history
+
+    def _current(self, conn: sqlite3.Connection, session_id: str):
+        """The cached history if it is up to date with the log, else a fresh load (None if unknown)"""
+        version = self._version(conn, session_id)
+        if version is None:
+            return None
+        history = self.cache.get(session_id)
+        if history is None:
+            # A hibernated copy saves re-counting and re-indexing, if no worker has written since
+            history = self._rehydrate(session_id)
+            if history is not None and history.session.store_version == version:
+                self.cache[session_id] = history
+                return history
+        elif getattr(history.session, 'store_version', None) == version:
+            return history
+        self._bump('reloads' if history is not None else 'loads')
+        history = self._load(conn, session_id, version)
+        self.cache[session_id] = history
+        return history
+
+    def get(self, session_id: str):
+        history = self._current(self._connect(), session_id)
+        self._flush_hibernated()
+        return history
+
+    def get_or_create(self, session_id: str):
+        conn = self._connect()
+        history = self._current(conn, session_id)
+        if history is None:
+            now = datetime.now().isoformat()
+            conn.execute('INSERT OR IGNORE INTO sessions (session_id, version, created_at, updated_at) '
+                         'VALUES (?, 0, ?, ?)', (session_id, now, now))
+            history = self._current(conn, session_id)
+            created = True
+        else:
+            created = False
+        self._flush_hibernated()
+        return history, created
+
+    def append(self, session_id: str, message: Dict):
+        """Append one message row (O(1)); catches up first if another worker wrote since our last read"""
+        conn = self._connect()
+        now = datetime.now().isoformat()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT OR IGNORE INTO sessions (session_id, version, created_at, updated_at) VALUES (?, 0, ?, ?)',
+                         (session_id, now, now))
+            history = self._current(conn, session_id)
+            history.append(message)  # Numbers the message (stored as a ChatMessage record)
+            message = history[-1]
+            conn.execute('INSERT INTO session_messages (session_id, seq, role, content, timestamp, flags) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         (session_id, message['seq'], message.get('role'), message.get('content'),
+                          message.get('timestamp'), self._flags(message)))
+            conn.execute('UPDATE sessions SET version = version + 1, updated_at = ? WHERE session_id = ?',
+                         (now, session_id))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            self.cache.discard(session_id)  # The in-memory copy may be ahead of the log
+            raise
+        history.session.store_version += 1
+        self._bump('appends')
+        self._flush_hibernated()  # After the commit, so blobs are not written inside the transaction
+        return history
+
+    def replace(self, session_id: str, old_history, new_history):
+        """
+        Record a context management rewrite: rows of messages that left the history are
+        marked inactive (they stay recallable) and the summaries that replaced them appended
+        """
+        kept = {id(message) for message in new_history}
+        previous = {id(message) for message in old_history}
+        removed = [message['seq'] for message in old_history if id(message) not in kept]
+        added = [message for message in new_history if id(message) not in previous]
+
+        conn = self._connect()
+        now = datetime.now().isoformat()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = self._version(conn, session_id)
+            if version is None or version != getattr(old_history.session, 'store_version', None):
+                # Another worker wrote since old_history was read: the rewrite is stale, so drop it
+                conn.execute('ROLLBACK')
+                self.cache.discard(session_id)  # Reload on next access
+                self._bump('stale_rewrites')
+                logger.info(f"Dropped stale rewrite of session {session_id} (version {version})")
+                return
+            # Active seqs are unique: a summary takes the seq of the last message it covers
+            conn.executemany('UPDATE session_messages SET active = 0 WHERE session_id = ? AND seq = ? AND active = 1',
+                             [(session_id, seq) for seq in removed])
+            conn.executemany('INSERT INTO session_messages (session_id, seq, role, content, timestamp, flags) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             [(session_id, message['seq'], message.get('role'), message.get('content'),
+                               message.get('timestamp'), self._flags(message)) for message in added])
+            conn.execute('UPDATE sessions SET version = version + 1, updated_at = ? WHERE session_id = ?',
+                         (now, session_id))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._bump('rewrites')
+        new_history.session.store_version = version + 1
+        self.cache[session_id] = new_history
+        self._flush_hibernated()
+
+    def get_stats(self) -> Dict:
+        row = self._connect().execute(
+            'SELECT (SELECT COUNT(*) FROM sessions) AS sessions, COUNT(*) AS messages, '
+            'COALESCE(SUM(active), 0) AS active_messages FROM session_messages'
+        ).fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            'backend': 'sqlite',
+            'db_path': self.db_path,
+            'stored': {key: row[key] for key in row.keys()},
+            **stats,
+            'cache': self.cache.get_stats(),
+            'hibernation': self.hibernator.get_stats() if self.hibernator is not None else None
+        }
+
+def create_session_store(context_manager, cache: SessionRegistry, backend: Optional[str] = None,
+                         db_path: Optional[str] = None, hibernator=None,
+                         sweep_interval_seconds: Optional[float] = 60) -> SessionStore:
+    """Build the configured session store (SESSION_STORE: sqlite or memory)"""
+    if (backend or 'sqlite').lower() == 'memory':
+        return SessionStore(context_manager, cache, hibernator, sweep_interval_seconds)
+    return SQLiteSessionStore(context_manager, cache, db_path or DEFAULT_DB_PATH, hibernator, sweep_interval_seconds)
@@ -483,7 +483,10 @@ class ClaudeChatClient {
             })
             .then(response => {
                 if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
+                    // e.g. 409 when this session is busy in another tab
+                    return response.json().catch(() => ({})).then(body => {
+                        throw new Error(body.error || `HTTP error! status: ${response.status}`);
+                    });
                 }
                 
                 const reader = response.body.getReader();
@@ -573,6 +576,10 @@ class ClaudeChatClient {
                                         this.handleArtifactProcessingError(data.content);
                                     }
                                     
+                                    if (data.type === 'artifact_ready') {
+                                        this.handleArtifactReady(data.content);
+                                    }
+                                    
                                     if (data.type === 'complete') {
                                         this.cleanupTimeouts();
                                         this.setInputEnabled(true);
@@ -725,19 +732,165 @@ class ClaudeChatClient {
             let existingIndex = this.artifacts.findIndex(a => a.id === update.id);
             
             if (existingIndex >= 0) {
-                // Update existing artifact
-                this.artifacts[existingIndex] = { ...this.artifacts[existingIndex], ...update };
+                // Update existing artifact (a server-rendered form belongs to the old content)
+                const previous = this.artifacts[existingIndex];
+                this.artifacts[existingIndex] = { ...previous, ...update };
+                if (update.content !== undefined && update.content !== previous.content) {
+                    delete this.artifacts[existingIndex].renderedHtml;
+                }
             } else {
                 // Add new artifact
                 this.artifacts.push(update);
             }
         }
         
+        // Apply post-processing results that arrived before this update
+        this.artifactJobs = this.artifactJobs || {};
+        for (const artifact of this.artifacts) {
+            const job = artifact.job_id ? this.artifactJobs[artifact.job_id] : null;
+            if (job && job.status) {
+                artifact.processing = false;
+            }
+        }
+        
         // Re-render artifacts to show updates
         this.renderArtifacts();
         
         // Auto-scroll HTML and HAML source code views to bottom when building
         this.scrollArtifactSourceToBottom();
+        
+        // Watch background post-processing for newly finalized artifacts
+        for (const update of artifactUpdates) {
+            if (update.job_id && update.processing) {
+                this.pollArtifactJob(update.job_id);
+            }
+        }
+    }
+    
+    pollArtifactJob(jobId, attempt = 0) {
+        // Poll the post-processing status of an artifact until it is ready
+        this.artifactJobs = this.artifactJobs || {};
+        if (attempt === 0) {
+            if (this.artifactJobs[jobId]) {
+                return;  // Already watching or finished
+            }
+            this.artifactJobs[jobId] = {};
+        }
+        if (this.artifactJobs[jobId].status) {
+            return;  // Ready event arrived on the stream
+        }
+        
+        const artifact = this.artifacts.find(a => a.job_id === jobId);
+        const permalink = artifact ? artifact.permalink : null;
+        const filename = permalink ? permalink.split('/').pop() : '';
+        
+        fetch(`/artifacts/jobs/${jobId}?filename=${encodeURIComponent(filename)}`)
+            .then(response => {
+                if (response.status === 404 && permalink) {
+                    // Job unknown to this worker: stop waiting once the artifact itself is served
+                    return fetch(permalink, { method: 'HEAD' })
+                        .then(head => head.ok ? { job_id: jobId, status: 'unknown', result: {} } : null);
+                }
+                return response.ok ? response.json() : null;
+            })
+            .then(job => {
+                if (job && (job.status === 'ready' || job.status === 'failed' || job.status === 'unknown')) {
+                    this.handleArtifactReady(job);
+                } else if (attempt < 30) {
+                    setTimeout(() => this.pollArtifactJob(jobId, attempt + 1), Math.min(2000, 250 * (attempt + 1)));
+                } else {
+                    // Give up waiting and show whatever the permalink serves
+                    this.handleArtifactReady({ job_id: jobId, status: 'unknown', result: {} });
+                }
+            })
+            .catch(error => console.warn('Failed to poll artifact job:', error));
+    }
+    
+    handleArtifactReady(job) {
+        // Post-processing finished - render the processed version of the artifact
+        this.artifactJobs = this.artifactJobs || {};
+        this.artifactJobs[job.job_id] = job;
+        
+        const artifact = this.artifacts.find(a => a.job_id === job.job_id);
+        if (!artifact || !artifact.processing) {
+            return;
+        }
+        
+        artifact.processing = false;
+        if (job.status === 'failed') {
+            artifact.save_error = job.error;
+            if (artifact.type === 'haml') {
+                artifact.permalink = null;  // Unprocessed HAML cannot be rendered
+            }
+        }
+        
+        // Revisions of an artifact we already loaded only need the delta
+        const revision = job.result && job.result.revision;
+        if (job.status === 'ready' && revision && revision.base_permalink && (artifact.type === 'html' || artifact.type === 'haml')) {
+            this.loadArtifactRevision(artifact, revision)
+                .catch(error => console.warn('Falling back to full artifact download:', error))
+                .finally(() => this.renderArtifacts());
+            return;
+        }
+        
+        // Markdown pre-rendered on the server skips marked.js + highlight.js in the browser
+        if (job.status === 'ready' && job.result && job.result.rendered && artifact.type === 'markdown' && artifact.permalink) {
+            this.loadRenderedArtifact(artifact)
+                .catch(error => console.warn('Falling back to client-side markdown rendering:', error))
+                .finally(() => this.renderArtifacts());
+            return;
+        }
+        this.renderArtifacts();
+    }
+    
+    async loadRenderedArtifact(artifact) {
+        // Fetch the sanitized HTML the server rendered at finalize (immutable, so browser-cached)
+        const content = artifact.content;
+        const response = await fetch(`${artifact.permalink}?render=html`);
+        if (!response.ok) {
+            throw new Error(`rendered artifact request failed (${response.status})`);
+        }
+        const html = await response.text();
+        if (artifact.content === content) {
+            artifact.renderedHtml = html;
+        }
+    }
+    
+    async loadArtifactRevision(artifact, revision) {
+        // Rebuild a revision locally from its base and a delta instead of downloading it again
+        this.artifactBodies = this.artifactBodies || {};
+        let base = this.artifactBodies[revision.base_permalink];
+        if (base === undefined) {
+            // Only worth it when the base is already in the browser cache
+            const baseResponse = await fetch(revision.base_permalink, { cache: 'only-if-cached', mode: 'same-origin' });
+            if (!baseResponse.ok) {
+                throw new Error(`base revision not cached (${baseResponse.status})`);
+            }
+            base = await baseResponse.text();
+        }
+        
+        const response = await fetch(`${artifact.permalink}/delta?base=${encodeURIComponent(revision.base_permalink.split('/').pop())}`);
+        if (!response.ok) {
+            throw new Error(`delta request failed (${response.status})`);
+        }
+        const delta = await response.json();
+        const body = this.applyArtifactDelta(base, delta.ops);
+        if (new TextEncoder().encode(body).length !== delta.size_bytes) {
+            throw new Error('rebuilt revision does not match');
+        }
+        
+        this.artifactBodies[artifact.permalink] = body;
+        artifact.renderUrl = URL.createObjectURL(new Blob([body], { type: 'text/html' }));
+    }
+    
+    applyArtifactDelta(base, ops) {
+        // Ops copy base lines [start, end) or insert text (same line split as the server)
+        const parts = base.split('\n');
+        const lines = parts.slice(0, -1).map(line => line + '\n');
+        if (parts[parts.length - 1]) {
+            lines.push(parts[parts.length - 1]);
+        }
+        return ops.map(op => typeof op === 'string' ? op : lines.slice(op[0], op[1]).join('')).join('');
     }
     
     removeArtifacts(artifactsToRemove) {
@@ -864,12 +1017,12 @@ class ClaudeChatClient {
     renderArtifactContent(artifact) {
         switch (artifact.type) {
             case 'html':
-                // Show source code while building, iframe when complete
-                if (artifact.complete === false) {
+                // Show source code while building or finalizing, iframe when complete
+                if (artifact.complete === false || artifact.processing) {
                     return `
                         <div class="artifact-source-view">
                             <div class="source-header">
-                                <span class="source-label">HTML Source (Building...)</span>
+                                <span class="source-label">HTML Source (${artifact.complete === false ? 'Building' : 'Finalizing'}...)</span>
                                 <div class="source-progress">
                                     <div class="progress-spinner"></div>
                                 </div>
@@ -886,7 +1039,7 @@ class ClaudeChatClient {
                                 <iframe 
                                     id="${iframeId}"
                                     class="artifact-html" 
-                                    src="${artifact.permalink}" 
+                                    src="${artifact.renderUrl || artifact.permalink}" 
                                     title="${this.escapeHtml(artifact.title || 'HTML Artifact')}"
                                     onload="window.claudeChat.handleIframeLoad('${iframeId}')"
                                     onerror="window.claudeChat.handleIframeError('${iframeId}', '${artifact.permalink}')"
@@ -935,12 +1088,12 @@ class ClaudeChatClient {
                 }
                 
             case 'haml':
-                // Show HAML source code while building, iframe when complete
-                if (artifact.complete === false) {
+                // Show HAML source code while building or converting, iframe when complete
+                if (artifact.complete === false || artifact.processing) {
                     return `
                         <div class="artifact-source-view">
                             <div class="source-header">
-                                <span class="source-label">HAML Source (Building...)</span>
+                                <span class="source-label">HAML Source (${artifact.complete === false ? 'Building' : 'Converting'}...)</span>
                                 <div class="source-progress">
                                     <div class="progress-spinner"></div>
                                 </div>
@@ -957,7 +1110,7 @@ class ClaudeChatClient {
                                 <iframe 
                                     id="${iframeId}"
                                     class="artifact-html" 
-                                    src="${artifact.permalink}" 
+                                    src="${artifact.renderUrl || artifact.permalink}" 
                                     title="${this.escapeHtml(artifact.title || 'HAML Artifact (HTML rendered)')}"
                                     onload="window.claudeChat.handleIframeLoad('${iframeId}')"
                                     onerror="window.claudeChat.handleIframeError('${iframeId}', '${artifact.permalink}')"
@@ -1006,7 +1159,7 @@ class ClaudeChatClient {
                 }
                 
             case 'markdown':
-                return `<div class="artifact-markdown-rendered">${this.renderFullMarkdown(artifact.content)}</div>`;
+                return `<div class="artifact-markdown-rendered">${artifact.renderedHtml || this.renderFullMarkdown(artifact.content)}</div>`;
                 
             case 'code':
                 const language = artifact.language || 'text';
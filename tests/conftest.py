@@ -0,0 +1,43 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The app modules live at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The Flask app module, imported once; runtime directories it creates are removed afterwards"""
+    runtime_dirs = [os.path.join(ROOT, name) for name in ('artifacts', 'logs', 'data')]
+    created = [path for path in runtime_dirs if not os.path.exists(path)]
+    os.environ.setdefault('CLAUDE_API_KEY', 'test-key')
+    os.environ.setdefault('SESSION_DB_PATH', str(tmp_path_factory.mktemp('sessions') / 'sessions.db'))
+    import app
+    yield app
+    app.log_writer.flush(5.0)
+    for path in created:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def artifact_app(app_module, tmp_path, monkeypatch):
+    """The app serving artifacts from a temporary directory, catalogue and content store"""
+    from artifact_catalogue import ArtifactCatalogue
+    from artifact_layout import ArtifactLayout
+    from artifact_revisions import ArtifactRevisions
+    from artifact_storage import LocalArtifactStorage
+
+    artifacts_dir = str(tmp_path / 'artifacts')
+    os.makedirs(artifacts_dir)
+    catalogue = ArtifactCatalogue(str(tmp_path / 'catalogue.db'))
+    storage = LocalArtifactStorage(os.path.join(artifacts_dir, 'objects'))
+    monkeypatch.setattr(app_module, 'ARTIFACTS_DIR', artifacts_dir)
+    monkeypatch.setattr(app_module, 'artifact_layout', ArtifactLayout(artifacts_dir))
+    monkeypatch.setattr(app_module, 'artifact_catalogue', catalogue)
+    monkeypatch.setattr(app_module, 'artifact_storage', storage)
+    monkeypatch.setattr(app_module, 'artifact_revisions', ArtifactRevisions(catalogue, storage))
+    return app_module
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from artifact_catalogue import ArtifactCatalogue
+from artifact_gc import ArtifactSweeper
+from artifact_layout import ArtifactLayout
+from artifact_revisions import ArtifactRevisions
+from artifact_storage import LocalArtifactStorage
+
+OLD = time.time() - 2 * 86400
+
+
+@pytest.fixture
+def sweeper(tmp_path):
+    root = str(tmp_path / 'artifacts')
+    os.makedirs(root)
+    catalogue = ArtifactCatalogue(str(tmp_path / 'catalogue.db'))
+    storage = LocalArtifactStorage(os.path.join(root, 'objects'))
+    return ArtifactSweeper(catalogue, storage, ArtifactRevisions(catalogue, storage), ArtifactLayout(root),
+                           str(tmp_path / 'logs'), orphan_grace_seconds=3600, interval_seconds=0)
+
+
+def write(path, body=b'artifact body', mtime=OLD):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def files(sweeper):
+    layout = sweeper.layout
+    sweeper.catalogue.record({'filename': '20261001_catalogued.md', 'size_bytes': 13})
+    return {
+        'catalogued': write(layout.path_for('20261001_catalogued.md')),
+        'legacy': write(layout.path_for('20261001_legacy.md')),
+        'sidecar': write(layout.sidecar_path_for('20261001_legacy.md'), b'{}'),
+        'flat_legacy': write(layout.flat_path('20260101_flat.md')),
+        'flat_sidecar': write(os.path.join(layout.root, '20260101_flat.meta.json'), b'{}'),
+        'recent': write(layout.path_for('20261018_streaming.md'), mtime=time.time()),
+        'orphan': write(layout.path_for('20261001_orphan.md')),
+        'flat_orphan': write(layout.flat_path('20260101_orphan.md')),
+        'partial': write(layout.path_for('20261001_partial.md') + '.processing'),
+        'store_temp': write(os.path.join(sweeper.storage.root, 'ab', 'cd', 'abcd.123.456.tmp')),
+    }
+
+
+KEPT = ('catalogued', 'legacy', 'sidecar', 'flat_legacy', 'flat_sidecar', 'recent')
+REMOVED = ('orphan', 'flat_orphan', 'partial', 'store_temp')
+
+
+def test_orphan_sweep_keeps_catalogued_and_sidecar_files(sweeper, files):
+    report = sweeper.sweep()
+
+    for name in KEPT:
+        assert os.path.exists(files[name]), f"{name} was removed"
+    for name in REMOVED:
+        assert not os.path.exists(files[name]), f"{name} was kept"
+    assert report['orphans']['files'] == len(REMOVED)
+    assert report['artifacts_removed'] == 0
+
+
+def test_dry_run_removes_nothing(sweeper, files):
+    report = sweeper.sweep(dry_run=True)
+
+    assert all(os.path.exists(path) for path in files.values())
+    assert report['orphans']['files'] == len(REMOVED)
+    assert sorted(report['orphans']['items']) == sorted(os.path.basename(files[name]) for name in REMOVED)
+
+
+def test_expired_artifact_file_vanishing_mid_sweep(sweeper, monkeypatch):
+    sweeper.catalogue.record({'filename': '20260101_expired.md', 'size_bytes': 13,
+                              'created_at': '2026-01-01T00:00:00'})
+    sweeper.max_age_days = 30
+    path = write(sweeper.layout.path_for('20260101_expired.md'))
+    os.remove(path)
+    # Located just before another worker's sweep removed it
+    monkeypatch.setattr(sweeper.layout, 'locate', lambda filename: path)
+
+    report = sweeper.sweep()
+
+    assert report['expired']['artifacts'] == 1
+    assert sweeper.catalogue.get('20260101_expired.md') is None
+
+
+def store_artifact(sweeper, filename, created_at, size=1000):
+    body = filename.encode('utf-8').ljust(size, b'.')
+    content_hash = hashlib.sha256(body).hexdigest()
+    path = write(os.path.join(os.path.dirname(sweeper.layout.root), filename), body)
+    stored = sweeper.storage.ingest(path, content_hash)
+    sweeper.storage.put_variant(content_hash, 'gzip', body)  # Variants aren't counted by the quota
+    sweeper.storage.put_variant(content_hash, None, body, rendition='html')
+    sweeper.catalogue.record({'filename': filename, 'content_hash': content_hash, 'size_bytes': size,
+                              'created_at': created_at, 'storage_path': stored['location']})
+
+
+def test_quota_evicts_until_counted_bytes_fit(sweeper):
+    for n in range(4):
+        store_artifact(sweeper, f"2026100{n + 1}_report.md", f"2026-10-0{n + 1}T00:00:00")
+    sweeper.quota_bytes = 1500
+
+    report = sweeper.sweep()
+
+    # Each eviction frees three files on disk but only 1000 counted bytes
+    assert report['quota']['artifacts'] == 3
+    assert sweeper.catalogue.get_stats()['stored_bytes'] <= sweeper.quota_bytes
+    assert sweeper.catalogue.get('20261004_report.md') is not None  # Most recently used is kept
+
+
+def test_quota_dry_run_estimates_counted_bytes(sweeper):
+    for n in range(4):
+        store_artifact(sweeper, f"2026100{n + 1}_report.md", f"2026-10-0{n + 1}T00:00:00")
+    sweeper.quota_bytes = 1500
+
+    report = sweeper.sweep(dry_run=True)
+
+    assert report['quota']['artifacts'] == 3
+    assert sweeper.catalogue.get_stats()['artifacts'] == 4
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+
+import pytest
+
+from artifact_catalogue import ArtifactCatalogue
+from artifact_layout import ArtifactLayout
+
+OLD = time.time() - 86400
+
+
+def write(path, body, mtime=OLD):
+    with open(path, 'wb') as f:
+        f.write(body)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def flat_dir(tmp_path):
+    """An artifacts directory in the old flat layout"""
+    root = tmp_path / 'flat'
+    root.mkdir()
+    bodies = {
+        '20250101_120000_report.md': b'# Report\n',
+        '20250102_080000_page.html': b'<p>page</p>',
+        '20250103_090000_notes.txt': b'uncatalogued notes',
+        'legacy-name.json': b'{"undated": true}',
+    }
+    for name, body in bodies.items():
+        write(str(root / name), body)
+    for name in ('20250101_120000_report.md', '20250102_080000_page.html'):
+        sidecar = {'filename': name, 'id': name, 'title': name, 'type': 'text'}
+        write(str(root / (os.path.splitext(name)[0] + '.meta.json')), json.dumps(sidecar).encode('utf-8'))
+    write(str(root / 'broken.meta.json'), b'{"title": "no filename"}')
+    write(str(root / '20250104_streaming.md.processing'), b'partial')
+    write(str(root / '20261018_100000_fresh.md'), b'still streaming', mtime=time.time())
+    return str(root), bodies
+
+
+def test_migrate_moves_flat_files_into_shards(flat_dir, tmp_path):
+    root, bodies = flat_dir
+    catalogue = ArtifactCatalogue(str(tmp_path / 'catalogue.db'))
+    assert catalogue.import_sidecars(root)['imported'] == 2
+    layout = ArtifactLayout(root)
+
+    stats = layout.migrate(catalogue, batch_size=2, pause_seconds=0, min_age_seconds=60)
+
+    assert stats['moved'] == 4 and stats['sidecars_moved'] == 2
+    assert stats['skipped_recent'] == 1 and stats['skipped_partial'] == 1
+    assert stats['errors'] == 1  # The sidecar that doesn't name its artifact stays put
+    assert stats['batches'] == 3
+    assert sorted(os.listdir(root)) == ['2025', '20250104_streaming.md.processing', '20261018_100000_fresh.md',
+                                       'broken.meta.json', 'undated']
+
+    for name, body in bodies.items():
+        path = layout.locate(name)
+        assert path == layout.path_for(name)
+        with open(path, 'rb') as f:
+            assert f.read() == body
+    for name in ('20250101_120000_report.md', '20250102_080000_page.html'):
+        assert layout.locate_sidecar(name) == layout.sidecar_path_for(name)
+        assert catalogue.get(name)['storage_path'] == layout.path_for(name)
+    assert layout.locate('20261018_100000_fresh.md') == layout.flat_path('20261018_100000_fresh.md')
+
+    again = layout.migrate(catalogue, pause_seconds=0, min_age_seconds=60)
+    assert again['moved'] == again['sidecars_moved'] == again['conflicts'] == 0
+    assert again['errors'] == 1
+
+
+def test_migrate_dry_run_changes_nothing(flat_dir):
+    root, _ = flat_dir
+    before = sorted(os.listdir(root))
+    stats = ArtifactLayout(root).migrate(pause_seconds=0, min_age_seconds=60, dry_run=True)
+    assert stats['moved'] == 4 and stats['sidecars_moved'] == 2
+    assert sorted(os.listdir(root)) == before
+
+
+def test_migrate_leaves_conflicting_files(flat_dir):
+    root, _ = flat_dir
+    layout = ArtifactLayout(root)
+    target = layout.create_path('20250103_090000_notes.txt')
+    write(target, b'already sharded')
+
+    stats = layout.migrate(pause_seconds=0, min_age_seconds=60)
+
+    assert stats['conflicts'] == 1
+    assert os.path.exists(layout.flat_path('20250103_090000_notes.txt'))
+    assert layout.locate('20250103_090000_notes.txt') == target
+
+
+def test_migrated_artifacts_still_served(flat_dir, artifact_app):
+    root, bodies = flat_dir
+    catalogue = artifact_app.artifact_catalogue
+    for name in os.listdir(root):
+        os.replace(os.path.join(root, name), os.path.join(artifact_app.ARTIFACTS_DIR, name))
+    catalogue.import_sidecars(artifact_app.ARTIFACTS_DIR)
+    client = artifact_app.app.test_client()
+    before = {name: client.get(f"/artifacts/{name}").data for name in bodies}
+
+    artifact_app.artifact_layout.migrate(catalogue, pause_seconds=0, min_age_seconds=60)
+    artifact_app.artifact_layout.migrate(catalogue, pause_seconds=0, min_age_seconds=60)
+
+    for name, body in bodies.items():
+        response = client.get(f"/artifacts/{name}")
+        assert response.status_code == 200, name
+        assert response.data == body == before[name]
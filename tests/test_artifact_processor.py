@@ -0,0 +1,63 @@
+import time
+
+from artifact_catalogue import ArtifactCatalogue
+from artifact_processor import ArtifactProcessor
+
+
+def stored_job(catalogue, job_id, timeout=5.0):
+    """The job as other workers see it, once it has finished"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = catalogue.load_job(job_id)
+        if job and job['status'] in ('ready', 'failed'):
+            return job
+        time.sleep(0.01)
+    return catalogue.load_job(job_id)
+
+
+def test_job_status_is_shared_through_the_job_store(tmp_path):
+    db_path = str(tmp_path / 'catalogue.db')
+    processor = ArtifactProcessor(max_workers=1, job_store=ArtifactCatalogue(db_path))
+    processor.register_step('convert', lambda job: {'converted': True})
+    job_id = processor.submit(str(tmp_path / 'a.md'), {'id': 'a', 'permalink': '/artifacts/20261018_a.md'})
+    stored_job(processor.job_store, job_id)
+
+    # Another worker's processor never saw the job, but answers from the shared store
+    other = ArtifactProcessor(job_store=ArtifactCatalogue(db_path))
+    job = other.get_job(job_id)
+    assert job['status'] == 'ready'
+    assert job['result'] == {'converted': True}
+    assert job['permalink'] == '/artifacts/20261018_a.md'
+    assert other.get_job('unknown') is None
+
+
+def test_failed_job_is_stored(tmp_path):
+    catalogue = ArtifactCatalogue(str(tmp_path / 'catalogue.db'))
+    processor = ArtifactProcessor(max_workers=1, job_store=catalogue)
+
+    def fail(job):
+        raise ValueError('conversion failed')
+
+    processor.register_step('convert', fail)
+    job_id = processor.submit(str(tmp_path / 'a.md'), {'id': 'a', 'permalink': '/artifacts/20261018_a.md'})
+    job = stored_job(catalogue, job_id)
+    assert job['status'] == 'failed' and 'conversion failed' in job['error']
+
+
+def test_ready_snapshots_are_complete(tmp_path):
+    processor = ArtifactProcessor(max_workers=2)
+    for n in range(20):
+        processor.register_step(f"step{n}", lambda job, n=n: {f"step{n}": job['step_results'].get(f"step{n - 1}", 0) + 1})
+    job_ids = [processor.submit(str(tmp_path / f"{n}.md"), {'id': str(n), 'permalink': f"/artifacts/{n}.md"})
+               for n in range(50)]
+
+    # The chat stream polls while workers run; a ready job must be fully published
+    deadline = time.monotonic() + 10
+    ready = []
+    while len(ready) < len(job_ids) and time.monotonic() < deadline:
+        ready = processor.get_ready_jobs(job_ids)
+        for job in ready:
+            assert job['status'] == 'ready'
+            assert 'total' in job['timings'] and len(job['timings']) == 21
+            assert job['result']['step19'] == 20  # Later steps see earlier results
+    assert len(ready) == len(job_ids)
@@ -0,0 +1,84 @@
+import hashlib
+import os
+
+import pytest
+
+from artifact_catalogue import ArtifactCatalogue
+from artifact_revisions import ArtifactRevisions
+from artifact_storage import LocalArtifactStorage
+
+
+@pytest.fixture
+def revisions(tmp_path):
+    catalogue = ArtifactCatalogue(str(tmp_path / 'catalogue.db'))
+    storage = LocalArtifactStorage(str(tmp_path / 'objects'))
+    return ArtifactRevisions(catalogue, storage, snapshot_interval=3)
+
+
+def finalize(revisions, tmp_path, filename, body):
+    """What the post-processing steps do: plan the revision, store snapshots, catalogue the permalink"""
+    content_hash = hashlib.sha256(body).hexdigest()
+    revision = revisions.plan(filename, 'session-1', 'Backup Report', body, content_hash)
+    if revision['kind'] == 'snapshot':
+        path = tmp_path / filename
+        path.write_bytes(body)
+        revisions.storage.ingest(str(path), content_hash)
+    revisions.catalogue.record({'filename': filename, 'content_hash': content_hash, 'size_bytes': len(body),
+                                'storage_path': f"delta:{filename}" if revision['kind'] == 'delta' else None})
+    return revision
+
+
+def report(version):
+    lines = [f"Device {n}: last snapshot ok\n" for n in range(200)]
+    lines[version * 7] = f"Device {version * 7}: snapshot failed in revision {version}\n"
+    return ''.join(lines).encode('utf-8')
+
+
+@pytest.mark.parametrize('base, target', [
+    ('', 'one\ntwo\n'),
+    ('one\ntwo\n', ''),
+    ('a\nb\nc\n', 'a\nB\nc\nd'),
+    ('no trailing newline', 'no trailing newline\nmore'),
+    ('x\n\n\ny\n', '\n\nx\ny\n\n'),
+])
+def test_delta_round_trip(base, target):
+    ops = ArtifactRevisions.compute_delta(base, target)
+    assert ArtifactRevisions.apply_delta(base, ops) == target
+
+
+def test_delta_copies_unchanged_lines():
+    base = ''.join(f"line {n}\n" for n in range(100))
+    target = base.replace('line 50\n', 'changed\n')
+    ops = ArtifactRevisions.compute_delta(base, target)
+    assert ops == [[0, 50], 'changed\n', [51, 100]]
+
+
+def test_materialize_across_snapshot_interval(revisions, tmp_path):
+    bodies = {f"report-{n}.md": report(n) for n in range(1, 8)}
+    kinds = [finalize(revisions, tmp_path, filename, body)['kind'] for filename, body in bodies.items()]
+    # Revisions 1, 4 and 7 start a snapshot interval of 3
+    assert kinds == ['snapshot', 'delta', 'delta', 'snapshot', 'delta', 'delta', 'snapshot']
+
+    # A fresh instance has nothing cached, so every body is rebuilt from the chain
+    cold = ArtifactRevisions(revisions.catalogue, revisions.storage, snapshot_interval=3)
+    for filename, body in bodies.items():
+        assert cold.materialize(filename) == body
+
+
+def test_materialize_detects_corrupt_chain(revisions, tmp_path):
+    finalize(revisions, tmp_path, 'report-1.md', report(1))
+    finalize(revisions, tmp_path, 'report-2.md', report(2))
+    os.remove(revisions.storage.object_path(hashlib.sha256(report(1)).hexdigest()))
+
+    cold = ArtifactRevisions(revisions.catalogue, revisions.storage, snapshot_interval=3)
+    assert cold.materialize('report-2.md') is None
+
+
+def test_get_delta_between_revisions(revisions, tmp_path):
+    finalize(revisions, tmp_path, 'report-1.md', report(1))
+    finalize(revisions, tmp_path, 'report-2.md', report(2))
+    finalize(revisions, tmp_path, 'report-3.md', report(3))
+
+    delta = revisions.get_delta('report-3.md', 'report-1.md')  # Not a stored delta; computed
+    assert delta['revision'] == 3
+    assert ArtifactRevisions.apply_delta(report(1).decode('utf-8'), delta['ops']).encode('utf-8') == report(3)
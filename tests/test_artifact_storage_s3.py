@@ -0,0 +1,135 @@
+import hashlib
+import os
+
+import pytest
+import requests
+
+pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from artifact_storage import S3ArtifactStorage
+
+ENDPOINT = 'http://minio.test:9000'  # Stands in for a local S3-compatible server
+BUCKET = 'artifacts'
+PART = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('MOTO_S3_CUSTOM_ENDPOINTS', ENDPOINT)
+    with moto.mock_aws():
+        storage = S3ArtifactStorage(BUCKET, prefix='app', endpoint_url=ENDPOINT, region_name='us-east-1',
+                                    part_size=PART)
+        storage.client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+def keys(storage):
+    response = storage.client.list_objects_v2(Bucket=BUCKET)
+    return sorted(item['Key'] for item in response.get('Contents', []))
+
+
+def pending_uploads(storage):
+    return storage.client.list_multipart_uploads(Bucket=BUCKET).get('Uploads', [])
+
+
+def write_file(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_bytes(body)
+    return str(path), hashlib.sha256(body).hexdigest()
+
+
+def test_streamed_multipart_upload_becomes_the_object(s3, tmp_path):
+    body = os.urandom(PART) + b'tail of the artifact'
+    upload = s3.start_upload('20261018_big.md')
+    for offset in range(0, len(body), 64 * 1024):
+        upload.write(body[offset:offset + 64 * 1024])
+    assert upload.upload_id is not None  # First part went out while streaming
+
+    path, content_hash = write_file(tmp_path, '20261018_big.md', body)
+    stored = s3.ingest(path, content_hash, upload)
+
+    assert stored == {'location': f"s3://{BUCKET}/app/objects/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}",
+                      'deduplicated': False}
+    assert keys(s3) == [stored['location'].split('/', 3)[3]]  # Staging key removed
+    assert s3.open(content_hash).read() == body
+    assert not pending_uploads(s3)
+
+
+def test_mismatched_stream_is_aborted(s3, tmp_path):
+    upload = s3.start_upload('20261018_big.md')
+    upload.write(os.urandom(PART + 10))
+    assert pending_uploads(s3)
+
+    body = b'the finalized body differs from what was streamed'
+    path, content_hash = write_file(tmp_path, '20261018_big.md', body)
+    assert s3.ingest(path, content_hash, upload)['deduplicated'] is False
+
+    assert upload.aborted and not pending_uploads(s3)
+    assert s3.open(content_hash).read() == body
+
+
+def test_small_stream_never_starts_an_upload(s3):
+    upload = s3.start_upload('20261018_small.md')
+    upload.write('a short artifact')
+    assert upload.upload_id is None
+    assert upload.complete() is False  # Caller uploads the file instead
+    upload.abort()
+    assert not pending_uploads(s3)
+
+
+def test_ingest_skips_existing_objects(s3, tmp_path, monkeypatch):
+    path, content_hash = write_file(tmp_path, 'a.md', b'same body')
+    assert s3.ingest(path, content_hash)['deduplicated'] is False
+
+    def upload_file(*args, **kwargs):
+        raise AssertionError('existing object uploaded again')
+
+    monkeypatch.setattr(s3.client, 'upload_file', upload_file)
+    upload = s3.start_upload('b.md')
+    upload.write(b'same body')
+    assert s3.ingest(path, content_hash, upload)['deduplicated'] is True
+    assert upload.aborted
+
+
+def test_permalink_pointers_resolve_on_other_nodes(s3):
+    info = {'content_hash': 'ab' * 32, 'size_bytes': 10, 'encodings': 'gzip'}
+    s3.link_permalink('20261018_report.md', info)
+
+    other_node = S3ArtifactStorage(BUCKET, prefix='app', endpoint_url=ENDPOINT, region_name='us-east-1')
+    assert other_node.resolve_permalink('20261018_report.md') == info
+    assert other_node.resolve_permalink('20261018_missing.md') is None
+
+    s3.unlink_permalink('20261018_report.md')
+    assert s3.resolve_permalink('20261018_report.md') is None
+
+
+def test_presigned_and_proxied_reads(s3, tmp_path):
+    path, content_hash = write_file(tmp_path, 'a.md', b'# Report')
+    s3.ingest(path, content_hash)
+
+    url = s3.read_url(content_hash, mimetype='text/markdown', expires=60)
+    assert url.startswith(f"{ENDPOINT}/{BUCKET}/app/objects/")
+    assert 'Signature' in url and 'response-content-type=text%2Fmarkdown' in url
+    response = requests.get(url)
+    assert response.status_code == 200 and response.content == b'# Report'
+
+    s3.read_mode = 'proxy'
+    assert s3.read_url(content_hash) is None  # The app streams it instead
+    assert s3.open(content_hash).read() == b'# Report'
+
+
+def test_delete_removes_object_and_variants(s3, tmp_path):
+    path, content_hash = write_file(tmp_path, 'a.md', b'x' * 100)
+    s3.ingest(path, content_hash)
+    s3.put_variant(content_hash, 'gzip', b'g' * 20)
+    s3.put_variant(content_hash, None, b'h' * 30, rendition='html')
+    s3.put_variant(content_hash, 'gzip', b'z' * 5, rendition='html')
+    assert s3.has_variant(content_hash, 'gzip')
+
+    assert s3.delete(content_hash) == 155
+    assert keys(s3) == []
+    assert not s3.exists(content_hash)
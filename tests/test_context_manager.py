@@ -0,0 +1,148 @@
+import pytest
+
+from context_manager import MESSAGE_OVERHEAD_TOKENS, SUMMARY_TOKEN_RESERVE, ContextManager
+from token_counter import HeuristicTokenCounter
+
+SYSTEM_PROMPT = 'You are a backup assistant. ' * 200
+
+
+def conversation(count, words=120):
+    return [{'role': 'user' if n % 2 == 0 else 'assistant',
+             'content': f"message {n} " + 'snapshot retention schedule ' * words,
+             'timestamp': f"2026-10-18T10:{n % 60:02d}:00"} for n in range(count)]
+
+
+def calibrate_to(counter, scale):
+    for _ in range(200):
+        counter.calibrate(10000, int(10000 * scale / counter.scale))
+    assert abs(counter.scale - scale) < 0.01
+
+
+def test_calibration_reaches_cached_counts():
+    counter = HeuristicTokenCounter()
+    manager = ContextManager(context_window=200000, token_counter=counter)
+    history = manager.new_history(conversation(20))
+    before = manager.get_context_state(history, SYSTEM_PROMPT)['tokens_used']  # Caches every count
+
+    calibrate_to(counter, 1.5)
+    after = manager.get_context_state(history, SYSTEM_PROMPT)['tokens_used']
+
+    # The same history (system prompt included) counted afresh with the new scale
+    fresh = ContextManager(context_window=200000, token_counter=counter)
+    assert after == fresh.get_context_state(fresh.new_history(conversation(20)), SYSTEM_PROMPT)['tokens_used']
+    assert abs(after - before * counter.scale) <= 2
+    assert manager.system_tokens(SYSTEM_PROMPT) == int(counter.count_unscaled(SYSTEM_PROMPT) * counter.scale)
+
+
+def test_request_estimate_counts_message_overhead_once(app_module):
+    manager = app_module.context_manager
+    history = manager.new_history(conversation(12))
+    payload = {'system': SYSTEM_PROMPT,
+               'messages': [{'role': message['role'], 'content': message['content']} for message in history]}
+
+    estimate = app_module.estimate_request_tokens(payload)
+
+    # Calibrating on this estimate scales exactly what context management counts
+    assert abs(estimate - manager.get_context_state(history, SYSTEM_PROMPT)['tokens_used']) <= len(history)
+    assert estimate >= len(history) * MESSAGE_OVERHEAD_TOKENS
+
+
+def varied_conversation(count):
+    """Turns of different sizes and importance, so eviction leaves scattered runs"""
+    messages = []
+    for n in range(count):
+        if n % 2 == 0:
+            content = (f"Question {n}: why did the snapshot of device FILESRV-{n:02d} fail last night? "
+                       + 'details ' * (20 + (n * 37) % 200))
+            role = 'user'
+        else:
+            content = (f"Answer {n}: 🔧 checked the agent; see the artifact and ```code``` "
+                       + ('important: ' if n % 5 == 0 else '') + 'explanation ' * (10 + (n * 53) % 300))
+            role = 'assistant'
+        messages.append({'role': role, 'content': content, 'timestamp': f"2026-10-18T{n // 60 % 24:02d}:{n % 60:02d}:00"})
+    return messages
+
+
+@pytest.mark.parametrize('scale', [1.0, 2.0])
+def test_manage_context_evicts_to_budget_and_keeps_pinned(scale):
+    counter = HeuristicTokenCounter()
+    if scale != 1.0:
+        calibrate_to(counter, scale)
+    manager = ContextManager(context_window=40000, token_counter=counter, pinned_recent_messages=4)
+    history = manager.new_history(varied_conversation(300))
+    recent = list(history[-4:])
+
+    managed, info = manager.manage_context(history, SYSTEM_PROMPT, token_budget=12000)
+
+    assert info['action'] != 'none' and info['within_budget']
+    assert manager.get_context_state(managed, SYSTEM_PROMPT)['tokens_used'] <= 12000
+    assert all(kept is original for kept, original in zip(managed[-4:], recent))
+    assert info['summarized'] > 0
+    # Every summary stays within the reserve eviction set aside for it
+    for message in managed:
+        if message.get('is_summary'):
+            assert manager.to_tokens(manager.message_tokens(message)) <= SUMMARY_TOKEN_RESERVE * scale
+    # Survivors keep their order; evicted turns are recallable
+    seqs = [message['seq'] for message in managed]
+    assert seqs == sorted(seqs)
+    assert len(managed.session.recall_index) >= info['removed']
+
+
+def test_manage_context_below_threshold_is_a_no_op():
+    manager = ContextManager(context_window=200000)
+    history = manager.new_history(conversation(10))
+    managed, info = manager.manage_context(history, SYSTEM_PROMPT)
+    assert managed is history and info['action'] == 'none'
+
+
+def test_manage_context_never_evicts_pinned_messages():
+    manager = ContextManager(context_window=4000, pinned_recent_messages=6)
+    history = manager.new_history(conversation(20, words=60))
+    recent = list(history[-6:])
+
+    managed, info = manager.manage_context(history, '', token_budget=100)  # Unreachable
+
+    assert not info['within_budget']
+    assert all(kept is original for kept, original in zip(managed[-6:], recent))
+
+
+def assert_total_consistent(manager, history):
+    assert history.token_total == sum(manager.message_tokens(message) for message in history)
+
+
+def test_history_token_total_follows_every_mutation():
+    manager = ContextManager(context_window=200000)
+    history = manager.new_history(conversation(10, words=5))
+    extra = conversation(6, words=30)
+    assert_total_consistent(manager, history)
+
+    history.append(extra[0])
+    history.extend(extra[1:3])
+    history += [extra[3]]
+    history.insert(2, extra[4])
+    assert_total_consistent(manager, history)
+
+    history[1] = extra[5]
+    history[3:6] = conversation(2, words=80)  # Slice replaced by a shorter list
+    history[::2] = [{'role': 'user', 'content': f"step {n}"} for n in range(len(history[::2]))]
+    assert_total_consistent(manager, history)
+
+    del history[0]
+    del history[2:4]
+    history.pop()
+    history.pop(0)
+    history.remove(history[1])
+    assert_total_consistent(manager, history)
+
+    history.clear()
+    assert history.token_total == 0
+
+
+def test_history_numbers_messages():
+    manager = ContextManager()
+    history = manager.new_history(conversation(3))
+    history.append({'role': 'user', 'content': 'next'})
+    assert [message['seq'] for message in history] == [0, 1, 2, 3]
+    history.pop()
+    history.append({'role': 'user', 'content': 'again'})
+    assert history[-1]['seq'] == 4  # Numbers are never reused
@@ -0,0 +1,107 @@
+import pytest
+
+from markdown_renderer import is_safe_url, render_markdown, sanitize_html
+
+
+@pytest.mark.parametrize('url', [
+    'javascript:alert(1)',
+    'JaVaScRiPt:alert(1)',
+    '  javascript:alert(1)',
+    'java\tscript:alert(1)',
+    'java\nscript:alert(1)',
+    'java\x00script:alert(1)',
+    'javascript\x7f:alert(1)',
+    'vbscript:msgbox(1)',
+    'data:text/html;base64,PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==',
+])
+def test_unsafe_urls(url):
+    assert not is_safe_url(url)
+
+
+@pytest.mark.parametrize('url', [
+    'https://example.com/report', 'http://example.com', 'mailto:ops@example.com',
+    '/artifacts/20261018_a.md', 'report.md', '#section', '?page=2',
+])
+def test_safe_urls(url):
+    assert is_safe_url(url)
+
+
+@pytest.mark.parametrize('href', [
+    'javascript:alert(1)',
+    'java&#x09;script:alert(1)',
+    'java&#x0A;script:alert(1)',
+    'java&#10;script:alert(1)',
+    '&#x6A;avascript:alert(1)',
+    'javascript&colon;alert(1)',
+    '&#1;javascript:alert(1)',
+])
+def test_entity_encoded_javascript_links_lose_their_href(href):
+    assert sanitize_html(f'<a href="{href}">x</a>') == '<a rel="noopener noreferrer nofollow">x</a>'
+
+
+def test_unsafe_image_source_dropped():
+    assert sanitize_html('<img src="javascript:alert(1)" alt="chart">') == '<img alt="chart">'
+
+
+def test_event_handler_attributes_dropped():
+    cleaned = sanitize_html('<p onclick="alert(1)" class="note" ONMOUSEOVER="alert(2)">hi</p>'
+                            '<img src="/a.png" onerror="alert(3)">')
+    assert cleaned == '<p class="note">hi</p><img src="/a.png">'
+
+
+def test_disallowed_attributes_dropped():
+    assert sanitize_html('<div id="app" style="color:red" class="x">y</div>') == '<div class="x">y</div>'
+
+
+@pytest.mark.parametrize('fragment', [
+    '<script>alert(1)</script>',
+    '<SCRIPT src="https://evil.example/x.js"></SCRIPT>',
+    '<style>body { display: none }</style>',
+    '<svg><script>alert(1)</script><text>label</text></svg>',
+    '<svg onload="alert(1)"><title>chart</title></svg>',
+    '<math><mi>x</mi></math>',
+    '<textarea><img src=x onerror=alert(1)></textarea>',
+    '<iframe src="https://evil.example"></iframe>',
+    '<noscript><p>fallback</p></noscript>',
+])
+def test_dangerous_elements_dropped_with_content(fragment):
+    assert sanitize_html(f'<p>before</p>{fragment}<p>after</p>') == '<p>before</p><p>after</p>'
+
+
+def test_unknown_tags_unwrapped_and_text_escaped():
+    assert sanitize_html('<custom-el>text &lt;b&gt;</custom-el>') == 'text &lt;b&gt;'
+
+
+def test_unclosed_tags_closed():
+    assert sanitize_html('<div><ul><li><strong>item') == '<div><ul><li><strong>item</strong></li></ul></div>'
+    assert sanitize_html('<div><span>a</div>b') == '<div><span>a</span></div>b'
+    assert sanitize_html('</p>stray</div>') == 'stray'
+
+
+def test_links_get_rel():
+    assert (sanitize_html('<a href="https://example.com" rel="opener" target="_blank">x</a>')
+            == '<a href="https://example.com" rel="noopener noreferrer nofollow">x</a>')
+
+
+def test_attribute_values_escaped():
+    assert sanitize_html('<a title="&quot;&gt;<script>" href="/x">x</a>') == \
+        '<a title="&quot;&gt;&lt;script&gt;" href="/x" rel="noopener noreferrer nofollow">x</a>'
+
+
+def test_rendered_markdown_keeps_codehilite_output():
+    pytest.importorskip('markdown')
+    pytest.importorskip('pygments')
+    rendered = render_markdown('# Report\n\n```python\ndef run():\n    return 1\n```\n\n| a | b |\n|:--|--:|\n| 1 | 2 |\n')
+
+    assert '<h1>Report</h1>' in rendered
+    assert '<div class="codehilite"><pre><span></span><code><span class="k">def</span>' in rendered
+    assert '<span class="nf">run</span>' in rendered
+    assert '<td align="left">1</td>' in rendered and '<td align="right">2</td>' in rendered
+
+
+def test_rendered_markdown_sanitizes_raw_html():
+    pytest.importorskip('markdown')
+    rendered = render_markdown('Hello <script>alert(1)</script> [link](javascript:alert(1)) <b onclick="x">bold</b>')
+
+    assert 'script' not in rendered and 'onclick' not in rendered and 'javascript' not in rendered
+    assert '<b>bold</b>' in rendered
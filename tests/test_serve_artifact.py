@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+
+BODY = b'# Backup report\n\n' + b'All devices backed up.\n' * 200
+
+
+@pytest.fixture
+def client(artifact_app):
+    return artifact_app.app.test_client()
+
+
+def catalogue_artifact(app, filename, body=BODY, encodings=('br', 'gzip'), rendered=None):
+    """Store a finalized artifact the way the post-processing steps do"""
+    content_hash = hashlib.sha256(body).hexdigest()
+    staging = os.path.join(app.ARTIFACTS_DIR, f"staging-{filename}")
+    with open(staging, 'wb') as f:
+        f.write(body)
+    stored = app.artifact_storage.ingest(staging, content_hash)
+    os.remove(staging)
+    for encoding in encodings:
+        app.artifact_storage.put_variant(content_hash, encoding, f"{encoding}:".encode('utf-8') + body)
+    if rendered is not None:
+        app.artifact_storage.put_variant(content_hash, None, rendered, rendition='html')
+        app.artifact_storage.put_variant(content_hash, 'gzip', gzip.compress(rendered), rendition='html')
+    app.artifact_catalogue.record({
+        'filename': filename, 'content_hash': content_hash, 'size_bytes': len(body),
+        'storage_path': stored['location'], 'encodings': ','.join(encodings),
+        'rendered_encodings': 'gzip' if rendered is not None else None
+    })
+    return content_hash
+
+
+def test_catalogued_artifact_is_immutable_with_strong_etag(artifact_app, client):
+    content_hash = catalogue_artifact(artifact_app, '20261018_report.md')
+
+    response = client.get('/artifacts/20261018_report.md')
+
+    assert response.status_code == 200
+    assert response.data == BODY
+    assert response.headers['ETag'] == f'"{content_hash}"'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_if_none_match_gives_304(artifact_app, client):
+    content_hash = catalogue_artifact(artifact_app, '20261018_report.md')
+
+    response = client.get('/artifacts/20261018_report.md', headers={'If-None-Match': f'"{content_hash}"'})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == f'"{content_hash}"'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    stale = client.get('/artifacts/20261018_report.md', headers={'If-None-Match': '"0123abcd"'})
+    assert stale.status_code == 200 and stale.data == BODY
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('deflate', None),
+    ('', None),
+])
+def test_accept_encoding_selects_variant(artifact_app, client, accept, encoding):
+    content_hash = catalogue_artifact(artifact_app, '20261018_report.md')
+
+    response = client.get('/artifacts/20261018_report.md', headers={'Accept-Encoding': accept})
+
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == encoding
+    assert response.data == (f"{encoding}:".encode('utf-8') + BODY if encoding else BODY)
+    # Each representation has its own validator
+    assert response.headers['ETag'] == (f'"{content_hash}-{encoding}"' if encoding else f'"{content_hash}"')
+
+
+def test_variant_etag_matches_only_its_representation(artifact_app, client):
+    content_hash = catalogue_artifact(artifact_app, '20261018_report.md')
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': f'"{content_hash}"'}
+    assert client.get('/artifacts/20261018_report.md', headers=headers).status_code == 200
+    headers['If-None-Match'] = f'"{content_hash}-gzip"'
+    assert client.get('/artifacts/20261018_report.md', headers=headers).status_code == 304
+
+
+def test_unrecorded_encodings_are_not_offered(artifact_app, client):
+    catalogue_artifact(artifact_app, '20261018_small.md', encodings=())
+    response = client.get('/artifacts/20261018_small.md', headers={'Accept-Encoding': 'br, gzip'})
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
+
+
+def test_rendered_html_rendition(artifact_app, client):
+    content_hash = catalogue_artifact(artifact_app, '20261018_report.md', rendered=b'<h1>Backup report</h1>')
+
+    response = client.get('/artifacts/20261018_report.md?render=html', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/html'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == f'"{content_hash}-html-gzip"'
+    assert gzip.decompress(response.data) == b'<h1>Backup report</h1>'
+
+    assert client.get('/artifacts/20261018_report.md?render=pdf').status_code == 400
+    catalogue_artifact(artifact_app, '20261018_plain.md')
+    assert client.get('/artifacts/20261018_plain.md?render=html').status_code == 404
+
+
+def test_uncatalogued_file_is_not_cached(artifact_app, client):
+    path = artifact_app.artifact_layout.create_path('20261018_streaming.md')
+    with open(path, 'wb') as f:
+        f.write(b'# Still streaming')
+
+    response = client.get('/artifacts/20261018_streaming.md', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.data == b'# Still streaming'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_missing_artifact_is_404(client):
+    response = client.get('/artifacts/20261018_missing.md')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Artifact not found'}
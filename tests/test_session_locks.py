@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from session_locks import SessionBusy, SessionLocks
+
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_queue_serves_requests_in_arrival_order():
+    locks = SessionLocks(stripes=4, policy='queue')
+    first = locks.acquire('s')
+    order = []
+
+    def request(name):
+        turn = locks.acquire('s')
+        order.append(name)
+        locks.release(turn)
+
+    threads = []
+    for n in range(5):
+        threads.append(start(request, n))
+        wait_for(lambda: locks.get_stats()['waiting'] == n + 1)  # Queued before the next one arrives
+
+    locks.release(first)
+    for thread in threads:
+        thread.join(5)
+    assert order == [0, 1, 2, 3, 4]
+    stats = locks.get_stats()
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+    assert stats['acquired'] == 6 and stats['waited'] == 5
+
+
+def test_other_sessions_run_in_parallel():
+    locks = SessionLocks(stripes=1, policy='reject')  # Same stripe, still independent
+    a = locks.acquire('a')
+    b = locks.acquire('b')
+    assert locks.get_stats()['in_flight'] == 2
+    locks.release(a)
+    locks.release(b)
+
+
+def test_reject_fails_while_busy():
+    locks = SessionLocks(policy='reject')
+    turn = locks.acquire('s')
+    with pytest.raises(SessionBusy):
+        locks.acquire('s')
+    locks.release(turn)
+    locks.release(locks.acquire('s'))  # Free again
+    assert locks.get_stats()['rejected'] == 1
+
+
+def test_release_is_idempotent():
+    locks = SessionLocks()
+    turn = locks.acquire('s')
+    locks.release(turn)
+    second = locks.acquire('s', timeout=1)
+    locks.release(turn)  # Must not hand away the second request's turn
+    with pytest.raises(SessionBusy):
+        locks.acquire('s', policy='reject')
+    locks.release(second)
+
+
+def test_cancel_flags_running_request_and_supersedes_queued():
+    locks = SessionLocks(policy='queue')
+    running = locks.acquire('s')
+    errors = []
+
+    def queued():
+        try:
+            locks.acquire('s')
+        except SessionBusy as e:
+            errors.append(e)
+
+    waiter = start(queued)
+    wait_for(lambda: locks.get_stats()['waiting'] == 1)
+    newest = []
+    canceller = start(lambda: newest.append(locks.acquire('s', policy='cancel')))
+
+    wait_for(lambda: running.is_cancelled)
+    waiter.join(5)
+    assert len(errors) == 1  # The queued request gave way to the newer one
+    assert not newest  # The cancelled request still holds its turn until it stops
+
+    locks.release(running)
+    canceller.join(5)
+    assert newest and not newest[0].is_cancelled
+    locks.release(newest[0])
+    stats = locks.get_stats()
+    assert stats['cancelled'] == 1 and stats['superseded'] == 1
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+
+
+def test_timed_out_waiter_abandons_its_ticket():
+    locks = SessionLocks(policy='queue')
+    first = locks.acquire('s')
+    with pytest.raises(SessionBusy):
+        locks.acquire('s', timeout=0.05)  # Ticket 1 gives up while ticket 0 runs
+
+    later = []
+    thread = start(lambda: later.append(locks.acquire('s', timeout=5)))
+    wait_for(lambda: locks.get_stats()['waiting'] == 1)  # The abandoned ticket is not counted
+
+    locks.release(first)
+    thread.join(5)
+    assert later, 'the request behind the abandoned ticket was never served'
+    locks.release(later[0])
+
+    stats = locks.get_stats()
+    assert stats['timed_out'] == 1
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+    locks.release(locks.acquire('s', policy='reject'))  # Nothing left behind
+
+
+def test_unknown_policy_falls_back_to_queue():
+    assert SessionLocks(policy='bogus').policy == 'queue'
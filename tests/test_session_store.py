@@ -0,0 +1,67 @@
+import pytest
+
+from context_manager import ContextManager
+from session_registry import SessionRegistry
+from session_store import SQLiteSessionStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'sessions.db')
+
+
+def worker(db_path):
+    """A store as one gunicorn worker sees it: its own cache over the shared log"""
+    return SQLiteSessionStore(ContextManager(context_window=20000), SessionRegistry(), db_path)
+
+
+def fill(store, session_id, count):
+    for n in range(count):
+        store.append(session_id, {'role': 'user' if n % 2 == 0 else 'assistant',
+                                  'content': f"message {n} " + 'backup snapshot ' * 150,
+                                  'timestamp': f"2026-10-18T10:{n:02d}:00"})
+
+
+def active_seqs(store, session_id):
+    rows = store._connect().execute('SELECT seq FROM session_messages WHERE session_id = ? AND active = 1 '
+                                    'ORDER BY seq', (session_id,)).fetchall()
+    return [row['seq'] for row in rows]
+
+
+def test_replace_records_rewrite(db_path):
+    a, b = worker(db_path), worker(db_path)
+    fill(a, 's', 40)
+    history = a.get('s')
+    managed, info = a.context_manager.manage_context(history, '')
+    assert info['action'] != 'none'
+
+    a.replace('s', history, managed)
+    assert a.get_stats()['rewrites'] == 1
+    assert [m['seq'] for m in b.get('s')] == [m['seq'] for m in managed]
+    assert active_seqs(a, 's') == [m['seq'] for m in managed]
+
+
+def test_stale_replace_is_dropped(db_path):
+    a, b = worker(db_path), worker(db_path)
+    fill(a, 's', 40)
+    history = a.get('s')
+    managed, _ = a.context_manager.manage_context(history, '')
+
+    b.append('s', {'role': 'user', 'content': 'written by another worker', 'timestamp': 'now'})
+    a.replace('s', history, managed)  # Based on a copy from before b's append
+
+    stats = a.get_stats()
+    assert stats['rewrites'] == 0 and stats['stale_rewrites'] == 1
+    seqs = active_seqs(a, 's')
+    assert len(seqs) == len(set(seqs)) == 41  # Nothing written, no duplicate active seqs
+    reloaded = a.get('s')
+    assert len(reloaded) == 41 and reloaded[-1]['content'] == 'written by another worker'
+
+
+def test_append_catches_up_with_other_workers(db_path):
+    a, b = worker(db_path), worker(db_path)
+    a.append('s', {'role': 'user', 'content': 'one', 'timestamp': 't'})
+    b.append('s', {'role': 'assistant', 'content': 'two', 'timestamp': 't'})
+    history = a.append('s', {'role': 'user', 'content': 'three', 'timestamp': 't'})
+    assert [m['content'] for m in history] == ['one', 'two', 'three']
+    assert [m['seq'] for m in history] == sorted({m['seq'] for m in history})